@@ -1,6 +1,7 @@
 # app/streamlit_app.py
 import os
 import sys
+import uuid
 from pathlib import Path
 import streamlit as st
 from dotenv import load_dotenv
@@ -14,14 +15,30 @@ if str(_PROJECT_ROOT) not in sys.path:
 load_dotenv()
 st.set_page_config(page_title="LangGraph RAG + Weather", page_icon="⛅", layout="wide")
 
-from src.graph.agent_graph import build_graph, AppState  # noqa: E402
+from src.graph.agent_graph import build_graph, session_config, stream_turn, AppState  # noqa: E402
+from src.graph.memory import LatestCheckpointSaver  # noqa: E402
 from src.config import Settings  # noqa: E402
 from src.weather.api import fetch_weather  # noqa: E402
+from src import metrics  # noqa: E402
 
 settings = Settings()  # reads from .env
 
+if settings.WARMUP:
+    from src.warmup import warm_up  # noqa: E402
+    warm_up(settings)  # once per process; the first question no longer pays for model loading
+metrics.start_exporter()  # METRICS_EXPORTER=prometheus|otel; no-op when unset
+
+@st.cache_resource
+def _shared_graph():
+    # One compiled graph for all sessions; each session's bounded memory (recent turns +
+    # summary) lives in the checkpointer under its own thread id
+    return build_graph(settings, checkpointer=LatestCheckpointSaver(max_threads=settings.MEMORY_MAX_SESSIONS))
+
+
 if "graph" not in st.session_state:
-    st.session_state.graph = build_graph(settings)
+    st.session_state.graph = _shared_graph()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if "history" not in st.session_state:
     st.session_state.history = []
 
@@ -34,12 +51,34 @@ if not os.getenv("OPENWEATHERMAP_API_KEY"):
 with st.sidebar:
     st.header("Controls")
     upload = st.file_uploader("Upload a PDF to index", type=["pdf"])
-    if upload:
+    # The uploader keeps its value across reruns; only index each file once per session
+    if upload and st.session_state.get("indexed_file") != upload.file_id:
         from src.rag.index import index_pdf_into_qdrant  # noqa: E402
-        with st.spinner("Indexing PDF into Qdrant..."):
-            index_pdf_into_qdrant(upload, settings)
+        bar = st.progress(0.0, text="Indexing PDF into Qdrant...")
+        report = index_pdf_into_qdrant(upload, settings, progress=lambda f, msg: bar.progress(f, text=msg))
+        bar.empty()
+        st.session_state.indexed_file = upload.file_id
+        st.session_state.index_report = report
+    if upload and st.session_state.get("index_report"):
+        r = st.session_state.index_report
+        st.success(f"Indexed! {r.added} new chunks, {r.skipped} already present (doc {r.doc_id}).")
+    elif upload:
         st.success("Indexed!")
 
+    # ---------- Search scope (payload filters on the indexed chunks) ----------
+    st.caption("Search scope")
+    report = st.session_state.get("index_report")
+    only_upload = st.checkbox("Only the uploaded PDF", value=False, disabled=report is None,
+                              help="Ignore other documents in the collection")
+    from_col, to_col = st.columns(2)
+    page_from = from_col.number_input("From page", min_value=0, value=0, step=1, help="0 = first page")
+    page_to = to_col.number_input("To page", min_value=0, value=0, step=1, help="0 = last page")
+    search_filter = {}
+    if only_upload and report is not None:
+        search_filter["doc_id"] = report.doc_id
+    if page_from or page_to:
+        search_filter["pages"] = [int(page_from) or 1, int(page_to) or None]
+
     city = st.text_input("City for weather", value="", placeholder="Type a city (e.g., Chennai)", key="city")
     fetch_disabled = not (city and city.strip())
 
@@ -72,58 +111,171 @@ with st.sidebar:
     st.write(f"Tracing: {'ON' if tracing_on else 'OFF'}")
     st.write(f"Dataset logs: {'ON' if ds_log_on else 'OFF'}")
     st.write(f"Project: {project}")
+    if ds_log_on:
+        from src.eval.langsmith_eval import telemetry_worker  # noqa: E402
+        ts = telemetry_worker().stats()
+        st.write(f"Examples sent: {ts['sent']} (queued {ts['queued']}, dropped {ts['dropped']}, failed {ts['failed']})")
+
+    # ---------- Answer cache (semantic; cleared when documents change) ----------
+    from src.rag.answer_cache import answer_cache_for  # noqa: E402
+    answer_cache = answer_cache_for(settings)
+    if answer_cache is not None:
+        st.divider()
+        st.caption("Answer cache")
+        cs = answer_cache.stats()
+        st.write(f"Hit rate: {cs['hit_rate']:.0%} ({cs['hits']}/{cs['hits'] + cs['misses']})")
+        st.write(f"Saved: {cs['saved_s']:.1f} s")
+
+    # ---------- Performance (filled in after the answer is rendered) ----------
+    st.divider()
+    st.caption("Performance")
+    perf_panel = st.empty()
 
 st.subheader("Chat")
 user_msg = st.chat_input("Ask something about your PDF (weather will be included if you provided a city)...")
+
+
+def _render_assistant(pdf_answer: str, weather_answer: str, context, timings=None, context_stats=None,
+                      sources=None) -> None:
+    """Two-column layout: PDF answer (+ sources and retrieved context) | current weather."""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("### PDF Answer")
+        st.write(pdf_answer)
+        _render_sources(sources)
+        if context:
+            with st.expander("Retrieved context"):
+                for i, chunk in enumerate(context, 1):
+                    st.markdown(f"**Snippet {i}:**")
+                    st.write(chunk)
+    with col2:
+        st.markdown("### Current Weather")
+        st.write(weather_answer or "No city provided. Type a city to include live weather.")
+    _render_timings(timings, context_stats)
+
+
+def _render_sources(sources) -> None:
+    if sources:
+        st.caption("Sources: " + ", ".join(
+            f"{s.get('source') or 'document'} p.{s.get('page') or '?'} ({s['score']:.2f})" for s in sources))
+
+
+def _render_timings(timings, context_stats=None) -> None:
+    parts = [f"{k} {v * 1000:.0f} ms" for k, v in (timings or {}).items() if k in ("ttft", "total")]
+    if context_stats:
+        parts.append(f"context {context_stats['tokens_out']} tokens ({context_stats['tokens_saved']} saved)")
+    if parts:
+        st.caption(" · ".join(parts))
+
+
+def _stream_assistant(state: AppState) -> dict:
+    """Render the answer token by token; the weather column fills in when that branch is done."""
+    final: dict = {}
+    col1, col2 = st.columns(2)
+    with col2:
+        st.markdown("### Current Weather")
+        weather_slot = st.empty()
+        weather_slot.caption("Fetching weather...")
+    with col1:
+        st.markdown("### PDF Answer")
+
+        def _tokens():
+            streamed = False
+            for kind, payload in stream_turn(st.session_state.graph, state, session_config(st.session_state.session_id)):
+                if kind == "token":
+                    streamed = True
+                    yield payload
+                elif kind == "rag" and not streamed:
+                    yield payload  # extractive fallback / no docs: nothing was streamed
+                elif kind == "weather":
+                    weather_slot.write(payload)
+                elif kind == "final":
+                    final.update(payload)
+
+        st.write_stream(_tokens())
+        _render_sources(final.get("sources"))
+        if final.get("context"):
+            with st.expander("Retrieved context"):
+                for i, chunk in enumerate(final["context"], 1):
+                    st.markdown(f"**Snippet {i}:**")
+                    st.write(chunk)
+    _render_timings(final.get("timings"), final.get("context_stats"))
+    return final
+
+
+# Render chat so far; assistant replies get a neat two-column layout
+for m in st.session_state.history:
+    with st.chat_message(m["role"]):
+        if m["role"] == "assistant" and "pdf_answer" in m:
+            _render_assistant(m["pdf_answer"], m.get("weather", ""), m.get("context"), m.get("timings"),
+                              m.get("context_stats"), m.get("sources"))
+        else:
+            st.write(m["content"])
+
 if user_msg:
     st.session_state.history.append({"role": "user", "content": user_msg})
+    with st.chat_message("user"):
+        st.write(user_msg)
 
+    # No history here: the graph's checkpointer keeps this session's (bounded) memory;
+    # st.session_state.history is only the transcript rendered above
     state = AppState(
-        history=st.session_state.history,
         query=user_msg,
-        params={"city": st.session_state.get("city")},  # may be blank; graph still returns both sections
+        # City may be blank; graph still returns both sections. An empty filter searches everything.
+        params={"city": st.session_state.get("city"), **({"filter": search_filter} if search_filter else {})},
         context=[],
         answer=""
     )
 
     # Always append a response, even if something fails.
-    try:
-        result = st.session_state.graph.invoke(state)
-        assistant_content = (result.get("answer") or "").strip() or "_No answer generated._"
-        assistant_context = result.get("context", [])
-    except Exception as e:
-        # LangSmith telemetry is fully no-throw now, but keep this guard anyway
-        assistant_content = f"Sorry — something went wrong while answering: {e}"
-        assistant_context = []
-
-    st.session_state.history.append({
-        "role": "assistant",
-        "content": assistant_content,
-        "context": assistant_context
-    })
-
-# Render chat; assistant replies get a neat two-column layout
-for m in st.session_state.history:
-    with st.chat_message(m["role"]):
-        if m["role"] == "assistant" and "## PDF Answer" in m["content"]:
-            parts = m["content"].split("## Current Weather")
-            pdf_answer = parts[0].replace("## PDF Answer", "").strip()
-            weather_answer = parts[1].strip() if len(parts) > 1 else ""
-
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown("### PDF Answer")
-                st.write(pdf_answer)
-                if m.get("context"):
-                    with st.expander("Retrieved context"):
-                        for i, chunk in enumerate(m["context"], 1):
-                            st.markdown(f"**Snippet {i}:**")
-                            st.write(chunk)
-            with col2:
-                st.markdown("### Current Weather")
-                if weather_answer:
-                    st.write(weather_answer)
-                else:
-                    st.write("No city provided. Type a city to include live weather.")
-        else:
-            st.write(m["content"])
+    with st.chat_message("assistant"):
+        try:
+            if settings.STREAM_RESPONSES:
+                result = _stream_assistant(state)
+            else:
+                with metrics.turn() as breakdown:
+                    result = st.session_state.graph.invoke(state, config=session_config(st.session_state.session_id))
+                result["breakdown"] = breakdown
+                _render_assistant(result.get("rag_answer", ""), result.get("weather", ""),
+                                  result.get("context"), result.get("timings"), result.get("context_stats"),
+                                  result.get("sources"))
+            entry = {
+                "role": "assistant",
+                "content": (result.get("answer") or "").strip() or "_No answer generated._",
+                "context": result.get("context", []),
+                "sources": result.get("sources", []),
+                "pdf_answer": result.get("rag_answer", ""),
+                "weather": result.get("weather", ""),
+                "timings": result.get("timings", {}),
+                "context_stats": result.get("context_stats"),
+                "breakdown": result.get("breakdown", {}),
+            }
+        except Exception as e:
+            # LangSmith telemetry is fully no-throw now, but keep this guard anyway
+            entry = {"role": "assistant", "content": f"Sorry — something went wrong while answering: {e}"}
+            st.write(entry["content"])
+
+    st.session_state.history.append(entry)
+
+
+def _render_performance() -> None:
+    """Last turn's time per stage plus p50/p95 over the process lifetime."""
+    last = next((m.get("breakdown") for m in reversed(st.session_state.history)
+                 if m["role"] == "assistant" and m.get("breakdown")), None)
+    snap = metrics.snapshot()
+    with perf_panel.container():
+        if last:
+            st.write("Last turn: " + ", ".join(f"{k} {v * 1000:.0f} ms" for k, v in sorted(last.items())))
+        rows = {name: f"p50 {h['p50'] * 1000:.0f} / p95 {h['p95'] * 1000:.0f} ms (n={h['count']})"
+                for name, h in snap["histograms"].items()
+                if name.startswith(("node.", "turn.")) or name in ("llm", "llm.ttft", "embed", "embed.batch", "vector_search")}
+        for name, row in rows.items():
+            st.write(f"{name}: {row}")
+        hits = {k: v for k, v in snap["counters"].items() if k.endswith((".hit", ".miss", "fallback", "error"))}
+        if hits:
+            st.write(", ".join(f"{k} {v:g}" for k, v in hits.items()))
+        if not last and not rows:
+            st.write("No requests yet.")
+
+
+_render_performance()
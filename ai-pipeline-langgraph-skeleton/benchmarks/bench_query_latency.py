@@ -0,0 +1,76 @@
+# benchmarks/bench_query_latency.py
+"""Per-query retrieval latency with a cold vs. warm resource registry.
+
+"cold" drops every cached resource before each query, which reproduces the old behaviour of
+rebuilding the embedder / vectorizer / Qdrant client per call. "warm" reuses them.
+
+    python benchmarks/bench_query_latency.py [--queries 20] [--pdf data/10.1.1.1050.4503.pdf]
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+QUERIES = [
+    "What is the main contribution of the paper?",
+    "Which dataset was used in the experiments?",
+    "How is the proposed method evaluated?",
+    "What are the limitations discussed?",
+]
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+        "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--queries", type=int, default=20)
+    ap.add_argument("--pdf", default=str(_PROJECT_ROOT / "data" / "10.1.1.1050.4503.pdf"))
+    args = ap.parse_args()
+
+    os.environ["QDRANT_EMBEDDED"] = "1"
+    os.environ["QDRANT_LOCAL_PATH"] = tempfile.mkdtemp(prefix="bench_qdrant_")
+
+    from src.config import Settings
+    from src.rag.index import index_pdf_into_qdrant, rag_retrieve
+    from src.resources import invalidate
+
+    settings = Settings(QDRANT_COLLECTION="bench_query_latency")
+    with open(args.pdf, "rb") as fh:
+        index_pdf_into_qdrant(fh, settings)
+
+    results = {}
+    for mode in ("cold", "warm"):
+        invalidate()
+        rag_retrieve(QUERIES[0], settings)  # first call builds everything for the warm run
+        samples = []
+        for i in range(args.queries):
+            if mode == "cold":
+                invalidate()
+            t0 = time.perf_counter()
+            rag_retrieve(QUERIES[i % len(QUERIES)], settings)
+            samples.append(time.perf_counter() - t0)
+        results[mode] = _summary(samples)
+    results["speedup_p50"] = round(results["cold"]["p50_ms"] / max(results["warm"]["p50_ms"], 1e-6), 1)
+    invalidate()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_startup.py
+"""Startup cost: import time of the app's modules in fresh interpreters, which heavy SDKs
+they drag in, and how long the background warm-up steps take.
+
+    python benchmarks/bench_startup.py [--runs 5] [--max-import-ms 1500]
+
+With --max-import-ms the script exits with status 1 when importing the graph module takes
+longer (median), or when it imports any provider SDK / embedding backend eagerly.
+"""
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+MODULES = ["src.config", "src.weather.api", "src.rag.index", "src.graph.agent_graph"]
+# Must only be imported once they are actually used
+HEAVY = ["langchain_openai", "langchain_groq", "qdrant_client", "fastembed", "sklearn", "pypdf"]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"s": elapsed, "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _import_in_fresh_interpreter(module: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY)],
+        cwd=_PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-import-ms", type=float, default=None)
+    args = ap.parse_args()
+
+    results: dict = {"imports_ms": {}, "eager_heavy_imports": {}}
+    for module in MODULES:
+        probes = [_import_in_fresh_interpreter(module) for _ in range(args.runs)]
+        results["imports_ms"][module] = round(statistics.median(p["s"] for p in probes) * 1000, 1)
+        results["eager_heavy_imports"][module] = probes[-1]["heavy"]
+
+    from src.config import Settings
+    from src.warmup import warm_up
+
+    t0 = time.perf_counter()
+    report = warm_up(Settings(), background=False)
+    results["warmup_ms"] = {k: round(v * 1000, 1) for k, v in report.timings.items()}
+    results["warmup_total_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    results["warmup_errors"] = report.errors
+
+    from src.resources import invalidate
+    invalidate()
+    print(json.dumps(results, indent=2))
+
+    if args.max_import_ms is not None:
+        graph_ms = results["imports_ms"]["src.graph.agent_graph"]
+        eager = results["eager_heavy_imports"]["src.graph.agent_graph"]
+        if graph_ms > args.max_import_ms or eager:
+            print(f"REGRESSION: graph import {graph_ms} ms (limit {args.max_import_ms}), eager: {eager}",
+                  file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
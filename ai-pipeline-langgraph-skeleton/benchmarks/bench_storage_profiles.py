@@ -0,0 +1,180 @@
+# benchmarks/bench_storage_profiles.py
+"""Qdrant storage profiles (QDRANT_STORAGE_PROFILE): memory footprint, index build time and
+recall@k on a synthetic, clustered corpus, compared with the default float32 layout.
+
+    python benchmarks/bench_storage_profiles.py [--points 20000] [--dim 384] [--queries 200]
+                                                [--k 10] [--profiles default,scalar,binary,on_disk]
+                                                [--url http://localhost:6333]
+
+By default every profile is built in embedded Qdrant (a temporary directory each). Embedded
+Qdrant stores float32 vectors in RAM and searches exactly whatever the collection config says,
+so there the measured recall is always 1.0 and only build time and disk size differ. To see
+what quantization costs in recall, each quantized profile is also simulated with NumPy
+(int8 / sign-bit scores over the whole corpus, with and without rescoring the top
+oversampling x k candidates). With --url the collections are built on a Qdrant server, where
+the profiles take effect (HNSW, quantization, on-disk storage) and recall is measured.
+
+`ram_mb_estimate` follows Qdrant's sizing rule: vectors held in RAM x 1.5, plus the HNSW
+level-0 links and payloads not stored on disk.
+"""
+from __future__ import annotations
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.vectorstore.qdrant_store import STORAGE_PROFILES, QdrantStore, StorageProfile  # noqa: E402
+
+
+def synthetic_corpus(points: int, dim: int, queries: int, clusters: int = 64, seed: int = 0):
+    """Unit vectors around `clusters` topic centres (closer to real embeddings than pure noise)."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+
+    def draw(n: int) -> np.ndarray:
+        vecs = centres[rng.integers(0, clusters, n)] + 0.8 * rng.standard_normal((n, dim)).astype(np.float32)
+        return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+    return draw(points), draw(queries)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return round(float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)])), 4)
+
+
+def simulated_recall(profile: StorageProfile, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray) -> Dict[str, float]:
+    """Recall of exhaustive search over the quantized vectors, before and after rescoring."""
+    k = truth.shape[1]
+    if profile.quantization == "scalar":
+        scale = float(np.quantile(np.abs(corpus), 0.99)) / 127
+        codes = np.clip(np.round(corpus / scale), -127, 127).astype(np.int8)
+        approx = queries @ codes.T.astype(np.float32)
+    elif profile.quantization == "binary":
+        approx = np.sign(queries) @ np.sign(corpus).T
+    else:
+        return {}
+    ranked = np.argsort(-approx, axis=1)
+    candidates = ranked[:, : max(k, int(math.ceil(k * profile.oversampling)))]
+    rescored = [cand[np.argsort(-(corpus[cand] @ q))][:k] for cand, q in zip(candidates, queries)]
+    return {"recall_no_rescore": recall_at_k(ranked[:, :k].tolist(), truth),
+            "recall_rescored": recall_at_k([r.tolist() for r in rescored], truth)}
+
+
+def ram_estimate_bytes(profile: StorageProfile, points: int, dim: int, payload_bytes: int) -> int:
+    ram = 0 if profile.on_disk_vectors else points * dim * 4
+    if profile.quantization == "scalar":
+        ram += points * dim
+    elif profile.quantization == "binary":
+        ram += points * math.ceil(dim / 8)
+    ram = int(ram * 1.5)
+    ram += points * 2 * (profile.hnsw_m or 16) * 4  # level-0 links (u32)
+    if not profile.on_disk_payload:
+        ram += payload_bytes
+    return ram
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(f.stat().st_size for f in Path(path).rglob("*") if f.is_file())
+
+
+def _wait_indexed(client, name: str, timeout: float = 600) -> None:
+    """On a server, optimization (HNSW + quantization) runs in the background after upload."""
+    from qdrant_client.http import models as qm
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and client.get_collection(name).status != qm.CollectionStatus.GREEN:
+        time.sleep(0.2)
+
+
+def bench_profile(name: str, profile: StorageProfile, corpus: np.ndarray, queries: np.ndarray,
+                  truth: np.ndarray, url: Optional[str], tmp: str) -> Dict[str, object]:
+    from qdrant_client import QdrantClient
+
+    path = os.path.join(tmp, name)
+    client = QdrantClient(url=url, timeout=60) if url else QdrantClient(path=path)
+    collection = f"bench_profile_{name}"
+    store = QdrantStore(client, profile)
+    payloads = [{"i": i, "text": f"chunk {i} " + "lorem ipsum " * 40} for i in range(len(corpus))]
+    k = truth.shape[1]
+    try:
+        t0 = time.perf_counter()
+        store.recreate_collection(collection, corpus.shape[1])
+        store.upsert(collection, corpus, payloads, ids=list(range(len(corpus))), batch_size=1024)
+        if url:
+            _wait_indexed(client, collection)
+        build_s = time.perf_counter() - t0
+
+        found: List[List[int]] = []
+        for start in range(0, len(queries), 64):
+            hits = store.search_batch(collection, queries[start:start + 64], k=k)
+            found.extend([payload["i"] for _, payload in h] for h in hits)
+        latencies = []
+        for q in queries[:50]:
+            t0 = time.perf_counter()
+            store.search(collection, q, k=k)
+            latencies.append(time.perf_counter() - t0)
+
+        payload_bytes = sum(len(json.dumps(p)) for p in payloads)
+        result: Dict[str, object] = {
+            "build_s": round(build_s, 2),
+            "recall_at_k": recall_at_k(found, truth),
+            "search_p50_ms": round(float(np.median(latencies)) * 1000, 2),
+            "ram_mb_estimate": round(ram_estimate_bytes(profile, len(corpus), corpus.shape[1], payload_bytes) / 2**20, 1),
+        }
+        if url:
+            client.delete_collection(collection)
+    finally:
+        client.close()
+    if not url:
+        result["disk_mb"] = round(_dir_bytes(path) / 2**20, 1)  # measured once the client has flushed
+    simulated = simulated_recall(profile, corpus, queries, truth)
+    if simulated:
+        result["simulated"] = simulated
+    return result
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--points", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--profiles", default=",".join(STORAGE_PROFILES))
+    ap.add_argument("--url", default=None, help="Qdrant server (default: embedded Qdrant)")
+    args = ap.parse_args()
+
+    corpus, queries = synthetic_corpus(args.points, args.dim, args.queries)
+    truth = exact_top_k(corpus, queries, args.k)
+    results: Dict[str, object] = {"target": args.url or "embedded", "points": args.points, "dim": args.dim, "k": args.k}
+    if not args.url:
+        results["note"] = "embedded Qdrant searches float32 vectors exactly; use --url for real HNSW/quantization"
+    profiles: Dict[str, object] = {}
+    with tempfile.TemporaryDirectory(prefix="bench_profiles_") as tmp:
+        for name in args.profiles.split(","):
+            profiles[name] = bench_profile(name, STORAGE_PROFILES[name], corpus, queries, truth, args.url, tmp)
+    base = profiles.get("default")
+    if base:
+        for name, r in profiles.items():
+            r["ram_vs_default"] = round(r["ram_mb_estimate"] / base["ram_mb_estimate"], 3)
+    results["profiles"] = profiles
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/bench_vector_backends.py
+"""Cold load and query latency: embedded Qdrant vs. the local backend (exact and HNSW).
+
+Each backend is filled with the same random unit vectors, then reopened from disk ("cold")
+and queried one vector at a time; p50 per-query latency and top-10 recall against exact
+search are reported.
+
+    python benchmarks/bench_vector_backends.py [--points 20000] [--dim 384] [--queries 200]
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+
+def _p50_ms(fn, queries) -> float:
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t0)
+    return round(float(np.median(times)) * 1000, 3)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--points", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+
+    from qdrant_client import QdrantClient
+    from src.vectorstore.local_store import LocalVectorStore
+    from src.vectorstore.qdrant_store import QdrantStore
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.points, args.dim)).astype(np.float32)
+    queries = vectors[rng.choice(args.points, args.queries, replace=False)] + 0.05
+    ids = [str(uuid.uuid4()) for _ in range(args.points)]
+    payloads = [{"text": f"chunk {i}"} for i in range(args.points)]
+    results = {"points": args.points, "dim": args.dim}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Local backend, exact top-k vs. HNSW (threshold forced below the collection size)
+        exact_top = None
+        for label, hnsw_min in (("local_exact", args.points + 1), ("local_hnsw", 1)):
+            root = f"{tmp}/{label}"
+            store = LocalVectorStore(root, hnsw_min=hnsw_min)
+            store.recreate_collection("bench", args.dim)
+            store.upsert("bench", vectors, payloads, ids)
+            store.search("bench", queries[0], k=10)  # builds and saves the HNSW graph
+            t0 = time.perf_counter()
+            cold = LocalVectorStore(root, hnsw_min=hnsw_min)
+            cold.search("bench", queries[0], k=10)
+            results[f"{label}_cold_load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+            results[f"{label}_p50_ms"] = _p50_ms(lambda q: cold.search("bench", q, k=10), queries)
+            top = [[p["text"] for _, p in cold.search("bench", q, k=10)] for q in queries]
+            if exact_top is None:
+                exact_top = top
+            else:
+                recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(top, exact_top)])
+                results[f"{label}_recall_at_10"] = round(float(recall), 3)
+
+        # Embedded Qdrant (what get_qdrant() falls back to without a server)
+        client = QdrantClient(path=f"{tmp}/qdrant")
+        QdrantStore(client).recreate_collection("bench", args.dim)
+        QdrantStore(client).upsert("bench", vectors, payloads, ids)
+        client.close()
+        t0 = time.perf_counter()
+        client = QdrantClient(path=f"{tmp}/qdrant")
+        store = QdrantStore(client)
+        store.search("bench", queries[0], k=10)
+        results["qdrant_embedded_cold_load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        results["qdrant_embedded_p50_ms"] = _p50_ms(lambda q: store.search("bench", q, k=10), queries)
+        client.close()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
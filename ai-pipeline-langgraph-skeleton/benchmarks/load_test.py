@@ -0,0 +1,187 @@
+# benchmarks/load_test.py
+"""Load test for the HTTP service (src/server.py): throughput and tail latency under many
+concurrent users.
+
+By default everything runs offline: the bundled paper is indexed into a temporary local
+store, and the service is started in a subprocess with the fake LLM
+(FAKE_LLM_LATENCY_S per call) and a stub Open-Meteo server (--weather-delay per response).
+With --url an already running service is targeted instead.
+
+    python benchmarks/load_test.py [--users 32] [--requests 300] [--stream]
+                                   [--llm-latency 0.2] [--weather-delay 0.05]
+                                   [--max-concurrency 16] [--max-queue 64] [--url http://...]
+
+Reports requests/s, the p50/p95/p99 latency of successful requests, time to the first
+streamed token (--stream), and how many requests were shed with 503.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+from benchmarks.suite import PAPER, question_set, stub_weather  # noqa: E402
+
+CITIES = ["Chennai", "Madurai", "Salem", "Trichy", ""]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pcts_ms(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    p50, p95, p99 = np.quantile(samples, [0.5, 0.95, 0.99])
+    return {"p50_ms": round(p50 * 1000, 1), "p95_ms": round(p95 * 1000, 1), "p99_ms": round(p99 * 1000, 1)}
+
+
+async def _one(client, url: str, body: Dict[str, Any], stream: bool, out: Dict[str, list]) -> None:
+    t0 = time.perf_counter()
+    try:
+        if stream:
+            async with client.stream("POST", f"{url}/v1/answer/stream", json=body) as r:
+                status, first = r.status_code, None
+                async for line in r.aiter_lines():
+                    if first is None and line == "event: token":
+                        first = time.perf_counter() - t0
+                if first is not None:
+                    out["ttft"].append(first)
+        else:
+            r = await client.post(f"{url}/v1/answer", json=body)
+            status = r.status_code
+    except Exception:
+        out["errors"].append(1)
+        return
+    elapsed = time.perf_counter() - t0
+    if status == 200:
+        out["latency"].append(elapsed)
+    elif status == 503:
+        out["rejected"].append(elapsed)
+    else:
+        out["errors"].append(status)
+
+
+async def _load(url: str, users: int, requests: int, stream: bool, questions: List[str]) -> Dict[str, Any]:
+    import httpx
+
+    out: Dict[str, list] = {"latency": [], "ttft": [], "rejected": [], "errors": []}
+    todo = iter(range(requests))
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        async def user() -> None:
+            for i in todo:
+                body = {"query": questions[i % len(questions)], "city": CITIES[i % len(CITIES)]}
+                await _one(client, url, body, stream, out)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(users)))
+        wall = time.perf_counter() - t0
+        health = (await client.get(f"{url}/healthz")).json()
+
+    return {
+        "users": users,
+        "requests": requests,
+        "stream": stream,
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(len(out["latency"]) / wall, 1),
+        "ok": len(out["latency"]),
+        "rejected_503": len(out["rejected"]),
+        "errors": len(out["errors"]),
+        "latency": _pcts_ms(out["latency"]),
+        "ttft": _pcts_ms(out["ttft"]),
+        "server": health,
+    }
+
+
+def _wait_healthy(url: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/healthz", timeout=1).json().get("status") == "ok":
+                return  # warm-up finished: the first requests don't pay for model loading
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not become healthy")
+
+
+def _index_paper(env: Dict[str, str]) -> None:
+    os.environ.update(env)
+    from src.config import Settings
+    from src.rag.index import index_pdf_into_qdrant
+
+    with open(PAPER, "rb") as fh:
+        index_pdf_into_qdrant(fh, Settings())
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", type=int, default=32, help="concurrent clients")
+    ap.add_argument("--requests", type=int, default=300)
+    ap.add_argument("--stream", action="store_true", help="use the SSE endpoint and measure TTFT")
+    ap.add_argument("--url", default=None, help="target a running service instead of starting one")
+    ap.add_argument("--llm-latency", type=float, default=0.2)
+    ap.add_argument("--weather-delay", type=float, default=0.05)
+    ap.add_argument("--max-concurrency", type=int, default=16)
+    ap.add_argument("--max-queue", type=int, default=64)
+    args = ap.parse_args()
+
+    questions = question_set(str(PAPER), 50)
+    if args.url:
+        print(json.dumps(asyncio.run(_load(args.url, args.users, args.requests, args.stream, questions)), indent=2))
+        return
+
+    with tempfile.TemporaryDirectory(prefix="load_test_") as tmp, stub_weather(args.weather_delay) as weather:
+        env = {
+            "QDRANT_LOCAL_PATH": tmp,
+            "VECTOR_BACKEND": "local",
+            "ANSWER_CACHE": "false",  # measure the full pipeline, not cache hits
+            "LLM_PROVIDER": "fake",
+            "FAKE_LLM_LATENCY_S": str(args.llm_latency),
+            "OPENWEATHERMAP_API_KEY": "",
+            "OPEN_METEO_GEOCODE_URL": f"{weather}/geocode",
+            "OPEN_METEO_URL": f"{weather}/forecast",
+            "LANGSMITH_LOG_EXAMPLES": "0",
+            "SERVER_MAX_CONCURRENCY": str(args.max_concurrency),
+            "SERVER_MAX_QUEUE": str(args.max_queue),
+        }
+        _index_paper(env)
+        port = _free_port()
+        url = f"http://127.0.0.1:{port}"
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "src.server", "--host", "127.0.0.1", "--port", str(port)],
+            cwd=_PROJECT_ROOT, env={**os.environ, **env},
+        )
+        try:
+            _wait_healthy(url, proc)
+            results = asyncio.run(_load(url, args.users, args.requests, args.stream, questions))
+        finally:
+            proc.terminate()
+            proc.wait(10)
+    results["config"] = {"llm_latency_s": args.llm_latency, "weather_delay_s": args.weather_delay,
+                         "max_concurrency": args.max_concurrency, "max_queue": args.max_queue}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+# benchmarks/suite.py
+"""Offline benchmark suite: indexing, retrieval and end-to-end answer latency.
+
+Runs without network access or API keys against the bundled paper and a generated synthetic
+PDF. For each embedding path (TF-IDF; FastEmbed when its model is available locally) and each
+vector backend (embedded Qdrant, local files) it measures:
+
+- indexing throughput: pages/s and chunks/s,
+- query latency (p50/p95) and recall@1/@5 on a question set generated from the chunks
+  (a run of consecutive words taken from a chunk; a hit is a retrieved chunk containing it),
+- end-to-end `graph.invoke` latency with the fake LLM and a local stub weather server,
+  plus the per-stage breakdown from `src.metrics`,
+- peak memory: traced Python allocations while indexing / querying, and max RSS.
+
+    python benchmarks/suite.py [--quick] [--out results.json] [--baseline baseline.json]
+                               [--tolerance 0.25]
+
+Results are printed (and written to --out) as JSON. With --baseline, every comparable
+metric is checked against an earlier run and the script exits with status 1 when one got
+worse by more than --tolerance (relative): "*_ms" / "*_mb" must not grow, "*_per_s" and
+"recall@*" must not shrink. Timings under 2 ms are too noisy to compare and are skipped.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(_PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(_PROJECT_ROOT))
+
+PAPER = _PROJECT_ROOT / "data" / "10.1.1.1050.4503.pdf"
+BACKENDS = ("qdrant", "local")
+EMBEDDERS = ("tfidf", "fastembed")
+_NOISE_MS = 2.0
+
+
+# ---------- Synthetic corpus ----------
+def synthetic_pdf(path: str, pages: int, words_per_page: int = 320, seed: int = 0) -> str:
+    """Write a text-only PDF of `pages` pages of pseudo-words (deterministic for `seed`)."""
+    rng = np.random.default_rng(seed)
+    syllables = ["ka", "lo", "mi", "ne", "su", "ta", "ri", "po", "de", "va", "zu", "he", "bo", "ge"]
+    vocab = sorted({"".join(rng.choice(syllables, size=rng.integers(2, 5))) for _ in range(4000)})
+
+    def page_lines() -> List[str]:
+        words = rng.choice(vocab, size=words_per_page)
+        return [" ".join(words[i:i + 12]) + "." for i in range(0, len(words), 12)]
+
+    objects: List[bytes] = [b"", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for _ in range(pages):
+        body = "\n".join(f"({line}) Tj T*" for line in page_lines())
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td\n{body}\nET".encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"")  # page object, filled in below
+        page_ids.append(len(objects))
+        objects[-1] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects) - 1))
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % i for i in page_ids), pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as fh:
+        fh.write(out)
+    return path
+
+
+def question_set(pdf: str, n: int, words: int = 8, seed: int = 0) -> List[str]:
+    """`n` queries, each a run of `words` consecutive words from a different chunk."""
+    from src.rag.pdf_loader import load_and_chunk_pdf
+
+    rng = np.random.default_rng(seed)
+    chunks = [c.page_content.split() for c in load_and_chunk_pdf(pdf)]
+    chunks = [c for c in chunks if len(c) >= words * 2]
+    picks = rng.choice(len(chunks), size=min(n, len(chunks)), replace=False)
+    out = []
+    for i in picks:
+        start = int(rng.integers(0, len(chunks[i]) - words))
+        out.append(" ".join(chunks[i][start:start + words]))
+    return out
+
+
+# ---------- Helpers ----------
+def _pct_ms(samples: List[float]) -> Dict[str, float]:
+    p50, p95 = np.quantile(samples, [0.5, 0.95]) if samples else (0.0, 0.0)
+    return {"p50_ms": round(float(p50) * 1000, 2), "p95_ms": round(float(p95) * 1000, 2)}
+
+
+@contextmanager
+def _environment(**env: str) -> Iterator[None]:
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    try:
+        yield
+    finally:
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@contextmanager
+def _embedder(name: str) -> Iterator[bool]:
+    """Select the embedding path; yields False when it isn't available offline."""
+    from src.rag import index
+    from src.resources import invalidate
+
+    invalidate()
+    original = index._dense_embedder
+    if name == "tfidf":
+        index._dense_embedder = lambda settings, queries=False: None
+    try:
+        yield name == "tfidf" or original(_settings("probe", "local")) is not None
+    finally:
+        index._dense_embedder = original
+        invalidate()
+
+
+def _settings(collection: str, backend: str, **overrides):
+    from src.config import Settings
+    return Settings(QDRANT_COLLECTION=collection, VECTOR_BACKEND=backend, ANSWER_CACHE=False,
+                    EMBED_CACHE=False, PDF_WORKERS=1, **overrides)
+
+
+def _index(pdf: str, settings):
+    from src.rag.index import index_pdf_into_qdrant
+    with open(pdf, "rb") as fh:
+        return index_pdf_into_qdrant(fh, settings)
+
+
+# ---------- Sections ----------
+def bench_index_and_query(pdf: str, pages: int, questions: List[str], settings, k: int = 5) -> Dict[str, Any]:
+    from src.rag.index import rag_retrieve
+
+    t0 = time.perf_counter()
+    report = _index(pdf, settings)
+    elapsed = time.perf_counter() - t0
+    out: Dict[str, Any] = {
+        "chunks": report.chunks,
+        "index_s": round(elapsed, 3),
+        "pages_per_s": round(pages / elapsed, 1),
+        "chunks_per_s": round(report.chunks / elapsed, 1),
+    }
+
+    rag_retrieve(questions[0], settings, k=k)  # first query loads the vectorizer / client
+    samples, hits1, hits5 = [], 0, 0
+    for q in questions:
+        t0 = time.perf_counter()
+        docs = rag_retrieve(q, settings, k=k)
+        samples.append(time.perf_counter() - t0)
+        found = [q in " ".join(d.split()) for d in docs]
+        hits1 += bool(found[:1] and found[0])
+        hits5 += any(found[:5])
+    out["query"] = _pct_ms(samples)
+    out["recall@1"] = round(hits1 / len(questions), 3)
+    out["recall@5"] = round(hits5 / len(questions), 3)
+    return out
+
+
+@contextmanager
+def stub_weather(delay_s: float = 0.0) -> Iterator[str]:
+    """Local Open-Meteo look-alike (geocoding + current conditions), `delay_s` per response."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+        def do_GET(self):
+            time.sleep(delay_s)
+            if self.path.startswith("/geocode"):
+                body = {"results": [{"latitude": 13.08, "longitude": 80.27, "name": "Chennai"}]}
+            else:
+                body = {"current": {"temperature_2m": 30.0, "relative_humidity_2m": 65}}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_end_to_end(questions: List[str], settings) -> Dict[str, Any]:
+    """`graph.invoke` per question (index already built) with the fake LLM and stub weather."""
+    from src import metrics
+    from src.graph.agent_graph import build_graph
+    from src.resources import invalidate
+    from src.weather.api import clear_weather_cache
+
+    with stub_weather() as base, _environment(
+        LLM_PROVIDER="fake", OPEN_METEO_GEOCODE_URL=f"{base}/geocode", OPEN_METEO_URL=f"{base}/forecast",
+        OPENWEATHERMAP_API_KEY="", WEATHER_TTL_S="0", WEATHER_STALE_S="0",
+    ):
+        clear_weather_cache()
+        invalidate("http")
+        invalidate("llm")
+        graph = build_graph(settings.model_copy(update={"LLM_PROVIDER": "fake"}))
+
+        def state(q: str) -> Dict[str, Any]:
+            return {"history": [], "query": q, "params": {"city": "Chennai"}, "context": [], "answer": ""}
+
+        graph.invoke(state(questions[0]))
+        samples: List[float] = []
+        stages: Dict[str, List[float]] = {}
+        for q in questions:
+            with metrics.turn() as breakdown:
+                t0 = time.perf_counter()
+                graph.invoke(state(q))
+                samples.append(time.perf_counter() - t0)
+            for name, seconds in breakdown.items():
+                stages.setdefault(name, []).append(seconds)
+        invalidate("llm")
+    return {
+        "invoke": _pct_ms(samples),
+        "stages_mean_ms": {k: round(statistics.fmean(v) * 1000, 2) for k, v in sorted(stages.items())},
+    }
+
+
+def bench_memory(pdf: str, questions: List[str], settings) -> Dict[str, Any]:
+    """Peak traced allocations while indexing and while answering the question set."""
+    from src.rag.index import rag_retrieve
+
+    tracemalloc.start()
+    try:
+        _index(pdf, settings)
+        index_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.reset_peak()
+        for q in questions:
+            rag_retrieve(q, settings)
+        query_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"index_peak_mb": round(index_peak / 2**20, 1), "query_peak_mb": round(query_peak / 2**20, 1)}
+
+
+# ---------- Comparison ----------
+def _flatten(d: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def _direction(key: str) -> Optional[int]:
+    """+1: higher is better, -1: lower is better, None: not compared."""
+    leaf = key.rsplit(".", 1)[-1]
+    if leaf.endswith("_per_s") or leaf.startswith("recall@"):
+        return 1
+    if leaf.endswith(("_ms", "_mb")) or leaf == "index_s":
+        return -1
+    return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25) -> List[str]:
+    """Regressions of `current` against `baseline`, one readable line each."""
+    cur, base = _flatten(current), _flatten(baseline)
+    regressions = []
+    for key in sorted(cur.keys() & base.keys()):
+        direction, new, old = _direction(key), cur[key], base[key]
+        if direction is None or old == 0:
+            continue
+        if key.endswith("_ms") and max(new, old) < _NOISE_MS:
+            continue
+        change = (new - old) / abs(old)
+        if change * direction < -tolerance:
+            regressions.append(f"{key}: {old:g} -> {new:g} ({change:+.0%})")
+    return regressions
+
+
+# ---------- Main ----------
+def run(quick: bool = False, synthetic_pages: Optional[int] = None, n_questions: Optional[int] = None) -> Dict[str, Any]:
+    from src.rag.pdf_loader import page_count
+
+    # Imported up front: import time isn't indexing time
+    import qdrant_client  # noqa: F401
+    import sklearn.feature_extraction.text  # noqa: F401
+
+    synthetic_pages = synthetic_pages or (12 if quick else 60)
+    n_questions = n_questions or (15 if quick else 50)
+    work = tempfile.mkdtemp(prefix="bench_suite_")
+    corpora: Dict[str, Tuple[str, int, List[str]]] = {}
+    for name, pdf in (("paper", str(PAPER)), ("synthetic", synthetic_pdf(f"{work}/synthetic.pdf", synthetic_pages))):
+        corpora[name] = (pdf, page_count(pdf), question_set(pdf, n_questions))
+
+    results: Dict[str, Any] = {
+        "config": {"quick": quick, "questions": n_questions,
+                   "corpora": {n: {"pages": p} for n, (_, p, _) in corpora.items()}},
+    }
+    for emb in EMBEDDERS:
+        with _environment(QDRANT_EMBEDDED="1", QDRANT_LOCAL_PATH=tempfile.mkdtemp(dir=work)), _embedder(emb) as ok:
+            if not ok:
+                results[emb] = {"skipped": "embedding model not available offline"}
+                continue
+            results[emb] = {}
+            for backend in BACKENDS:
+                for corpus, (pdf, pages, questions) in corpora.items():
+                    settings = _settings(f"bench_{corpus}", backend)
+                    results[emb][f"{backend}.{corpus}"] = bench_index_and_query(pdf, pages, questions, settings)
+            if emb == "tfidf":
+                pdf, _, questions = corpora["paper"]
+                results["end_to_end"] = bench_end_to_end(
+                    questions, _settings("bench_paper", "local", OPENWEATHERMAP_API_KEY=None))
+                pdf, _, questions = corpora["synthetic"]
+                results["memory"] = bench_memory(pdf, questions, _settings("bench_memory", "local"))
+
+    from src.resources import invalidate
+    invalidate()
+    results.setdefault("memory", {})["max_rss_mb"] = round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # KiB on Linux
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--quick", action="store_true", help="smaller corpora and question set")
+    ap.add_argument("--synthetic-pages", type=int, default=None)
+    ap.add_argument("--questions", type=int, default=None)
+    ap.add_argument("--out", default=None, help="also write the JSON results here")
+    ap.add_argument("--baseline", default=None, help="results JSON of an earlier run to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    args = ap.parse_args()
+
+    results = run(args.quick, args.synthetic_pages, args.questions)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(text + "\n")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
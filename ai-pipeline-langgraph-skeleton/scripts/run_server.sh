@@ -0,0 +1,3 @@
+#!/usr/bin/env bash
+set -euo pipefail
+python -m src.server "$@"
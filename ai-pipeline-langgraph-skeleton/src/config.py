@@ -4,12 +4,20 @@ from pydantic import Field
 class Settings(BaseSettings):
     # LLM
     MODEL_NAME: str = Field(default="gpt-4o-mini")
+    # get_chat_model(settings=...): per-call budget, failover, "fake" for offline runs
+    LLM_TIMEOUT_S: float = Field(default=20.0)
+    LLM_FAILOVER: bool = Field(default=True)
+    LLM_PROVIDER: str | None = None
     EMBEDDINGS_MODEL: str = Field(default="sentence-transformers/all-MiniLM-L6-v2")
 
     # LangSmith
     LANGCHAIN_TRACING_V2: bool = Field(default=False)
     LANGCHAIN_API_KEY: str | None = None
     LANGCHAIN_PROJECT: str | None = None
+    # Dataset example logging (LANGSMITH_LOG_EXAMPLES=1), read from the environment by src/eval
+    LANGSMITH_QUEUE_SIZE: int = Field(default=1000)  # examples waiting; more are dropped
+    LANGSMITH_BATCH_SIZE: int = Field(default=50)  # examples per create_examples call
+    LANGSMITH_FLUSH_S: float = Field(default=2.0)  # max wait before a partial batch is sent
 
     # Weather
     OPENWEATHERMAP_API_KEY: str | None = None
@@ -18,9 +26,71 @@ class Settings(BaseSettings):
     QDRANT_URL: str = Field(default="http://localhost:6333")
     QDRANT_API_KEY: str | None = None
     QDRANT_COLLECTION: str = Field(default="assignment_docs")
+    INDEX_MODE: str = Field(default="replace")  # "replace" | "append" (multi-document)
+    UPSERT_BATCH_SIZE: int = Field(default=256)
+    RETRIEVAL_MODE: str = Field(default="dense")  # "dense" | "hybrid" (dense + BM25 sparse, RRF); reindex after switching
+    PDF_WORKERS: int = Field(default=0)  # page-extraction processes; 0 = auto, 1 = in-process
+    VECTOR_BACKEND: str = Field(default="qdrant")  # "qdrant" | "local" (in-process files, dense only)
+    LOCAL_HNSW_MIN_POINTS: int = Field(default=20_000)  # local backend: exact top-k below, HNSW above
+    # Qdrant collection layout: "default" (float32 in RAM), "scalar" / "binary" (quantized copy in
+    # RAM, originals and payloads on disk, rescored), "on_disk" (float32 memory-mapped). New
+    # collections use it; existing ones are switched in place (server only)
+    QDRANT_STORAGE_PROFILE: str = Field(default="default")
+    QDRANT_HNSW_M: int | None = None
+    QDRANT_HNSW_EF_CONSTRUCT: int | None = None
+    QDRANT_SEARCH_EF: int | None = None
+    QDRANT_RESCORE: bool | None = None
+    QDRANT_OVERSAMPLING: float | None = None
+
+    # Context assembly (over-fetch, dedupe overlapping chunks, optional rerank, token budget)
+    RETRIEVAL_CANDIDATES: int = Field(default=12)
+    # Chunks scoring under this cosine similarity are dropped; with none left the LLM is not called.
+    # Dense retrieval only (hybrid RRF scores are rank-based); the right value depends on the
+    # embedding model. None keeps every hit.
+    RETRIEVAL_MIN_SCORE: float | None = None
+    CONTEXT_TOKEN_BUDGET: int = Field(default=1500)
+    RERANK_MODEL: str | None = None  # e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2" (needs sentence-transformers)
+
+    # Conversation memory (rolling window + running summary; follow-ups rewritten for retrieval)
+    MEMORY_WINDOW_TURNS: int = Field(default=4)  # turns kept verbatim (the window holds up to 2x)
+    MEMORY_SUMMARY_MAX_CHARS: int = Field(default=1200)
+    MEMORY_ANSWER_MAX_CHARS: int = Field(default=600)  # assistant turns are trimmed to this in history
+    QUERY_REWRITE: bool = Field(default=True)  # LLM rewrite of follow-up questions before retrieval
+    MEMORY_MAX_SESSIONS: int = Field(default=1000)  # checkpointed sessions kept in memory (LRU)
+
+    # Semantic answer cache (per collection + model; cleared when documents change)
+    ANSWER_CACHE: bool = Field(default=True)
+    ANSWER_CACHE_THRESHOLD: float = Field(default=0.95)  # cosine similarity of query embeddings
+    ANSWER_CACHE_SIZE: int = Field(default=512)
+
+    # Embedding cache (SQLite under QDRANT_LOCAL_PATH + in-memory LRU)
+    EMBED_CACHE: bool = Field(default=True)
+    EMBED_CACHE_MAX_ENTRIES: int = Field(default=200_000)
+    EMBED_CACHE_MEMORY_ENTRIES: int = Field(default=4096)
+    # Query embedding: concurrent requests are micro-batched into one model call; EMBED_THREADS
+    # caps ONNX Runtime intra-op threads (0 = one per core)
+    EMBED_BATCHING: bool = Field(default=True)
+    EMBED_BATCH_MAX_SIZE: int = Field(default=32)
+    EMBED_BATCH_MAX_WAIT_MS: float = Field(default=2.0)
+    EMBED_THREADS: int = Field(default=0)
 
     # App
     PORT: int = Field(default=8501)
+    STREAM_RESPONSES: bool = Field(default=True)  # render answer tokens as they arrive
+    WARMUP: bool = Field(default=True)  # preload embedder, vector store and LLM client in the background
+    BATCH_MAX_CONCURRENCY: int = Field(default=4)  # batch_answer: LLM calls / weather lookups in flight
+
+    # HTTP service (python -m src.server)
+    SERVER_HOST: str = Field(default="0.0.0.0")
+    SERVER_PORT: int = Field(default=8000)
+    SERVER_MAX_CONCURRENCY: int = Field(default=16)  # turns running at once
+    SERVER_MAX_QUEUE: int = Field(default=64)  # admitted requests waiting for a slot; beyond: 503
+    SERVER_QUEUE_TIMEOUT_S: float = Field(default=10.0)  # max wait for a slot before 503
+
+    # Instrumentation exporters (read from the environment by src/metrics.py)
+    METRICS_EXPORTER: str | None = None  # "prometheus" | "otel"
+    METRICS_PORT: int = Field(default=9464)
+    METRICS_HOST: str = Field(default="127.0.0.1")  # "0.0.0.0" to let a remote scraper in
 
     class Config:
         env_file = ".env"
@@ -1,7 +1,16 @@
 # src/eval/langsmith_eval.py
+# Best-effort LangSmith dataset logging off the request path: `record_eval` only enqueues;
+# a background worker batches examples into bulk `create_examples` calls.
 from __future__ import annotations
+import atexit
 import os
-from typing import Dict, Any, Optional
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .. import metrics
+from ..resources import get_resource
 
 
 def _get_client() -> Optional["Client"]:
@@ -50,37 +59,187 @@ def _get_or_create_dataset_id(client, dataset_name: str) -> Optional[str]:
         return None
 
 
+def _create_examples(client, dataset_id: str, examples: List[Dict[str, Any]]) -> None:
+    """One bulk upload; older SDKs take parallel lists instead of `examples=`."""
+    try:
+        client.create_examples(dataset_id=dataset_id, examples=examples)  # type: ignore[attr-defined]
+    except TypeError:
+        client.create_examples(  # type: ignore[attr-defined]
+            dataset_id=dataset_id,
+            inputs=[e["inputs"] for e in examples],
+            outputs=[e["outputs"] for e in examples],
+            metadata=[e["metadata"] for e in examples],
+        )
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class TelemetryWorker:
+    """Daemon thread that uploads queued examples in batches.
+
+    `submit` never blocks: when `max_queue` examples are waiting, new ones are dropped (and
+    counted). A batch goes out when `batch_size` examples are pending or `flush_s` seconds
+    after the first one arrived. The client and each dataset id are looked up once and
+    reused; a failed upload drops its batch rather than retrying.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any] = _get_client,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_s: float = 2.0,
+    ):
+        self._client_factory = client_factory
+        self._client: Any = None
+        self._client_loaded = False
+        self._dataset_ids: Dict[str, str] = {}
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self.batch_size = max(1, batch_size)
+        self.flush_s = flush_s
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="langsmith-telemetry", daemon=True)
+        self._thread.start()
+
+    def submit(self, dataset_name: str, example: Dict[str, Any]) -> bool:
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait((dataset_name, example))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            metrics.incr("telemetry.dropped")
+            return False
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Upload everything queued so far; False if that didn't finish within `timeout`."""
+        if not self._thread.is_alive():
+            return self._queue.empty()
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush, then stop the worker (also run at interpreter exit)."""
+        if self._closed:
+            return
+        self.flush(timeout)
+        self._closed = True
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self._queue.qsize(), "sent": self.sent, "dropped": self.dropped, "failed": self.failed}
+
+    # ---------- worker thread ----------
+    def _run(self) -> None:
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        count, deadline = 0, 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if count else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False  # flush interval elapsed
+            if item is None or item is False or isinstance(item, threading.Event):
+                self._send(pending)
+                pending, count = {}, 0
+                if isinstance(item, threading.Event):
+                    item.set()
+                if item is None:
+                    return
+                continue
+            dataset_name, example = item
+            if not count:
+                deadline = time.monotonic() + self.flush_s
+            pending.setdefault(dataset_name, []).append(example)
+            count += 1
+            if count >= self.batch_size:
+                self._send(pending)
+                pending, count = {}, 0
+
+    def _dataset_id(self, client, dataset_name: str) -> Optional[str]:
+        ds_id = self._dataset_ids.get(dataset_name)
+        if ds_id is None:
+            ds_id = _get_or_create_dataset_id(client, dataset_name)
+            if ds_id:
+                self._dataset_ids[dataset_name] = ds_id  # not cached on failure: retried next batch
+        return ds_id
+
+    def _send(self, pending: Dict[str, List[Dict[str, Any]]]) -> None:
+        if not pending:
+            return
+        if not self._client_loaded:
+            try:
+                self._client = self._client_factory()
+            except Exception:
+                self._client = None
+            self._client_loaded = True
+        for dataset_name, examples in pending.items():
+            try:
+                ds_id = self._dataset_id(self._client, dataset_name) if self._client is not None else None
+                if not ds_id:
+                    raise RuntimeError(f"LangSmith dataset {dataset_name!r} unavailable")
+                _create_examples(self._client, ds_id, examples)
+                self.sent += len(examples)
+                metrics.incr("telemetry.sent", len(examples))
+            except Exception:
+                # Telemetry must never break UX (or pile up): the batch is dropped
+                self.failed += len(examples)
+                metrics.incr("telemetry.error", len(examples))
+
+
+def _new_worker() -> TelemetryWorker:
+    worker = TelemetryWorker(
+        max_queue=int(_env_number("LANGSMITH_QUEUE_SIZE", 1000)),
+        batch_size=int(_env_number("LANGSMITH_BATCH_SIZE", 50)),
+        flush_s=_env_number("LANGSMITH_FLUSH_S", 2.0),
+    )
+    atexit.register(worker.close)
+    return worker
+
+
+def telemetry_worker() -> TelemetryWorker:
+    """The process-wide worker (started on first use)."""
+    return get_resource("telemetry", "langsmith", _new_worker)
+
+
 def record_eval(
     example_input: Dict[str, Any],
     model_output: Dict[str, Any],
     run_name: str = "agent-run"
 ) -> None:
     """
-    Best-effort LangSmith logging.
+    Best-effort LangSmith logging; returns immediately.
     - Controlled by LANGSMITH_LOG_EXAMPLES=1 (default off).
     - Uses LANGCHAIN_PROJECT as dataset name (defaults to 'ai-pipeline-assignment').
+    - Queued for the background worker; dropped when the queue is full.
     - Absolutely never raises exceptions.
     """
-    if os.getenv("LANGSMITH_LOG_EXAMPLES", "0") != "1":
-        return
-
-    client = _get_client()
-    if client is None:
+    if os.getenv("LANGSMITH_LOG_EXAMPLES", "0") != "1" or not os.getenv("LANGCHAIN_API_KEY"):
         return
-
-    dataset_name = os.getenv("LANGCHAIN_PROJECT", "ai-pipeline-assignment")
     try:
-        ds_id = _get_or_create_dataset_id(client, dataset_name)
-        if not ds_id:
-            return
-
-        # Write a single example row into the dataset
-        client.create_example(  # type: ignore[attr-defined]
-            inputs=example_input,
-            outputs=model_output,
-            dataset_id=ds_id,
-            created_by=run_name,
-        )
+        dataset_name = os.getenv("LANGCHAIN_PROJECT", "ai-pipeline-assignment")
+        telemetry_worker().submit(dataset_name, {
+            "inputs": example_input,
+            "outputs": model_output,
+            "metadata": {"run_name": run_name},
+        })
     except Exception:
         # Telemetry must never break UX
         return
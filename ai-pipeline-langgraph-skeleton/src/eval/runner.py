@@ -0,0 +1,360 @@
+# src/eval/runner.py
+# Offline evaluation: replay a dataset through the graph in parallel and report retrieval
+# hit-rate, answer matches and latency percentiles, so a change can be compared with a baseline.
+#
+#   python -m src.eval.runner --file data/eval_paper.jsonl [--dataset NAME] [--workers 4]
+#                             [--fake-llm] [--out report.json] [--baseline old.json]
+#                             [--revision TAG] [--no-cache]
+#
+# Examples have LangSmith's shape, one JSON object per line:
+#   {"id": "...", "inputs": {"query": "...", "city": ""},
+#    "outputs": {"context_contains": ["..."], "answer_contains": ["..."]}}
+# A retrieval hit means some retrieved passage contains one of `context_contains`; an answer
+# match means the answer contains one of `answer_contains` (case and whitespace ignored).
+# With --dataset the examples come from LangSmith when it is configured, else from --file.
+#
+# Per-example results are cached on disk, keyed by the example, the settings, the number of
+# indexed points and --revision: a re-run only evaluates new or changed examples. Pass a new
+# --revision (e.g. the git commit) or --no-cache after changing code.
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import metrics
+from ..config import Settings
+
+# Settings that don't change answers (or are secrets) are left out of the cache key
+_VOLATILE_SETTINGS = ("METRICS_", "SERVER_", "LANGSMITH_", "WARMUP")
+
+
+@dataclass
+class Example:
+    id: str
+    query: str
+    city: str = ""
+    context_contains: List[str] = field(default_factory=list)
+    answer_contains: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any], fallback_id: str = "") -> "Example":
+        """From `{"id", "inputs", "outputs"}` (LangSmith shape) or a flat `{"query", ...}`."""
+        inputs = record.get("inputs") or record
+        outputs = record.get("outputs") or record
+        query = str(inputs.get("query") or inputs.get("question") or "").strip()
+        if not query:
+            raise ValueError(f"Example {record.get('id') or fallback_id!r} has no query")
+
+        def _strings(value) -> List[str]:
+            return [value] if isinstance(value, str) else [str(v) for v in (value or [])]
+
+        return cls(
+            id=str(record.get("id") or fallback_id or _digest(query)[:12]),
+            query=query,
+            city=str(inputs.get("city") or ""),
+            context_contains=_strings(outputs.get("context_contains")),
+            answer_contains=_strings(outputs.get("answer_contains")),
+        )
+
+    def key_fields(self) -> Dict[str, Any]:
+        return {"query": self.query, "city": self.city, "context_contains": self.context_contains,
+                "answer_contains": self.answer_contains}
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _norm(text: str) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+def _contains_any(texts: Sequence[str], needles: Sequence[str]) -> Optional[bool]:
+    if not needles:
+        return None  # nothing to check
+    haystack = [_norm(t) for t in texts]
+    return any(_norm(n) in h for n in needles for h in haystack)
+
+
+# ---------- loading ----------
+def load_jsonl(path: str) -> List[Example]:
+    examples = []
+    with open(path, encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, 1):
+            if line.strip():
+                examples.append(Example.from_record(json.loads(line), fallback_id=f"line-{line_no}"))
+    return examples
+
+
+def _langsmith_examples(dataset_name: str) -> Optional[List[Example]]:
+    """Examples of a LangSmith dataset; None when LangSmith isn't configured or reachable."""
+    from .langsmith_eval import _get_client
+
+    client = _get_client()
+    if client is None:
+        return None
+    try:
+        return [
+            Example.from_record({"id": str(ex.id), "inputs": ex.inputs or {}, "outputs": ex.outputs or {}})
+            for ex in client.list_examples(dataset_name=dataset_name)
+        ]
+    except Exception:
+        return None
+
+
+def _unique_ids(examples: List[Example]) -> List[Example]:
+    # Results are reported per id: a repeated id would silently merge two examples
+    seen = set()
+    for ex in examples:
+        if ex.id in seen:
+            raise ValueError(f"Duplicate example id {ex.id!r}")
+        seen.add(ex.id)
+    return examples
+
+
+def load_examples(file: Optional[str] = None, dataset: Optional[str] = None) -> Tuple[List[Example], str]:
+    """(examples, source): the LangSmith `dataset` when available, else the local JSONL `file`."""
+    if dataset:
+        examples = _langsmith_examples(dataset)
+        if examples is not None:
+            return _unique_ids(examples), f"langsmith:{dataset}"
+    if not file:
+        raise RuntimeError(f"LangSmith dataset {dataset!r} is unavailable and no local file was given")
+    return _unique_ids(load_jsonl(file)), file
+
+
+# ---------- result cache ----------
+def settings_fingerprint(settings: Settings) -> Dict[str, Any]:
+    return {
+        k: v for k, v in sorted(settings.model_dump().items())
+        if not k.startswith(_VOLATILE_SETTINGS) and not k.endswith(("_KEY", "_TOKEN"))
+    }
+
+
+def _index_points(settings: Settings) -> Optional[int]:
+    try:
+        from ..vectorstore.base import get_vector_store
+        store = get_vector_store(settings)
+        name = settings.QDRANT_COLLECTION
+        return store.count(name) if store.collection_exists(name) else 0
+    except Exception:
+        return None
+
+
+class ResultCache:
+    """One JSON file per (example, run configuration) under `path`."""
+
+    def __init__(self, path: str, run_key: str):
+        self.path = path
+        self.run_key = run_key
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, example: Example) -> str:
+        key = _digest(json.dumps({"run": self.run_key, "example": example.key_fields()}, sort_keys=True))
+        return os.path.join(self.path, f"{key}.json")
+
+    def get(self, example: Example) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._file(example), encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, example: Example, result: Dict[str, Any]) -> None:
+        path = self._file(example)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # workers are threads
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, default=str)
+        os.replace(tmp, path)
+
+
+# ---------- running ----------
+def evaluate_example(graph, example: Example) -> Dict[str, Any]:
+    """Run one example through a compiled graph; never raises."""
+    state = {"history": [], "query": example.query, "params": {"city": example.city}, "context": [], "answer": ""}
+    t0 = time.perf_counter()
+    final: Dict[str, Any] = {}
+    error: Optional[str] = None
+    with metrics.turn() as breakdown:
+        try:
+            final = graph.invoke(state)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - t0
+    rag_answer = final.get("rag_answer") or ""
+    if not error and rag_answer.startswith("RAG failed"):
+        error = rag_answer
+    return {
+        "id": example.id,
+        "query": example.query,
+        "city": example.city,
+        "answer": final.get("answer") or "",
+        "context_hit": _contains_any(final.get("context") or [], example.context_contains),
+        "answer_hit": _contains_any([rag_answer], example.answer_contains),
+        "latency_s": latency,
+        "timings": final.get("timings") or {},
+        "breakdown": dict(breakdown),
+        "error": error,
+    }
+
+
+def _rate(values: Sequence[Optional[bool]]) -> Optional[float]:
+    scored = [v for v in values if v is not None]
+    return round(sum(scored) / len(scored), 4) if scored else None
+
+
+def _pcts_ms(samples: Sequence[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    p50, p95, p99 = np.quantile(samples, [0.5, 0.95, 0.99])
+    return {"p50_ms": round(p50 * 1000, 1), "p95_ms": round(p95 * 1000, 1), "p99_ms": round(p99 * 1000, 1)}
+
+
+def summarize(results: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+    ok = [r for r in results if not r["error"]]
+    return {
+        "examples": len(results),
+        "errors": len(results) - len(ok),
+        "context_hit_rate": _rate([r["context_hit"] for r in results]),
+        "answer_hit_rate": _rate([r["answer_hit"] for r in results]),
+        "latency": _pcts_ms([r["latency_s"] for r in ok]),
+        "rag_latency": _pcts_ms([r["timings"]["rag"] for r in ok if "rag" in r["timings"]]),
+    }
+
+
+def run_eval(
+    examples: Sequence[Example],
+    settings: Optional[Settings] = None,
+    workers: int = 4,
+    cache_dir: Optional[str] = ".eval_cache",
+    revision: str = "",
+    source: str = "",
+    graph=None,
+) -> Dict[str, Any]:
+    """Evaluate `examples` with up to `workers` in flight; returns the report.
+
+    The graph is compiled once and shared by the workers, after the warm-up. Examples already evaluated with the
+    same settings, index size and `revision` are read from `cache_dir` instead of re-run
+    (`cache_dir=None` disables the cache).
+    """
+    from ..graph.agent_graph import build_graph
+
+    settings = settings or Settings()
+    fingerprint = settings_fingerprint(settings)
+    run_key = _digest(json.dumps({"settings": fingerprint, "index_points": _index_points(settings),
+                                  "revision": revision}, sort_keys=True, default=str))
+    cache = ResultCache(cache_dir, run_key) if cache_dir else None
+
+    results: Dict[str, Dict[str, Any]] = {}
+    todo: List[Example] = []
+    for ex in examples:
+        hit = cache.get(ex) if cache is not None else None
+        if hit is not None:
+            results[ex.id] = {**hit, "from_cache": True}
+        else:
+            todo.append(ex)
+
+    t0 = time.perf_counter()
+    if todo:
+        graph = graph or build_graph(settings)
+        if getattr(settings, "WARMUP", True):
+            from ..warmup import warm_up
+            warm_up(settings).wait(120)  # model loading shouldn't count as the first examples' latency
+
+        def _one(ex: Example) -> Dict[str, Any]:
+            result = evaluate_example(graph, ex)
+            if cache is not None and not result["error"]:
+                cache.put(ex, result)  # failures are retried on the next run
+            return {**result, "from_cache": False}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(todo))), thread_name_prefix="eval") as pool:
+            for result in pool.map(_one, todo):
+                results[result["id"]] = result
+    wall = time.perf_counter() - t0
+
+    ordered = [results[ex.id] for ex in examples]
+    return {
+        "run": {
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "source": source,
+            "revision": revision,
+            "run_key": run_key[:16],
+            "workers": workers,
+            "evaluated": len(todo),
+            "from_cache": len(ordered) - len(todo),
+            "wall_s": round(wall, 2),
+            "settings": {k: fingerprint.get(k) for k in ("LLM_PROVIDER", "MODEL_NAME", "EMBEDDINGS_MODEL",
+                                                          "RETRIEVAL_MODE", "VECTOR_BACKEND", "QDRANT_COLLECTION",
+                                                          "RETRIEVAL_CANDIDATES", "CONTEXT_TOKEN_BUDGET")},
+        },
+        "summary": summarize(ordered),
+        "examples": ordered,
+    }
+
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Summary deltas (current - baseline) and the examples whose hit/match flipped."""
+    cur, base = current["summary"], baseline["summary"]
+    deltas: Dict[str, Any] = {}
+    for metric in ("context_hit_rate", "answer_hit_rate", "errors"):
+        if cur.get(metric) is not None and base.get(metric) is not None:
+            deltas[metric] = round(cur[metric] - base[metric], 4)
+    for group in ("latency", "rag_latency"):
+        for pct, value in (cur.get(group) or {}).items():
+            if pct in (base.get(group) or {}):
+                deltas[f"{group}.{pct}"] = round(value - base[group][pct], 1)
+    before = {r["id"]: r for r in baseline.get("examples", [])}
+    flipped = {"context_hit": [], "answer_hit": []}
+    for r in current.get("examples", []):
+        old = before.get(r["id"])
+        for check in flipped:
+            if old is not None and None not in (r[check], old[check]) and r[check] != old[check]:
+                flipped[check].append({"id": r["id"], "now": r[check]})
+    return {"deltas": deltas, "flipped": flipped}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--file", help="local JSONL dataset")
+    ap.add_argument("--dataset", help="LangSmith dataset name (falls back to --file)")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--fake-llm", action="store_true", help="use the offline fake LLM")
+    ap.add_argument("--out", help="write the report here (JSON)")
+    ap.add_argument("--baseline", help="earlier report to compare with")
+    ap.add_argument("--revision", default="", help="part of the cache key, e.g. the git commit")
+    ap.add_argument("--cache-dir", default=".eval_cache")
+    ap.add_argument("--no-cache", action="store_true")
+    args = ap.parse_args(argv)
+
+    os.environ["LANGSMITH_LOG_EXAMPLES"] = "0"  # don't log eval runs back into the dataset
+    overrides: Dict[str, Any] = {"ANSWER_CACHE": False}  # measure the pipeline, not cached answers
+    if args.fake_llm:
+        overrides["LLM_PROVIDER"] = "fake"
+    examples, source = load_examples(args.file, args.dataset)
+    report = run_eval(examples, Settings(**overrides), workers=args.workers,
+                      cache_dir=None if args.no_cache else args.cache_dir, revision=args.revision, source=source)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            report["comparison"] = compare_reports(report, json.load(fh))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, default=str)
+    json.dump({k: v for k, v in report.items() if k != "examples"}, sys.stdout, indent=2, default=str)
+    print()
+
+
+if __name__ == "__main__":
+    main()
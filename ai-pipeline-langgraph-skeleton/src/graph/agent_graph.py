@@ -1,23 +1,68 @@
 # src/graph/agent_graph.py
 from __future__ import annotations
-from typing import TypedDict, List, Dict, Any
-from langgraph.graph import StateGraph, END
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from typing import Annotated, TypedDict, List, Dict, Any, NotRequired, AsyncIterator, Iterator, Optional, Sequence, Tuple, Union
+from langchain_core.runnables import RunnableLambda
+from langgraph.graph import StateGraph, START, END
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 
+from .. import metrics
 from ..llm import get_chat_model
 from ..config import Settings
-from ..weather.api import fetch_weather
-from ..rag.index import rag_retrieve
+from ..weather.api import afetch_weather, fetch_weather
+from ..rag.index import RetrievedChunk, search_chunks, search_chunks_batch, embed_query, embed_queries
+from ..rag.answer_cache import answer_cache_for
+from ..rag.context import ContextReport, build_context
 from ..eval.langsmith_eval import record_eval
+from ..vectorstore.base import SearchFilter
+from . import memory
+
+
+def _merge_timings(left: Dict[str, float] | None, right: Dict[str, float] | None) -> Dict[str, float]:
+    """Reducer so parallel nodes can each report their own timings."""
+    return {**(left or {}), **(right or {})}
 
 
 class AppState(TypedDict):
-    history: List[Dict[str, Any]]
+    history: List[Dict[str, Any]]  # recent turns, {"role", "content"}; older ones are in `summary`
     query: str
-    params: Dict[str, Any]   # {"city": "..."}; may be blank
+    params: Dict[str, Any]   # {"city": "...", "filter": {...}}; may be blank (see SearchFilter.from_dict)
     context: List[str]
     answer: str
+    # Filled by the parallel branches and joined by `combine`
+    rag_answer: NotRequired[str]
+    weather: NotRequired[str]
+    timings: NotRequired[Annotated[Dict[str, float], _merge_timings]]  # seconds per node
+    cached: NotRequired[bool]  # RAG answer served from the semantic answer cache
+    error: NotRequired[str]  # batch_answer: what failed for this item, if anything
+    context_stats: NotRequired[Dict[str, int]]  # candidates, duplicates, tokens_in/out/saved
+    sources: NotRequired[List[Dict[str, Any]]]  # source / page / score / doc_id of each context passage
+    breakdown: NotRequired[Dict[str, float]]  # stream_turn: seconds per instrumented span this turn
+    summary: NotRequired[str]  # running summary of turns that left the history window
+    standalone_query: NotRequired[str]  # `query` rewritten without references to earlier turns
+
+
+def _observed(fn):
+    """Record the node's reported `timings` as "node.<name>" histograms (sync or async node)."""
+    def _record(update):
+        for name, seconds in (update.get("timings") or {}).items():
+            metrics.observe(f"node.{name}", seconds)
+        return update
+
+    if asyncio.iscoroutinefunction(fn):
+        @wraps(fn)
+        async def awrapper(*args, **kwargs):
+            return _record(await fn(*args, **kwargs))
+        return awrapper
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        return _record(fn(*args, **kwargs))
+    return wrapper
 
 
 def _safe_eval(inputs: Dict[str, Any], outputs: Dict[str, Any], run_name: str) -> None:
@@ -47,89 +92,628 @@ def _extractive_fallback(docs: List[str], max_chars: int = 700) -> str:
     )
 
 
-def both_node(state: AppState, settings: Settings) -> AppState:
-    """Main logic: always return PDF RAG + Weather."""
-    city = (state.get("params") or {}).get("city", "").strip()
+_SYSTEM_PROMPT = (
+    "You are a helpful RAG assistant. Answer using ONLY the provided context. "
+    "If the answer isn't in the context, say you don't know."
+)
+_NO_DOCS = "I couldn't find anything relevant in the uploaded PDF."
+_NO_CITY = "No city provided. Include a city in your question to show live weather."
+
+
+def _city(state: AppState) -> str:
+    return ((state.get("params") or {}).get("city") or "").strip()
+
+
+def _question(state: AppState) -> str:
+    """What retrieval, the answer cache and the prompt see: the standalone form of the query."""
+    return state.get("standalone_query") or state["query"]
+
+
+def _rag_chain(settings: Settings):
+    llm = get_chat_model(settings.MODEL_NAME, settings)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", _SYSTEM_PROMPT),
+        ("human", "Question: {q}\n\nContext:\n{ctx}\n\nAnswer (cite which snippet you used if helpful):")
+    ])
+    return prompt | llm | StrOutputParser()
+
+
+def _chain_config(city: str) -> Dict[str, Any]:
+    # Add tags/metadata so traces look nice in LangSmith
+    return {
+        "tags": ["assignment", "rag", "rag-node"],
+        "metadata": {"route": "both", "city": city or None},
+    }
+
+
+def _format_weather(w) -> str:
+    feels = getattr(w, "feels_like_c", None)
+    hum = getattr(w, "humidity_pct", None)
+    wind = getattr(w, "wind_kph", None)
+    details = []
+    if isinstance(feels, (int, float)):
+        details.append(f"feels like {feels:.1f}°C")
+    if isinstance(hum, (int, float)):
+        details.append(f"humidity {hum:.0f}%")
+    if isinstance(wind, (int, float)):
+        details.append(f"wind {wind:.0f} km/h")
+    extra = (" | " + ", ".join(details)) if details else ""
+    via = f"{w.provider}, cached" if getattr(w, "stale", False) else w.provider
+    return f"{w.city}: {w.description}, {w.temperature_c:.1f}°C (via {via}){extra}"
+
+
+# ---------- MEMORY ----------
+_MEMORY_CONFIG = {"tags": ["assignment", "memory"]}
+
+
+def _memory_chain(prompt, settings: Settings):
+    return prompt | get_chat_model(settings.MODEL_NAME, settings) | StrOutputParser()
+
+
+def _rewrite_inputs(state: AppState, settings: Settings) -> Tuple[List[memory.Message], Optional[Dict[str, str]]]:
+    """(compact history, prompt inputs); inputs are None when the query needs no rewrite."""
+    history = memory.compact(state.get("history") or [], settings.MEMORY_ANSWER_MAX_CHARS)
+    if not settings.QUERY_REWRITE or not memory.is_follow_up(state["query"], history):
+        return history, None
+    recent = history[-2 * settings.MEMORY_WINDOW_TURNS:]
+    return history, {"q": state["query"], "summary": state.get("summary") or "(none)",
+                     "turns": memory.format_turns(recent)}
+
+
+def _memory_update(state: AppState, history, rewritten: Optional[str], t0: float) -> Dict[str, Any]:
+    standalone = state["query"]
+    if rewritten is not None:
+        standalone = " ".join(rewritten.split()).strip('"') or memory.fallback_rewrite(state["query"], history)
+    return {"standalone_query": standalone, "timings": {"memory": time.perf_counter() - t0}}
+
+
+@_observed
+def memory_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Rewrite a follow-up ("what about its limitations?") into a standalone question."""
+    t0 = time.perf_counter()
+    history, inputs = _rewrite_inputs(state, settings)
+    rewritten = None
+    if inputs is not None:
+        try:
+            rewritten = _memory_chain(memory.REWRITE_PROMPT, settings).invoke(inputs, config=_MEMORY_CONFIG)
+        except Exception:
+            rewritten = ""  # no LLM: anchor the follow-up to the previous question instead
+    return _memory_update(state, history, rewritten, t0)
+
+
+@_observed
+async def amemory_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Async variant of `memory_node`."""
+    t0 = time.perf_counter()
+    history, inputs = _rewrite_inputs(state, settings)
+    rewritten = None
+    if inputs is not None:
+        try:
+            rewritten = await _memory_chain(memory.REWRITE_PROMPT, settings).ainvoke(inputs, config=_MEMORY_CONFIG)
+        except Exception:
+            rewritten = ""
+    return _memory_update(state, history, rewritten, t0)
+
+
+def _turn_window(state: AppState, settings: Settings):
+    """(turns to fold into the summary, window to keep) after appending this turn."""
+    history = memory.compact(state.get("history") or [], settings.MEMORY_ANSWER_MAX_CHARS)
+    history += memory.compact(
+        [{"role": "user", "content": state["query"]}, {"role": "assistant", "content": state.get("rag_answer", "")}],
+        settings.MEMORY_ANSWER_MAX_CHARS,
+    )
+    return memory.fold(history, settings.MEMORY_WINDOW_TURNS)
+
+
+def _summary_inputs(state: AppState, folded, settings: Settings) -> Dict[str, Any]:
+    return {"summary": state.get("summary") or "(none)", "turns": memory.format_turns(folded),
+            "max_chars": settings.MEMORY_SUMMARY_MAX_CHARS}
+
+
+def _remember_update(state: AppState, folded, kept, summary: Optional[str], settings: Settings, t0: float):
+    max_chars = settings.MEMORY_SUMMARY_MAX_CHARS
+    if folded:
+        summary = (summary or "").strip()[:max_chars] or memory.fallback_summary(state.get("summary") or "", folded, max_chars)
+    else:
+        summary = state.get("summary") or ""
+    return {"history": kept, "summary": summary, "timings": {"remember": time.perf_counter() - t0}}
+
+
+@_observed
+def remember_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Append this turn to the history window; once the window is full, fold its oldest turns
+    into the running summary, so the state stays bounded however long the conversation."""
+    t0 = time.perf_counter()
+    folded, kept = _turn_window(state, settings)
+    summary = None
+    if folded:
+        try:
+            summary = _memory_chain(memory.SUMMARY_PROMPT, settings).invoke(
+                _summary_inputs(state, folded, settings), config=_MEMORY_CONFIG)
+        except Exception:
+            summary = None
+    return _remember_update(state, folded, kept, summary, settings, t0)
+
+
+@_observed
+async def aremember_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Async variant of `remember_node`."""
+    t0 = time.perf_counter()
+    folded, kept = _turn_window(state, settings)
+    summary = None
+    if folded:
+        try:
+            summary = await _memory_chain(memory.SUMMARY_PROMPT, settings).ainvoke(
+                _summary_inputs(state, folded, settings), config=_MEMORY_CONFIG)
+        except Exception:
+            summary = None
+    return _remember_update(state, folded, kept, summary, settings, t0)
+
+
+# ---------- RAG ----------
+def _scope(state: AppState) -> Optional[SearchFilter]:
+    """The turn's search filter, if any; raises ValueError for a malformed one."""
+    return SearchFilter.from_dict((state.get("params") or {}).get("filter"))
+
+
+def _cache_lookup(state: AppState, settings: Settings):
+    """(cache, query vector, hit) for the semantic answer cache; never raises.
+
+    Scoped turns bypass the cache: their answer depends on the filter, not just the question.
+    """
+    if (state.get("params") or {}).get("filter"):
+        return None, None, None
+    try:
+        cache = answer_cache_for(settings)
+        if cache is None:
+            return None, None, None
+        qvec = embed_query(_question(state), settings)
+        return cache, qvec, cache.lookup(_question(state), qvec)
+    except Exception:
+        return None, None, None
+
+
+def _rag_result(rag_answer: str, t0: float, **fields: Any) -> Dict[str, Any]:
+    """A RAG node update that sets every per-turn field: with a checkpointer, whatever a path
+    leaves out would still hold the previous turn's value."""
+    return {"context": [], "sources": [], "context_stats": None, "cached": False, "error": None,
+            **fields, "rag_answer": rag_answer, "timings": {"rag": time.perf_counter() - t0}}
+
+
+def _cached_update(hit, t0: float) -> Dict[str, Any]:
+    return _rag_result(hit.answer, t0, context=hit.context, cached=True)
+
+
+def _citations(passages: List[str], chunks: List[RetrievedChunk]) -> List[Dict[str, Any]]:
+    """Where each packed passage came from (dedupe and packing only ever cut a chunk's text)."""
+    out = []
+    for passage in passages:
+        chunk = next((c for c in chunks if passage in c.text), None)
+        if chunk is not None:
+            out.append(chunk.citation())
+    return out
+
+
+def _no_docs(t0: float) -> Dict[str, Any]:
+    # Nothing (relevant) retrieved: answered without calling the LLM
+    metrics.incr("rag.no_docs")
+    return _rag_result(_NO_DOCS, t0)
+
+
+def _rag_update(
+    state: AppState, cache, qvec, ctx: ContextReport, llm_answer: str, t0: float, chunks: List[RetrievedChunk]
+) -> Dict[str, Any]:
+    docs = ctx.passages
+    if llm_answer and cache is not None:
+        # Only real LLM answers are cached, never fallbacks
+        cache.store(_question(state), llm_answer, docs, time.perf_counter() - t0, qvec)
+    if not llm_answer:
+        metrics.incr("rag.extractive_fallback")
+    rag_answer = llm_answer or _extractive_fallback(docs)
+    return _rag_result(rag_answer, t0, context=docs, sources=_citations(docs, chunks), context_stats=ctx.stats())
+
+
+@_observed
+def rag_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Retrieve from Qdrant and answer with the LLM (extractive fallback on LLM failure).
+
+    Repeated or near-duplicate questions are served from the semantic answer cache. A
+    `params["filter"]` scopes retrieval to documents / pages / an upload window; when no chunk
+    passes it (or RETRIEVAL_MIN_SCORE) the LLM is not called.
+    """
+    t0 = time.perf_counter()
+    cache, qvec, hit = _cache_lookup(state, settings)
+    if hit is not None:
+        return _cached_update(hit, t0)
+    try:
+        chunks = search_chunks(_question(state), settings, k=settings.RETRIEVAL_CANDIDATES, filter=_scope(state))
+        if not chunks:
+            return _no_docs(t0)
+        ctx = build_context(_question(state), [c.text for c in chunks], settings)
+        try:
+            llm_answer = (_rag_chain(settings).invoke(
+                {"q": _question(state), "ctx": ctx.text},
+                config=_chain_config(_city(state)),
+            ) or "").strip()
+        except Exception:
+            llm_answer = ""
+        return _rag_update(state, cache, qvec, ctx, llm_answer, t0, chunks)
+    except Exception as e:
+        return _rag_result(f"RAG failed: {e}", t0)
+
+
+@_observed
+async def arag_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Async variant of `rag_node`: retrieval runs in a worker thread, the LLM call is awaited."""
+    t0 = time.perf_counter()
+    cache, qvec, hit = await asyncio.to_thread(_cache_lookup, state, settings)
+    if hit is not None:
+        return _cached_update(hit, t0)
+    try:
+        chunks = await asyncio.to_thread(
+            search_chunks, _question(state), settings, settings.RETRIEVAL_CANDIDATES, _scope(state)
+        )
+        if not chunks:
+            return _no_docs(t0)
+        ctx = build_context(_question(state), [c.text for c in chunks], settings)
+        try:
+            llm_answer = (await _rag_chain(settings).ainvoke(
+                {"q": _question(state), "ctx": ctx.text},
+                config=_chain_config(_city(state)),
+            ) or "").strip()
+        except Exception:
+            llm_answer = ""
+        return _rag_update(state, cache, qvec, ctx, llm_answer, t0, chunks)
+    except Exception as e:
+        return _rag_result(f"RAG failed: {e}", t0)
+
+
+def _rewrite_then_rag(rewrite: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    return {**rewrite, **update, "timings": _merge_timings(rewrite.get("timings"), update.get("timings"))}
+
+
+def rag_branch(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """`memory_node` then `rag_node` in one graph step.
+
+    Graph steps are barriers: as separate nodes, the weather lookup would either wait for the
+    rewrite or hold up retrieval. As one node, weather overlaps both.
+    """
+    rewrite = memory_node(state, settings)
+    return _rewrite_then_rag(rewrite, rag_node({**state, **rewrite}, settings))
+
 
-    # ---------- RAG ----------
-    rag_ctx: List[str] = []
-    rag_answer = ""
+async def arag_branch(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Async variant of `rag_branch`."""
+    rewrite = await amemory_node(state, settings)
+    return _rewrite_then_rag(rewrite, await arag_node({**state, **rewrite}, settings))
+
+
+# ---------- WEATHER ----------
+@_observed
+def weather_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Current weather for the requested city, formatted as a single line."""
+    t0 = time.perf_counter()
+    city = _city(state)
     try:
-        docs = rag_retrieve(state["query"], settings, k=5)
-        if docs:
-            rag_ctx = docs
-            try:
-                llm = get_chat_model(settings.MODEL_NAME)
-                context = "\n\n".join(docs)
-                prompt = ChatPromptTemplate.from_messages([
-                    ("system", "You are a helpful RAG assistant. Answer using ONLY the provided context. "
-                               "If the answer isn't in the context, say you don't know."),
-                    ("human", "Question: {q}\n\nContext:\n{ctx}\n\nAnswer (cite which snippet you used if helpful):")
-                ])
-                chain = prompt | llm | StrOutputParser()
-                # Add tags/metadata so traces look nice in LangSmith
-                rag_answer = (chain.invoke(
-                    {"q": state["query"], "ctx": context},
-                    config={
-                        "tags": ["assignment", "rag", "both-node"],
-                        "metadata": {"route": "both", "city": city or None},
-                    }
-                ) or "").strip()
-            except Exception:
-                rag_answer = ""
-            if not rag_answer:
-                rag_answer = _extractive_fallback(docs)
+        if city:
+            weather_block = _format_weather(fetch_weather(city, settings.OPENWEATHERMAP_API_KEY))
         else:
-            rag_answer = "I couldn't find anything relevant in the uploaded PDF."
+            weather_block = _NO_CITY
     except Exception as e:
-        rag_answer = f"RAG failed: {e}"
+        weather_block = f"Weather lookup failed: {e}"
+    return {"weather": weather_block, "timings": {"weather": time.perf_counter() - t0}}
 
-    # ---------- WEATHER ----------
-    weather_block = ""
+
+@_observed
+async def aweather_node(state: AppState, settings: Settings) -> Dict[str, Any]:
+    """Async variant of `weather_node` over the pooled httpx client (no worker thread)."""
+    t0 = time.perf_counter()
+    city = _city(state)
     try:
         if city:
-            w = fetch_weather(city, settings.OPENWEATHERMAP_API_KEY)
-            feels = getattr(w, "feels_like_c", None)
-            hum = getattr(w, "humidity_pct", None)
-            wind = getattr(w, "wind_kph", None)
-            details = []
-            if isinstance(feels, (int, float)):
-                details.append(f"feels like {feels:.1f}°C")
-            if isinstance(hum, (int, float)):
-                details.append(f"humidity {hum:.0f}%")
-            if isinstance(wind, (int, float)):
-                details.append(f"wind {wind:.0f} km/h")
-            extra = (" | " + ", ".join(details)) if details else ""
-            weather_block = f"{w.city}: {w.description}, {w.temperature_c:.1f}°C (via {w.provider}){extra}"
+            weather_block = _format_weather(await afetch_weather(city, settings.OPENWEATHERMAP_API_KEY))
         else:
-            weather_block = "No city provided. Include a city in your question to show live weather."
+            weather_block = _NO_CITY
     except Exception as e:
         weather_block = f"Weather lookup failed: {e}"
+    return {"weather": weather_block, "timings": {"weather": time.perf_counter() - t0}}
+
 
-    # ---------- COMBINE ----------
+# ---------- COMBINE ----------
+@_observed
+def combine_node(state: AppState) -> Dict[str, Any]:
+    """Join both branches into the final markdown answer."""
+    t0 = time.perf_counter()
+    city = _city(state)
+    rag_ctx = state.get("context") or []
     combined = (
         "## 📘 PDF Answer\n"
-        f"{rag_answer}\n\n"
+        f"{state.get('rag_answer', '')}\n\n"
         "## 🌤️ Current Weather\n"
-        f"{weather_block}"
+        f"{state.get('weather', '')}"
     )
 
-    state["context"] = rag_ctx if rag_ctx else []
-    state["answer"] = combined
-
     # Best-effort dataset example (uses LANGSMITH_LOG_EXAMPLES)
     _safe_eval(
         {"query": state["query"], "city": city, "found_docs": bool(rag_ctx)},
         {"answer": combined},
         run_name="both-node",
     )
+    return {"answer": combined, "timings": {"combine": time.perf_counter() - t0}}
+
+
+def both_node(state: AppState, settings: Settings) -> AppState:
+    """Sequential memory, RAG + Weather in one call (kept for callers that don't use the graph)."""
+    steps = (
+        lambda: memory_node(state, settings),
+        lambda: rag_node(state, settings),
+        lambda: weather_node(state, settings),
+        lambda: combine_node(state),
+        lambda: remember_node(state, settings),
+    )
+    for step in steps:
+        update = step()
+        timings = _merge_timings(state.get("timings"), update.pop("timings", None))
+        state.update(update)
+        state["timings"] = timings
     return state
 
 
-def build_graph(settings: Settings):
-    """Single-node graph: always do both."""
+def build_graph(settings: Settings, checkpointer=None):
+    """RAG (memory rewrite, then retrieval) and weather in parallel, joined by `combine`,
+    then `remember`.
+
+    The rewrite turns follow-up questions into standalone ones for retrieval (an LLM call only
+    for follow-ups); `remember` keeps the bounded history window and summary up to date. With a
+    `checkpointer` (e.g. `memory.LatestCheckpointSaver`), history and summary are kept per
+    `thread_id` (pass `session_config(id)`), so callers send only the new query.
+
+    Both `invoke` and `ainvoke` are supported; each node reports its wall time in
+    `state["timings"]`.
+    """
+    async def _arag(s):
+        return await arag_branch(s, settings)
+
+    async def _aweather(s):
+        return await aweather_node(s, settings)
+
+    async def _aremember(s):
+        return await aremember_node(s, settings)
+
     graph = StateGraph(AppState)
-    graph.add_node("both", lambda s: both_node(s, settings))
-    graph.set_entry_point("both")
-    graph.add_edge("both", END)
-    return graph.compile()
+    graph.add_node("rag", RunnableLambda(lambda s: rag_branch(s, settings), afunc=_arag))
+    graph.add_node("weather", RunnableLambda(lambda s: weather_node(s, settings), afunc=_aweather))
+    graph.add_node("combine", combine_node)
+    graph.add_node("remember", RunnableLambda(lambda s: remember_node(s, settings), afunc=_aremember))
+    graph.add_edge(START, "rag")
+    graph.add_edge(START, "weather")  # needs only the city, not the rewritten query
+    graph.add_edge(["rag", "weather"], "combine")
+    graph.add_edge("combine", "remember")
+    graph.add_edge("remember", END)
+    return graph.compile(checkpointer=checkpointer)
+
+
+def session_config(session_id: str) -> Dict[str, Any]:
+    """Config for invoking a checkpointed graph on behalf of one conversation."""
+    return {"configurable": {"thread_id": session_id}}
+
+
+# ---------- STREAMING ----------
+# Events yielded by stream_turn/astream_turn:
+#   ("token", str)    - a piece of the RAG answer as the LLM produces it
+#   ("rag", str)      - the complete RAG answer (always sent; use it when no tokens streamed)
+#   ("weather", str)  - the formatted weather line, as soon as that branch finishes
+#   ("final", AppState) - the final state; timings include "ttft" and "total"
+_STREAM_MODES = ["messages", "updates", "values"]
+
+
+def _turn_event(mode: str, chunk: Any) -> Optional[Tuple[str, Any]]:
+    if mode == "messages":
+        msg, meta = chunk
+        text = getattr(msg, "content", "")
+        # The rag node also runs the follow-up rewrite; its tokens are not part of the answer
+        if (meta.get("langgraph_node") == "rag" and "memory" not in (meta.get("tags") or [])
+                and isinstance(text, str) and text):
+            return ("token", text)
+    elif mode == "updates":
+        if (chunk.get("rag") or {}).get("rag_answer") is not None:
+            return ("rag", chunk["rag"]["rag_answer"])
+        if (chunk.get("weather") or {}).get("weather") is not None:
+            return ("weather", chunk["weather"]["weather"])
+    return None
+
+
+def _finish_turn(final: Dict[str, Any], t0: float, ttft: Optional[float], breakdown: Dict[str, float]) -> Dict[str, Any]:
+    timings = dict(final.get("timings") or {})
+    timings["total"] = time.perf_counter() - t0
+    if ttft is not None:
+        timings["ttft"] = ttft
+        metrics.observe("turn.ttft", ttft)
+    metrics.observe("turn.total", timings["total"])
+    final["timings"] = timings
+    final["breakdown"] = dict(breakdown)
+    return final
+
+
+def stream_turn(graph, state: AppState, config: Optional[Dict[str, Any]] = None) -> Iterator[Tuple[str, Any]]:
+    """Run one turn through a compiled graph, yielding answer tokens and weather as they arrive.
+
+    `config` is passed to the graph (e.g. `session_config(id)` for a checkpointed graph).
+    """
+    t0 = time.perf_counter()
+    ttft: Optional[float] = None
+    final: Dict[str, Any] = dict(state)
+    with metrics.turn() as breakdown:
+        for mode, chunk in graph.stream(state, config=config, stream_mode=_STREAM_MODES):
+            if mode == "values":
+                final = chunk
+                continue
+            event = _turn_event(mode, chunk)
+            if event is None:
+                continue
+            if event[0] == "token" and ttft is None:
+                ttft = time.perf_counter() - t0
+            yield event
+    yield ("final", _finish_turn(final, t0, ttft, breakdown))
+
+
+async def astream_turn(
+    graph, state: AppState, config: Optional[Dict[str, Any]] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Async counterpart of `stream_turn` built on `graph.astream`."""
+    t0 = time.perf_counter()
+    ttft: Optional[float] = None
+    final: Dict[str, Any] = dict(state)
+    with metrics.turn() as breakdown:
+        async for mode, chunk in graph.astream(state, config=config, stream_mode=_STREAM_MODES):
+            if mode == "values":
+                final = chunk
+                continue
+            event = _turn_event(mode, chunk)
+            if event is None:
+                continue
+            if event[0] == "token" and ttft is None:
+                ttft = time.perf_counter() - t0
+            yield event
+    yield ("final", _finish_turn(final, t0, ttft, breakdown))
+
+
+# ---------- BATCH ----------
+def _batch_cities(cities: Union[None, str, Sequence[Optional[str]]], n: int) -> List[str]:
+    if cities is None or isinstance(cities, str):
+        return [cities or ""] * n
+    cities = [c or "" for c in cities]
+    if len(cities) != n:
+        raise ValueError(f"Got {n} queries but {len(cities)} cities")
+    return cities
+
+
+def _batch_weather(cities: List[str], settings: Settings, workers: int) -> Dict[str, Tuple[str, Optional[str], float]]:
+    """One lookup per distinct city: normalized city -> (weather line, error, seconds)."""
+    def _one(city: str):
+        t0 = time.perf_counter()
+        try:
+            return _format_weather(fetch_weather(city, settings.OPENWEATHERMAP_API_KEY)), None, time.perf_counter() - t0
+        except Exception as e:
+            return f"Weather lookup failed: {e}", f"weather: {e}", time.perf_counter() - t0
+
+    unique = {" ".join(c.split()).casefold(): c.strip() for c in cities if c.strip()}
+    if not unique:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(unique)))) as pool:
+        futures = {key: pool.submit(_one, city) for key, city in unique.items()}
+        return {key: fut.result() for key, fut in futures.items()}
+
+
+def batch_answer(
+    queries: Sequence[str],
+    cities: Union[None, str, Sequence[Optional[str]]] = None,
+    settings: Optional[Settings] = None,
+    max_concurrency: Optional[int] = None,
+    filter: Optional[Dict[str, Any]] = None,
+) -> List[AppState]:
+    """Answer many questions at once; returns one final state per query, in order.
+
+    Same result as invoking the graph per question, but all queries are embedded in one
+    embedder call and retrieved with one batched Qdrant request, each distinct city is
+    looked up once, and LLM calls run with at most `max_concurrency` in flight
+    (`BATCH_MAX_CONCURRENCY`). A failing item gets its message in `error` and never
+    fails the rest of the batch. `filter` (as in `params["filter"]`) scopes every query.
+    """
+    settings = settings or Settings()
+    max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+    queries = list(queries)
+    cities = _batch_cities(cities, len(queries))
+    SearchFilter.from_dict(filter)  # reject a malformed filter before any work
+    states: List[AppState] = [
+        {"history": [], "query": q, "params": {"city": c, **({"filter": filter} if filter else {})},
+         "context": [], "answer": ""}
+        for q, c in zip(queries, cities)
+    ]
+    if not states:
+        return []
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=1) as weather_pool:
+        weather_future = weather_pool.submit(_batch_weather, cities, settings, max_concurrency)
+        updates, errors = _batch_rag(states, settings, max_concurrency, t0)
+        weather = weather_future.result()
+
+    for i, state in enumerate(states):
+        state.update(updates[i])
+        key = " ".join(cities[i].split()).casefold()
+        line, weather_error, weather_s = weather.get(key, (_NO_CITY, None, 0.0))
+        state["weather"] = line
+        state["timings"] = _merge_timings(state.get("timings"), {"weather": weather_s})
+        error = errors[i] or weather_error
+        if error:
+            state["error"] = error
+        else:
+            state.pop("error", None)  # only failed items carry one
+        update = combine_node(state)
+        state["timings"] = _merge_timings(state.get("timings"), update.pop("timings", None))
+        state.update(update)
+    return states
+
+
+def _batch_rag(states: List[AppState], settings: Settings, max_concurrency: int, t0: float):
+    """RAG updates and per-item errors for `batch_answer` (cache, retrieval, LLM)."""
+    n = len(states)
+    updates: List[Dict[str, Any]] = [{} for _ in range(n)]
+    errors: List[Optional[str]] = [None] * n
+    queries = [s["query"] for s in states]
+    scope = _scope(states[0])  # one filter for the whole batch
+
+    try:
+        qvecs = embed_queries(queries, settings)
+    except Exception:
+        qvecs = None
+    try:
+        cache = answer_cache_for(settings) if scope is None else None
+    except Exception:
+        cache = None
+    pending = []
+    for i, q in enumerate(queries):
+        hit = cache.lookup(q, None if qvecs is None else qvecs[i]) if cache is not None else None
+        if hit is not None:
+            updates[i] = _cached_update(hit, t0)
+        else:
+            pending.append(i)
+    if not pending:
+        return updates, errors
+
+    try:
+        chunks_per_query = search_chunks_batch(
+            [queries[i] for i in pending], settings, k=settings.RETRIEVAL_CANDIDATES,
+            qvecs=None if qvecs is None else qvecs[pending], filter=scope,
+        )
+    except Exception as e:
+        for i in pending:
+            updates[i] = _rag_result(f"RAG failed: {e}", t0)
+            errors[i] = f"rag: {e}"
+        return updates, errors
+
+    to_answer = []
+    for i, chunks in zip(pending, chunks_per_query):
+        if chunks:
+            to_answer.append((i, build_context(queries[i], [c.text for c in chunks], settings), chunks))
+        else:
+            updates[i] = _no_docs(t0)
+    if not to_answer:
+        return updates, errors
+
+    try:
+        answers = _rag_chain(settings).batch(
+            [{"q": queries[i], "ctx": ctx.text} for i, ctx, _ in to_answer],
+            config=[{**_chain_config(_city(states[i])), "max_concurrency": max_concurrency} for i, _, _ in to_answer],
+            return_exceptions=True,
+        )
+    except Exception as e:
+        answers = [e] * len(to_answer)
+    for (i, ctx, chunks), out in zip(to_answer, answers):
+        if isinstance(out, Exception):
+            errors[i] = f"llm: {out}"  # still answered, extractively
+            out = ""
+        qvec = None if qvecs is None else qvecs[i]
+        updates[i] = _rag_update(states[i], cache, qvec, ctx, (out or "").strip(), t0, chunks)
+    return updates, errors
@@ -0,0 +1,144 @@
+# src/graph/memory.py
+# Conversation memory: a compact rolling window of recent turns plus a running summary of
+# older ones, follow-up detection for query rewriting, and a checkpointer that keeps only the
+# latest state per session. The graph nodes using these live in agent_graph.py.
+from __future__ import annotations
+import re
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from langgraph.checkpoint.memory import InMemorySaver
+
+Message = Dict[str, str]  # {"role": "user" | "assistant", "content": "..."}
+
+# Pronouns / ellipsis that only make sense against earlier turns
+_FOLLOW_UP = re.compile(
+    r"\b(it|its|this|that|these|those|they|them|their|he|she|his|her|there|above|previous|"
+    r"same|more|else|also|again|another|other|former|latter)\b",
+    re.IGNORECASE,
+)
+_FOLLOW_UP_START = re.compile(r"^\s*(and|but|so|what about|how about|why|then)\b", re.IGNORECASE)
+
+REWRITE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "Rewrite the user's latest question as a standalone question that can be understood "
+               "without the conversation. Keep it short. Return only the question."),
+    ("human", "Conversation summary:\n{summary}\n\nRecent turns:\n{turns}\n\n"
+              "Latest question: {q}\n\nStandalone question:"),
+])
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You maintain a short running summary of a conversation about a PDF document. "
+               "Keep facts, names and open questions; drop pleasantries. At most {max_chars} characters."),
+    ("human", "Current summary:\n{summary}\n\nTurns to fold in:\n{turns}\n\nUpdated summary:"),
+])
+
+
+def _trim(text: str, max_chars: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= max_chars else text[: max_chars - 1].rstrip() + "…"
+
+
+def compact(history: Sequence[Dict[str, Any]], answer_max_chars: int) -> List[Message]:
+    """Role + content only (no retrieved context, timings, ...); long answers trimmed."""
+    out: List[Message] = []
+    for m in history or []:
+        role, content = m.get("role"), m.get("pdf_answer") or m.get("content") or ""
+        if role in ("user", "assistant") and content:
+            out.append({"role": role, "content": _trim(content, answer_max_chars) if role == "assistant" else content})
+    return out
+
+
+def format_turns(messages: Sequence[Message]) -> str:
+    return "\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in messages)
+
+
+def is_follow_up(query: str, history: Sequence[Message]) -> bool:
+    """Does `query` lean on earlier turns? (Only then is it worth an LLM rewrite.)"""
+    if not history:
+        return False
+    words = query.split()
+    return len(words) <= 3 or bool(_FOLLOW_UP.search(query)) or bool(_FOLLOW_UP_START.match(query))
+
+
+def fallback_rewrite(query: str, history: Sequence[Message]) -> str:
+    """LLM-free rewrite: anchor the follow-up to the last user question."""
+    last = next((m["content"] for m in reversed(history) if m["role"] == "user"), "")
+    return f"{query} (follow-up to: {last})" if last else query
+
+
+def fold(history: List[Message], window_turns: int) -> Tuple[List[Message], List[Message]]:
+    """(to_summarize, kept). Folds only once the window has doubled, so the summary is
+    updated every `window_turns` turns rather than on every turn."""
+    keep = 2 * max(1, window_turns)
+    if len(history) <= 2 * keep:
+        return [], history
+    return history[:-keep], history[-keep:]
+
+
+def fallback_summary(summary: str, turns: Sequence[Message], max_chars: int) -> str:
+    """LLM-free summary: previous summary plus one line per question, oldest dropped first."""
+    lines = [summary] if summary else []
+    for user, assistant in zip(turns[::2], turns[1::2]):
+        first = re.split(r"(?<=[.!?])\s", assistant["content"], maxsplit=1)[0]
+        lines.append(f"Q: {user['content']} A: {first}")
+    text = "\n".join(lines)
+    return text if len(text) <= max_chars else "…" + text[-(max_chars - 1):]
+
+
+class LatestCheckpointSaver(InMemorySaver):
+    """In-memory checkpointer that keeps only the newest checkpoint of each session.
+
+    `InMemorySaver` keeps every step of every turn, so memory grows with conversation length
+    even when the state itself is bounded. Here older checkpoints, their pending writes and
+    channel blobs no longer referenced are dropped on each `put`; with `max_threads`, the
+    least recently updated sessions are evicted as well. (No time travel / replay.)
+
+    Safe to share between threads (e.g. Streamlit sessions).
+    """
+
+    def __init__(self, *, max_threads: Optional[int] = None, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._blob_keys: Dict[Tuple[str, str], Set[tuple]] = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            ns = config["configurable"].get("checkpoint_ns", "")
+            keep = checkpoint["id"]
+            for old in [cid for cid in self.storage[thread_id][ns] if cid != keep]:
+                del self.storage[thread_id][ns][old]
+                self.writes.pop((thread_id, ns, old), None)
+            versions = checkpoint["channel_versions"]
+            keys = self._blob_keys[(thread_id, ns)]
+            keys.update((thread_id, ns, k, v) for k, v in new_versions.items())
+            for key in [k for k in keys if versions.get(k[2]) != k[3]]:
+                keys.discard(key)
+                self.blobs.pop(key, None)
+
+            self._recent[thread_id] = None
+            self._recent.move_to_end(thread_id)
+            while self.max_threads and len(self._recent) > self.max_threads:
+                evicted, _ = self._recent.popitem(last=False)
+                self.delete_thread(evicted)
+            return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+
+    def get_tuple(self, config):
+        with self._lock:
+            return super().get_tuple(config)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._recent.pop(thread_id, None)
+            for key in [k for k in self._blob_keys if k[0] == thread_id]:
+                del self._blob_keys[key]
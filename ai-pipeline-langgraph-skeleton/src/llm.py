@@ -1,16 +1,24 @@
 # src/llm.py
-from typing import Optional
-from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_openai import ChatOpenAI
-from langchain_groq import ChatGroq
+from __future__ import annotations
+from typing import TYPE_CHECKING, Any, List, Optional, Tuple
 import os
+import time
+
+from . import metrics
+from .resources import get_resource
+
+if TYPE_CHECKING:
+    from langchain_core.language_models.chat_models import BaseChatModel
 
 GROQ_DEFAULT_PRIMARY = "llama-3.3-70b-versatile"
 GROQ_DEFAULT_FALLBACK = "llama-3.1-8b-instant"
+OPENAI_DEFAULT = "gpt-4o-mini"
 DECOMMISSIONED = {
     "llama-3.1-70b-versatile": GROQ_DEFAULT_PRIMARY,
     "llama3-70b-8192": GROQ_DEFAULT_PRIMARY,
 }
+_PROVIDER_DEFAULT = {"groq": GROQ_DEFAULT_PRIMARY, "openai": OPENAI_DEFAULT}
+_OPENAI_PREFIXES = ("gpt-", "o1", "o3", "o4", "chatgpt-")
 
 def _normalize_model(name: str) -> str:
     name = (name or "").strip()
@@ -18,21 +26,140 @@ def _normalize_model(name: str) -> str:
         return GROQ_DEFAULT_PRIMARY
     return DECOMMISSIONED.get(name, name)
 
-def get_chat_model(model_name: Optional[str] = None) -> BaseChatModel:
-    groq_key = os.getenv("GROQ_API_KEY")
-    openai_key = os.getenv("OPENAI_API_KEY")
-    requested = _normalize_model(model_name or os.getenv("MODEL_NAME", GROQ_DEFAULT_PRIMARY))
+def _timeout() -> float:
+    # Per-call latency budget; on expiry the router moves on to the next model
+    try:
+        return float(os.getenv("LLM_TIMEOUT_S", "20"))
+    except ValueError:
+        return 20.0
+
+def _options(settings: Any) -> Tuple[str, float, bool]:
+    """(provider, timeout, failover) from LLM_PROVIDER / LLM_TIMEOUT_S / LLM_FAILOVER on
+    `settings`, or from the environment when there are no settings."""
+    if settings is not None:
+        return ((getattr(settings, "LLM_PROVIDER", None) or "").lower(),
+                float(getattr(settings, "LLM_TIMEOUT_S", 20.0)),
+                bool(getattr(settings, "LLM_FAILOVER", True)))
+    failover = os.getenv("LLM_FAILOVER", "true").lower() not in ("0", "false", "no")
+    return os.getenv("LLM_PROVIDER", "").lower(), _timeout(), failover
+
+def _groq(model: str, timeout: float) -> BaseChatModel:
+    from langchain_groq import ChatGroq  # provider SDKs are imported only when selected
+    return ChatGroq(model=model, temperature=0.2, request_timeout=timeout, max_retries=0)
+
+def _openai(model: str, timeout: float) -> BaseChatModel:
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=model, temperature=0.2, request_timeout=timeout, max_retries=0)
+
+def _fake(model: str, timeout: float) -> BaseChatModel:
+    from .llm_fake import FakeChatModel
+    # FAKE_LLM_LATENCY_S simulates provider latency in load tests and benchmarks
+    return FakeChatModel(timeout=timeout, latency_s=float(os.getenv("FAKE_LLM_LATENCY_S", "0") or 0))
+
+_FACTORIES: dict = {"groq": _groq, "openai": _openai, "fake": _fake}
+
+def _metrics_handler():
+    """Callback handler timing every chat model call into the "llm" / "llm.ttft" histograms."""
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class _LLMMetrics(BaseCallbackHandler):
+        def __init__(self):
+            self._started = {}
 
-    if groq_key:
+        def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+            self._started[run_id] = [time.perf_counter(), False]
+
+        def on_llm_new_token(self, token, *, run_id, **kwargs):
+            start = self._started.get(run_id)
+            if start is not None and not start[1]:
+                start[1] = True
+                metrics.observe("llm.ttft", time.perf_counter() - start[0])
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            start = self._started.pop(run_id, None)
+            if start is not None:
+                metrics.observe("llm", time.perf_counter() - start[0])
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._started.pop(run_id, None)
+            metrics.incr("llm.error")
+            if isinstance(error, _transient_errors(("openai", "groq"))):
+                metrics.incr("llm.transient_error")  # handed to the next candidate, if any
+
+    return _LLMMetrics()
+
+def _client(provider: str, model: str, timeout: float) -> BaseChatModel:
+    # One client (and HTTP connection pool) per provider + model, shared across requests
+    def build():
+        model_client = _FACTORIES[provider](model, timeout)
+        model_client.callbacks = [_metrics_handler()]
+        return model_client
+    return get_resource("llm", (provider, model, timeout), build)
+
+def _transient_errors(providers) -> Tuple[type, ...]:
+    """Errors worth failing over on: timeouts, rate limits, connection and 5xx errors."""
+    errors: List[type] = [TimeoutError, ConnectionError]
+    from .llm_fake import RateLimitError
+    errors.append(RateLimitError)
+    for module in sorted(set(providers) & {"openai", "groq"}):
         try:
-            return ChatGroq(model=requested, temperature=0.2)
-        except Exception:
-            return ChatGroq(model=GROQ_DEFAULT_PRIMARY, temperature=0.2)
+            sdk = __import__(module)
+        except ImportError:
+            continue
+        for name in ("APITimeoutError", "RateLimitError", "APIConnectionError", "InternalServerError"):
+            if hasattr(sdk, name):
+                errors.append(getattr(sdk, name))
+    try:
+        import httpx
+        errors.append(httpx.TimeoutException)
+    except ImportError:
+        pass
+    return tuple(errors)
+
+def _candidates(requested: str, failover: bool = True) -> List[Tuple[str, str]]:
+    """(provider, model) in failover order: the requested model on its provider, that
+    provider's default (and, on Groq, GROQ_DEFAULT_FALLBACK), then the other provider.
+    Without `failover` only the first of them."""
+    keys = {"groq": bool(os.getenv("GROQ_API_KEY")), "openai": bool(os.getenv("OPENAI_API_KEY"))}
+    home = "openai" if requested.startswith(_OPENAI_PREFIXES) else "groq"
+    # A model of a provider without a key is replaced by the other provider's default
+    order = [(home, requested)] if keys[home] else []
+    providers = [home, "openai" if home == "groq" else "groq"]
+    for provider in providers:
+        if not keys[provider]:
+            continue
+        order.append((provider, _PROVIDER_DEFAULT[provider]))
+        if provider == "groq":
+            order.append(("groq", GROQ_DEFAULT_FALLBACK))
+    seen, out = set(), []
+    for c in order:
+        if c not in seen:
+            seen.add(c)
+            out.append(c)
+    return out if failover else out[:1]
+
+def with_failover(models: List[BaseChatModel], providers=("openai", "groq")) -> BaseChatModel:
+    """First model, falling back to the next ones in order on transient errors only."""
+    if len(models) == 1:
+        return models[0]
+    return models[0].with_fallbacks(models[1:], exceptions_to_handle=_transient_errors(providers))
+
+def get_chat_model(model_name: Optional[str] = None, settings: Any = None) -> BaseChatModel:
+    """Chat model (behind the failover router) configured by `settings`; without settings,
+    MODEL_NAME and the LLM_* options come from the environment."""
+    default = getattr(settings, "MODEL_NAME", None) if settings is not None else os.getenv("MODEL_NAME")
+    requested = _normalize_model(model_name or default or GROQ_DEFAULT_PRIMARY)
+    provider, timeout, failover = _options(settings)
 
-    if openai_key:
-        return ChatOpenAI(model=requested, temperature=0.2)
+    if provider == "fake":
+        return _client("fake", requested, timeout)
 
-    raise RuntimeError(
-        "No LLM API key found. Set GROQ_API_KEY (preferred) or OPENAI_API_KEY.\n"
-        "Alternatively, adapt src/llm.py for a local LLM (e.g., Ollama)."
-    )
+    candidates = _candidates(requested, failover)
+    if not candidates:
+        raise RuntimeError(
+            "No LLM API key found. Set GROQ_API_KEY (preferred) or OPENAI_API_KEY.\n"
+            "Alternatively, adapt src/llm.py for a local LLM (e.g., Ollama), or set LLM_PROVIDER=fake."
+        )
+    return get_resource("llm", ("router", tuple(candidates), timeout),
+                        lambda: with_failover([_client(p, m, timeout) for p, m in candidates],
+                                              [p for p, _ in candidates]))
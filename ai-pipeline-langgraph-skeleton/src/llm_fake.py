@@ -0,0 +1,67 @@
+# src/llm_fake.py
+# Offline chat model: canned answers with configurable latency and failures.
+# Used by the tests (failover, streaming) and with LLM_PROVIDER=fake for runs without API keys.
+from __future__ import annotations
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class RateLimitError(Exception):
+    """What a provider's HTTP 429 looks like to the router."""
+
+
+class FakeChatModel(BaseChatModel):
+    """Replies `response` after `latency_s`; `error="timeout"|"rate_limit"` makes every call fail.
+
+    A call slower than `timeout` raises TimeoutError once the budget is spent, like a real
+    client with a request timeout. `calls` counts invocations.
+    """
+
+    response: str = "This is a placeholder answer from the offline fake model."
+    latency_s: float = 0.0
+    timeout: Optional[float] = None
+    error: Optional[str] = None
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _wait(self) -> None:
+        self.calls += 1
+        if self.error == "rate_limit":
+            raise RateLimitError("429 Too Many Requests")
+        if self.error == "timeout" or (self.timeout is not None and self.latency_s > self.timeout):
+            time.sleep(self.timeout or 0.0)
+            raise TimeoutError(f"no response within {self.timeout} s")
+        time.sleep(self.latency_s)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        self._wait()
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        self._wait()
+        for i, word in enumerate(self.response.split(" ")):
+            token = word if i == 0 else " " + word
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,198 @@
+# src/metrics.py
+# In-process instrumentation: span timers feeding latency histograms (p50/p95/p99), counters
+# (cache hits, fallbacks, errors) and a per-turn breakdown of where the time went.
+#
+#   with span("vector_search"): ...        # histogram "vector_search" + current turn
+#   incr("weather.cache.hit")
+#   with turn() as breakdown: ...          # breakdown: {"embed": 0.012, "llm": 1.3, ...}
+#
+# Optional exporters (METRICS_EXPORTER): "prometheus" serves prometheus_text() on
+# METRICS_HOST:METRICS_PORT/metrics (loopback unless METRICS_HOST says otherwise); "otel" also opens an OpenTelemetry span per timed span (needs
+# opentelemetry-api; a no-op without it).
+from __future__ import annotations
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .resources import get_resource
+
+_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    """Count/sum of all observations plus the last `size` samples for percentiles."""
+
+    def __init__(self, size: int = 2048):
+        self._samples = np.zeros(size, dtype=np.float64)
+        self._size = size
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self._samples[self.count % self._size] = value
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, float]:
+        n = min(self.count, self._size)
+        if not n:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+        p50, p95, p99 = np.quantile(self._samples[:n], _QUANTILES)
+        return {"count": self.count, "mean": self.total / self.count,
+                "p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+_LOCK = threading.Lock()
+_HISTOGRAMS: Dict[str, Histogram] = {}
+_COUNTERS: Dict[str, float] = {}
+_TURN: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("metrics_turn", default=None)
+_TRACER: Any = None  # OpenTelemetry tracer when the "otel" exporter is on
+
+
+def observe(name: str, seconds: float) -> None:
+    with _LOCK:
+        hist = _HISTOGRAMS.get(name)
+        if hist is None:
+            hist = _HISTOGRAMS[name] = Histogram()
+        hist.observe(seconds)
+        current = _TURN.get()
+        if current is not None:
+            current[name] = current.get(name, 0.0) + seconds
+
+
+def incr(name: str, n: float = 1) -> None:
+    with _LOCK:
+        _COUNTERS[name] = _COUNTERS.get(name, 0) + n
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block into histogram `name` (and the current turn, if any)."""
+    otel = _TRACER.start_as_current_span(name) if _TRACER is not None else None
+    if otel is not None:
+        otel.__enter__()
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0)
+        if otel is not None:
+            otel.__exit__(None, None, None)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of `span` (sync functions)."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+@contextmanager
+def turn() -> Iterator[Dict[str, float]]:
+    """Collect the spans of one request: span name -> seconds (summed when repeated).
+
+    Worker threads see the same breakdown when they run in a copy of this context
+    (asyncio.to_thread, LangGraph's executors).
+    """
+    breakdown: Dict[str, float] = {}
+    token = _TURN.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        try:
+            _TURN.reset(token)
+        except ValueError:
+            _TURN.set(None)  # closed from another context (an abandoned generator)
+
+
+def snapshot() -> Dict[str, Any]:
+    with _LOCK:
+        return {
+            "histograms": {name: h.summary() for name, h in sorted(_HISTOGRAMS.items())},
+            "counters": dict(sorted(_COUNTERS.items())),
+        }
+
+
+def reset() -> None:
+    with _LOCK:
+        _HISTOGRAMS.clear()
+        _COUNTERS.clear()
+
+
+# ---------- Exporters ----------
+def _prom_name(name: str) -> str:
+    return "rag_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def prometheus_text() -> str:
+    """Current metrics in the Prometheus text exposition format (summaries + counters)."""
+    snap = snapshot()
+    lines: List[str] = []
+    for name, s in snap["histograms"].items():
+        metric = _prom_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for q in _QUANTILES:
+            lines.append(f'{metric}{{quantile="{q}"}} {s[f"p{int(q * 100)}"]:.6f}')
+        lines.append(f"{metric}_sum {s['mean'] * s['count']:.6f}")
+        lines.append(f"{metric}_count {s['count']}")
+    for name, value in snap["counters"].items():
+        metric = _prom_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _serve_prometheus(port: int, host: str = "127.0.0.1"):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = prometheus_text().encode()
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def _otel_tracer():
+    try:
+        from opentelemetry import trace
+        return trace.get_tracer("ai-pipeline")
+    except ImportError:
+        return None
+
+
+def start_exporter(kind: Optional[str] = None, port: Optional[int] = None, host: Optional[str] = None):
+    """Start the exporter named by `kind` / METRICS_EXPORTER once per process; never raises."""
+    global _TRACER
+    kind = (kind if kind is not None else os.getenv("METRICS_EXPORTER", "")).lower()
+    try:
+        if kind == "prometheus":
+            port = port or int(os.getenv("METRICS_PORT", "9464"))
+            host = host or os.getenv("METRICS_HOST") or "127.0.0.1"
+            return get_resource("metrics_exporter", ("prometheus", host, port), lambda: _serve_prometheus(port, host))
+        if kind == "otel":
+            _TRACER = get_resource("metrics_exporter", ("otel",), _otel_tracer)
+            return _TRACER
+    except Exception:
+        pass
+    return None
@@ -0,0 +1,123 @@
+# src/rag/answer_cache.py
+from __future__ import annotations
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .. import metrics
+from ..resources import get_resource
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    context: List[str] = field(default_factory=list)
+    latency_s: float = 0.0  # what producing this answer originally cost
+    similarity: float = 1.0
+
+
+def _normalize(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().casefold()
+
+
+class SemanticAnswerCache:
+    """In-memory cache of RAG answers looked up by query-embedding cosine similarity.
+
+    A lookup returns the most similar stored question when its similarity is at least
+    `threshold`. Without a query vector, only the normalized question text is matched.
+    Entries are evicted least-recently-used once `max_entries` is reached.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 512):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: List[str] = []
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+    @staticmethod
+    def _unit(vec) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(v))
+        return v / norm if norm else v
+
+    def _rebuild(self) -> None:
+        self._keys = [k for k in self._entries if k in self._vectors]
+        self._matrix = np.vstack([self._vectors[k] for k in self._keys]) if self._keys else None
+
+    def lookup(self, query: str, vec=None) -> Optional[CachedAnswer]:
+        key = _normalize(query)
+        with self._lock:
+            hit_key, sim = (key, 1.0) if key in self._entries else (None, 0.0)
+            if hit_key is None and vec is not None and self._matrix is not None:
+                q = self._unit(vec)
+                if q.shape[0] == self._matrix.shape[1]:
+                    scores = self._matrix @ q
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.threshold:
+                        hit_key, sim = self._keys[best], float(scores[best])
+            if hit_key is None:
+                self.misses += 1
+                metrics.incr("answer_cache.miss")
+                return None
+            self._entries.move_to_end(hit_key)
+            entry = self._entries[hit_key]
+            self.hits += 1
+            self.saved_s += entry.latency_s
+            metrics.incr("answer_cache.hit")
+            return CachedAnswer(entry.query, entry.answer, list(entry.context), entry.latency_s, sim)
+
+    def store(self, query: str, answer: str, context: List[str], latency_s: float, vec=None) -> None:
+        key = _normalize(query)
+        with self._lock:
+            self._entries[key] = CachedAnswer(query, answer, list(context), latency_s)
+            self._entries.move_to_end(key)
+            if vec is not None:
+                v = self._unit(vec)
+                if self._matrix is not None and v.shape[0] != self._matrix.shape[1]:
+                    self._vectors.clear()  # embedding model changed; old vectors are useless
+                self._vectors[key] = v
+            while len(self._entries) > self.max_entries:
+                old, _ = self._entries.popitem(last=False)
+                self._vectors.pop(old, None)
+            self._rebuild()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._vectors.clear()
+            self._rebuild()
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "saved_s": self.saved_s,
+            "entries": len(self._entries),
+        }
+
+
+def answer_cache_for(settings) -> Optional[SemanticAnswerCache]:
+    """Shared cache scoped to the collection (document set) and LLM; None when disabled.
+
+    Indexing or deleting documents drops it via `invalidate("answer_cache")`.
+    """
+    if not getattr(settings, "ANSWER_CACHE", True):
+        return None
+    key = (settings.QDRANT_COLLECTION, getattr(settings, "MODEL_NAME", None))
+    return get_resource("answer_cache", key, lambda: SemanticAnswerCache(
+        threshold=getattr(settings, "ANSWER_CACHE_THRESHOLD", 0.95),
+        max_entries=getattr(settings, "ANSWER_CACHE_SIZE", 512),
+    ))
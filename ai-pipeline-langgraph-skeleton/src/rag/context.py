@@ -0,0 +1,194 @@
+# src/rag/context.py
+# Turns over-fetched retrieval candidates into the prompt context:
+# drop near-duplicates, trim text repeated from chunk overlap, optionally rerank with a local
+# cross-encoder, then pack the best passages into a token budget.
+from __future__ import annotations
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from ..resources import get_resource
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# The encoding may have to be downloaded: a failed load (offline) is retried after this long
+# rather than on every count
+_LOAD_RETRY_S = 60.0
+_FAILED_LOADS: Dict[str, float] = {}  # encoding -> monotonic time of the last failure
+
+
+def _tiktoken_counter(encoding: str) -> Callable[[str], int]:
+    import tiktoken
+    enc = tiktoken.get_encoding(encoding)
+    return lambda text: len(enc.encode(text, disallowed_special=()))
+
+
+def load_tokenizer(encoding: str = "cl100k_base") -> Optional[Callable[[str], int]]:
+    """Shared token counter for `encoding`; None while tiktoken or the encoding is unavailable.
+
+    Called by the warm-up, so the BPE file is fetched at startup instead of during a request.
+    """
+    failed_at = _FAILED_LOADS.get(encoding)
+    if failed_at is not None and time.monotonic() - failed_at < _LOAD_RETRY_S:
+        return None
+    try:
+        counter = get_resource("tokenizer", encoding, lambda: _tiktoken_counter(encoding))
+    except Exception:
+        _FAILED_LOADS[encoding] = time.monotonic()
+        return None
+    _FAILED_LOADS.pop(encoding, None)
+    return counter
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens of `text` (cl100k_base when available, else ~4 characters per token)."""
+    counter = load_tokenizer()
+    if counter is not None:
+        return counter(text)
+    return (len(text) + 3) // 4
+
+
+def _load_cross_encoder(model_name: str):
+    try:
+        from sentence_transformers import CrossEncoder
+        return CrossEncoder(model_name)
+    except Exception:
+        return None
+
+
+def rerank(query: str, passages: List[str], model_name: Optional[str]) -> List[str]:
+    """Passages ordered by cross-encoder relevance; unchanged without a model."""
+    if not model_name or len(passages) < 2:
+        return passages
+    model = get_resource("reranker", model_name, lambda: _load_cross_encoder(model_name))
+    if model is None:
+        return passages
+    try:
+        scores = model.predict([(query, p) for p in passages])
+    except Exception:
+        return passages
+    order = sorted(range(len(passages)), key=lambda i: -float(scores[i]))
+    return [passages[i] for i in order]
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    words = _WORD.findall(text.lower())
+    return {tuple(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+
+
+def _overlap(a: str, b: str, min_chars: int, max_chars: int) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b` (0 if under `min_chars`)."""
+    probe = b[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    start = max(0, len(a) - max_chars)
+    pos = a.find(probe, start)
+    while pos != -1:
+        if b.startswith(a[pos:]):
+            return len(a) - pos
+        pos = a.find(probe, pos + 1)
+    return 0
+
+
+def dedupe(
+    passages: List[str],
+    similarity: float = 0.8,
+    min_overlap: int = 40,
+    max_overlap: int = 400,
+) -> List[str]:
+    """Drop near-duplicates and cut text already present at a kept passage's edge.
+
+    Neighbouring chunks share up to `chunk_overlap` characters; whichever of the two ranks
+    lower loses the shared span. Passages whose word 3-shingles are at least `similarity`
+    (Jaccard) alike a kept passage are dropped entirely.
+    """
+    kept: List[str] = []
+    kept_shingles: List[set] = []
+    for text in passages:
+        text = text.strip()
+        for other in kept:
+            cut = _overlap(other, text, min_overlap, max_overlap)
+            if cut:
+                text = text[cut:].lstrip()
+            cut = _overlap(text, other, min_overlap, max_overlap)
+            if cut:
+                text = text[:-cut].rstrip()
+        if not text:
+            continue
+        sh = _shingles(text)
+        if any(len(sh & o) / max(1, len(sh | o)) >= similarity for o in kept_shingles):
+            continue
+        kept.append(text)
+        kept_shingles.append(sh)
+    return kept
+
+
+def _truncate(text: str, budget: int) -> str:
+    if count_tokens(text) <= budget:
+        return text
+    lo, hi = 0, len(text)
+    while lo < hi:  # longest prefix that fits
+        mid = (lo + hi + 1) // 2
+        if count_tokens(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo].rstrip()
+
+
+def pack(passages: List[str], budget: int, separator: str = "\n\n") -> List[str]:
+    """Greedily keep passages in rank order while they fit in `budget` tokens.
+
+    A passage that doesn't fit is skipped (a later, shorter one may still fit); the top
+    passage is truncated rather than dropped when it alone exceeds the budget.
+    """
+    out: List[str] = []
+    used = 0
+    sep = count_tokens(separator)
+    for i, text in enumerate(passages):
+        cost = count_tokens(text) + (sep if out else 0)
+        if used + cost <= budget:
+            out.append(text)
+            used += cost
+        elif i == 0:
+            out.append(_truncate(text, budget))
+            used = budget
+    return out
+
+
+@dataclass
+class ContextReport:
+    passages: List[str] = field(default_factory=list)
+    candidates: int = 0
+    duplicates: int = 0      # candidates dropped as near-duplicates
+    tokens_in: int = 0       # all candidates joined as-is
+    tokens_out: int = 0      # the packed context
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_in - self.tokens_out)
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.passages)
+
+    def stats(self) -> dict:
+        return {"candidates": self.candidates, "duplicates": self.duplicates, "tokens_in": self.tokens_in,
+                "tokens_out": self.tokens_out, "tokens_saved": self.tokens_saved}
+
+
+def build_context(query: str, candidates: List[str], settings) -> ContextReport:
+    """Dedupe, rerank and budget-pack retrieved chunks for the prompt."""
+    candidates = [c for c in candidates if c and c.strip()]
+    unique = dedupe(candidates)
+    ranked = rerank(query, unique, getattr(settings, "RERANK_MODEL", None))
+    passages = pack(ranked, getattr(settings, "CONTEXT_TOKEN_BUDGET", 1500))
+    report = ContextReport(
+        passages=passages,
+        candidates=len(candidates),
+        duplicates=len(candidates) - len(unique),
+        tokens_in=count_tokens("\n\n".join(candidates)),
+    )
+    report.tokens_out = count_tokens(report.text)
+    return report
@@ -0,0 +1,140 @@
+# src/rag/embed_batcher.py
+# Dynamic micro-batching of query embeddings: concurrent `embed` calls (one query each, from
+# many request threads) are collected for a few milliseconds and run as one batched call on
+# the shared model, which costs little more than embedding a single query.
+from __future__ import annotations
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .. import metrics
+from ..metrics import Histogram
+
+Embedder = Callable[[List[str]], np.ndarray]
+_Request = Tuple[List[str], "Future[np.ndarray]", float]
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into batched calls of `embed_fn`.
+
+    A worker thread takes the first waiting request, then keeps collecting more until
+    `max_batch_size` texts are pending or `max_wait_ms` has passed, and embeds them all in one
+    call. Under light load a request waits at most `max_wait_ms`; under heavy load batches
+    fill up while the model is busy with the previous one. A request larger than
+    `max_batch_size` forms a batch of its own. Errors are raised in every caller of the batch.
+    """
+
+    def __init__(self, embed_fn: Embedder, max_batch_size: int = 32, max_wait_ms: float = 2.0):
+        self._embed_fn = embed_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._submit_lock = threading.Lock()
+        self._wait = Histogram()    # enqueue -> batch start, per request
+        self._latency = Histogram()  # enqueue -> result, per request
+        self._batch_sizes = Histogram()
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.busy_s = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="embed-batcher", daemon=True)
+        self._thread.start()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """(n, d) float32 vectors for `texts`; blocks until its batch has been embedded."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        future: "Future[np.ndarray]" = Future()
+        with self._submit_lock:
+            closed = self._closed
+            if not closed:
+                self._queue.put((texts, future, time.perf_counter()))
+        return self._embed_fn(texts) if closed else future.result()
+
+    __call__ = embed
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Finish queued requests, then stop the worker."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)  # after every accepted request
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            wait, latency, sizes = self._wait.summary(), self._latency.summary(), self._batch_sizes.summary()
+            return {
+                "requests": self.requests,
+                "texts": self.texts,
+                "batches": self.batches,
+                "mean_batch_size": round(sizes["mean"], 2),
+                "max_batch_size": self.max_batch_size,
+                "texts_per_s": round(self.texts / self.busy_s, 1) if self.busy_s else 0.0,
+                "queue_wait_ms": {k: round(wait[k] * 1000, 2) for k in ("p50", "p95", "p99")},
+                "latency_ms": {k: round(latency[k] * 1000, 2) for k in ("p50", "p95", "p99")},
+            }
+
+    # ---------- worker thread ----------
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size, stop = [first], len(first[0]), False
+            deadline = time.perf_counter() + self.max_wait_s
+            while size < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    nxt = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                if size + len(nxt[0]) > self.max_batch_size:
+                    self._embed_batch(batch)  # the newcomer starts the next batch
+                    batch, size = [], 0
+                    deadline = time.perf_counter() + self.max_wait_s
+                batch.append(nxt)
+                size += len(nxt[0])
+            self._embed_batch(batch)
+            if stop:
+                return
+
+    def _embed_batch(self, batch: List[_Request]) -> None:
+        if not batch:
+            return
+        texts = [t for texts, _, _ in batch for t in texts]
+        started = time.perf_counter()
+        try:
+            vecs = self._embed_fn(texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            metrics.incr("embed.batch.error")
+            return
+        done = time.perf_counter()
+        metrics.observe("embed.batch", done - started)
+        metrics.incr("embed.batched_texts", len(texts))
+        with self._lock:
+            self.requests += len(batch)
+            self.texts += len(texts)
+            self.batches += 1
+            self.busy_s += done - started
+            self._batch_sizes.observe(len(texts))
+            for _, _, enqueued in batch:
+                self._wait.observe(started - enqueued)
+                self._latency.observe(done - enqueued)
+        offset = 0
+        for texts_i, future, _ in batch:
+            future.set_result(vecs[offset: offset + len(texts_i)])
+            offset += len(texts_i)
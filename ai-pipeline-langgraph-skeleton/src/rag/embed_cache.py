@@ -0,0 +1,161 @@
+# src/rag/embed_cache.py
+from __future__ import annotations
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import metrics
+
+Vector = np.ndarray  # 1-D float32
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding store: in-memory LRU in front of a SQLite table.
+
+    Rows are keyed by (model name, sha256 of the text) and hold float32 bytes. When the table
+    grows past `max_entries`, the least recently used rows are evicted down to 90% of it.
+    """
+
+    def __init__(self, path: str, max_entries: int = 200_000, memory_entries: int = 4096):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._lock = threading.Lock()
+        self._lru: "OrderedDict[Tuple[str, str], Vector]" = OrderedDict()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL,"
+            " PRIMARY KEY (model, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+        self._db.commit()
+        # Upper bound on the row count (replaced rows are counted as new), so writes only
+        # pay for an exact COUNT(*) once the table may have outgrown `max_entries`
+        (self._rows,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---------- lookup ----------
+    def _remember(self, slot: Tuple[str, str], vec: Vector) -> None:
+        self._lru[slot] = vec
+        self._lru.move_to_end(slot)
+        while len(self._lru) > self.memory_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[Vector]]:
+        keys = [text_key(t) for t in texts]
+        out: List[Optional[Vector]] = [None] * len(texts)
+        with self._lock:
+            pending: Dict[str, List[int]] = {}
+            for i, k in enumerate(keys):
+                vec = self._lru.get((model, k))
+                if vec is not None:
+                    self._lru.move_to_end((model, k))
+                    out[i] = vec
+                    self.memory_hits += 1
+                else:
+                    pending.setdefault(k, []).append(i)
+            if pending:
+                found = self._load(model, list(pending))
+                for k, vec in found.items():
+                    self._remember((model, k), vec)
+                    for i in pending[k]:
+                        out[i] = vec
+                        self.disk_hits += 1
+                self.misses += sum(len(v) for k, v in pending.items() if k not in found)
+        return out
+
+    def _load(self, model: str, keys: List[str]) -> Dict[str, Vector]:
+        found: Dict[str, Vector] = {}
+        for start in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = self._db.execute(
+                f"SELECT key, vec FROM embeddings WHERE model = ? AND key IN ({marks})",
+                [model, *chunk],
+            ).fetchall()
+            for k, blob in rows:
+                found[k] = np.frombuffer(blob, dtype=np.float32)
+        if found:
+            now = time.time()
+            self._db.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                [(now, model, k) for k in found],
+            )
+            self._db.commit()
+        return found
+
+    # ---------- store ----------
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence[Vector]) -> None:
+        now = time.time()
+        rows = []
+        with self._lock:
+            for t, v in zip(texts, vectors):
+                k = text_key(t)
+                v = np.array(v, dtype=np.float32)  # copy: don't pin the caller's whole batch
+                self._remember((model, k), v)
+                rows.append((model, k, v.tobytes(), now))
+            self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._rows += len(rows)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self) -> None:
+        if self._rows <= self.max_entries:
+            return
+        (self._rows,) = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if self._rows <= self.max_entries:
+            return
+        drop = self._rows - int(self.max_entries * 0.9)
+        self._db.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (drop,),
+        )
+        self._rows -= drop
+
+    # ---------- helpers ----------
+    def embed(self, model: str, texts: Sequence[str], embed_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return an (n, dim) float32 array for `texts`, calling `embed_fn` only for the misses."""
+        out = self.get_many(model, texts)
+        missing = [i for i, v in enumerate(out) if v is None]
+        metrics.incr("embed_cache.hit", len(out) - len(missing))
+        metrics.incr("embed_cache.miss", len(missing))
+        if missing:
+            # Deduplicate so a text repeated in one call is embedded once
+            uniq = list(dict.fromkeys(texts[i] for i in missing))
+            fresh = dict(zip(uniq, embed_fn(uniq)))
+            self.put_many(model, uniq, [fresh[t] for t in uniq])
+            for i in missing:
+                out[i] = fresh[texts[i]]
+        if not out:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.vstack(out), dtype=np.float32)
+
+    def stats(self) -> Dict[str, float]:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (hits / total) if total else 0.0,
+            "memory_entries": len(self._lru),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
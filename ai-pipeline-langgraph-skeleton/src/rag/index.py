@@ -1,6 +1,18 @@
 from __future__ import annotations
-import os, tempfile
-from typing import List, Callable, Optional
+import hashlib
+import logging
+import os
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .. import metrics
+from ..resources import get_resource, invalidate
 
 # Where we keep a TF-IDF vectorizer so queries match the index
 def _vectorizer_path(settings) -> str:
@@ -9,91 +21,411 @@ def _vectorizer_path(settings) -> str:
     name = getattr(settings, "QDRANT_COLLECTION", "assignment_docs")
     return os.path.join(base, f"{name}_tfidf.joblib")
 
-def _fastembed_embedder(model_name: Optional[str]) -> Optional[Callable[[List[str]], List[List[float]]]]:
+log = logging.getLogger(__name__)
+
+# A model that failed to load (offline, not yet downloaded) is retried after this long rather
+# than on every call, since each attempt may go to the network
+_LOAD_RETRY_S = 60.0
+_FAILED_LOADS: Dict[Tuple[str, Optional[int]], float] = {}  # (model, threads) -> monotonic time
+
+def _load_text_embedding(model_name: str, threads: Optional[int] = None):
     try:
+        from fastembed import TextEmbedding
+    except ImportError:
         from qdrant_client.fastembed import TextEmbedding
-        te = TextEmbedding(model_name or "BAAI/bge-small-en-v1.5")
-        def _embed(texts: List[str]) -> List[List[float]]:
-            return [vec.tolist() for vec in te.embed(texts)]
-        return _embed
+    # `threads` caps ONNX Runtime's intra-op parallelism (None: one thread per core)
+    return TextEmbedding(model_name, threads=threads) if threads else TextEmbedding(model_name)
+
+# Embedders return a contiguous (n, dim) float32 array; TF-IDF returns a float32 CSR matrix.
+Embedder = Callable[[List[str]], np.ndarray]
+
+def _fastembed_embedder(model_name: Optional[str], threads: Optional[int] = None) -> Optional[Embedder]:
+    # The ONNX model is loaded once per process and shared; a failed load is not cached, so
+    # the model is picked up once it becomes available (at most every _LOAD_RETRY_S)
+    name = model_name or "BAAI/bge-small-en-v1.5"
+    key = (name, threads)
+    failed_at = _FAILED_LOADS.get(key)
+    if failed_at is not None and time.monotonic() - failed_at < _LOAD_RETRY_S:
+        return None
+    try:
+        te = get_resource("embedder", key, lambda: _load_text_embedding(name, threads))
     except Exception:
+        if failed_at is None:  # once per outage, not on every retry
+            log.warning("FastEmbed model %s could not be loaded; falling back to TF-IDF", name, exc_info=True)
+        metrics.incr("embedder.load_failed")
+        _FAILED_LOADS[key] = time.monotonic()
+        return None
+    _FAILED_LOADS.pop(key, None)
+    def _embed(texts: List[str]) -> np.ndarray:
+        vecs = list(te.embed(texts))
+        if not vecs:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.vstack(vecs), dtype=np.float32)
+    return _embed
+
+def _embed_cache(settings):
+    if not getattr(settings, "EMBED_CACHE", True):
         return None
+    base = os.getenv("QDRANT_LOCAL_PATH", "./.qdrant")
+    path = os.path.abspath(os.path.join(base, "embed_cache.sqlite"))
+    from .embed_cache import EmbeddingCache
+    return get_resource("embed_cache", path, lambda: EmbeddingCache(
+        path,
+        max_entries=getattr(settings, "EMBED_CACHE_MAX_ENTRIES", 200_000),
+        memory_entries=getattr(settings, "EMBED_CACHE_MEMORY_ENTRIES", 4096),
+    ))
+
+def _query_batcher(settings, name: str, threads: Optional[int], embedder: Embedder):
+    from .embed_batcher import EmbeddingBatcher
+    max_batch = getattr(settings, "EMBED_BATCH_MAX_SIZE", 32)
+    max_wait_ms = getattr(settings, "EMBED_BATCH_MAX_WAIT_MS", 2.0)
+    return get_resource("embed_batcher", (name, threads, max_batch, max_wait_ms),
+                        lambda: EmbeddingBatcher(embedder, max_batch_size=max_batch, max_wait_ms=max_wait_ms))
+
+def _dense_embedder(settings, queries: bool = False) -> Optional[Embedder]:
+    """FastEmbed embedder for `settings`, behind the on-disk embedding cache when enabled.
+
+    Used by both indexing and querying, so re-uploaded chunks and repeated questions are
+    not re-embedded. TF-IDF vectors are not cached: they depend on the fitted vocabulary.
+    With `queries` (and EMBED_BATCHING), cache misses from concurrent requests are embedded
+    together by the shared micro-batcher.
+    """
+    model = getattr(settings, "EMBEDDINGS_MODEL", None)
+    name = model or "BAAI/bge-small-en-v1.5"
+    threads = getattr(settings, "EMBED_THREADS", 0) or None
+    embedder = _fastembed_embedder(model, threads)
+    if embedder is not None and queries and getattr(settings, "EMBED_BATCHING", True):
+        embedder = _query_batcher(settings, name, threads, embedder).embed
+    cache = _embed_cache(settings) if embedder is not None else None
+    if cache is None:
+        return embedder
+    return lambda texts: cache.embed(name, texts, embedder)
 
-def _tfidf_fit_transform(texts: List[str], save_path: str, max_features: int = 384) -> List[List[float]]:
+def _load_vectorizer(path: str):
+    import joblib
+    # mtime in the key so a vectorizer refit by another process is picked up
+    return get_resource("tfidf", (path, os.path.getmtime(path)), lambda: joblib.load(path))
+
+def _tfidf_fit_transform(texts: List[str], save_path: str, max_features: int = 384):
     from sklearn.feature_extraction.text import TfidfVectorizer
     import joblib
     vec = TfidfVectorizer(max_features=max_features, ngram_range=(1, 2))
     mat = vec.fit_transform(texts)
     joblib.dump(vec, save_path)
-    dense = mat.toarray().astype("float32")
-    return dense.tolist()
+    invalidate("tfidf")
+    return mat.astype(np.float32)
 
-def _tfidf_transform(texts: List[str], load_path: str) -> List[List[float]]:
-    import joblib
-    vec = joblib.load(load_path)
+def _tfidf_transform(texts: List[str], load_path: str):
+    vec = _load_vectorizer(load_path)
     mat = vec.transform(texts)
-    dense = mat.toarray().astype("float32")
-    return dense.tolist()
+    return mat.astype(np.float32)  # stays sparse; densified per upsert batch
+
+# qdrant-client (hybrid only) and the PDF stack are imported inside the functions that need
+# them, so importing this module for dense/local retrieval stays cheap
+from ..vectorstore.base import SearchFilter, get_vector_store
+
+# Namespace for content-derived point ids (uuid5 of "<doc_id>:<chunk_hash>")
+_POINT_NS = uuid.UUID("6f1c1d2e-5a0b-4d8e-9a57-0c3b0f6f2a11")
+
+@dataclass
+class IndexReport:
+    doc_id: str
+    chunks: int
+    added: int
+    skipped: int
+
+@dataclass
+class RetrievedChunk:
+    """One search hit: the chunk text, its score and the rest of its payload."""
+    text: str
+    score: float  # cosine similarity (dense), RRF score (hybrid)
+    metadata: dict = field(default_factory=dict)  # source, page (0-based), doc_id, indexed_at, ...
 
-from .pdf_loader import load_and_chunk_pdf
-from ..vectorstore.qdrant_store import get_qdrant
-from qdrant_client.http import models as qm
+    @classmethod
+    def from_hit(cls, score: float, payload: Optional[dict]) -> "RetrievedChunk":
+        metadata = dict(payload or {})
+        return cls(text=metadata.pop("text", ""), score=float(score), metadata=metadata)
 
-def index_pdf_into_qdrant(uploaded_file, settings):
-    # Save uploaded file
+    def citation(self) -> dict:
+        """source / 1-based page / score / doc_id, for showing where an answer came from."""
+        page = self.metadata.get("page")
+        return {"source": self.metadata.get("source"), "page": page + 1 if isinstance(page, int) else None,
+                "score": round(self.score, 4), "doc_id": self.metadata.get("doc_id")}
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _point_id(doc_id: str, chunk_hash: str) -> str:
+    return str(uuid.uuid5(_POINT_NS, f"{doc_id}:{chunk_hash}"))
+
+def _hybrid(settings) -> bool:
+    # Sparse vectors and fusion are Qdrant features; the local backend is dense-only
+    return (getattr(settings, "RETRIEVAL_MODE", "dense") == "hybrid"
+            and getattr(settings, "VECTOR_BACKEND", "qdrant") == "qdrant")
+
+def _batched(items: Iterable, n: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _save_upload(uploaded_file) -> Tuple[str, str]:
+    """Copy the upload to a temp file in 1 MiB blocks; return (path, doc_id)."""
+    digest = hashlib.sha256()
     with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(uploaded_file.read())
-        tmp_path = tmp.name
-
-    docs = load_and_chunk_pdf(tmp_path)
-    os.unlink(tmp_path)
-    if not docs:
-        return
-
-    texts = [d.page_content for d in docs]
-    metadatas = [d.metadata for d in docs]
-
-    # Embedding strategy (torchless)
-    embedder = _fastembed_embedder(getattr(settings, "EMBEDDINGS_MODEL", None))
-    if embedder is not None:
-        vectors = embedder(texts)
-        dim = len(vectors[0])
-        # Remove any old TF-IDF vectorizer if switching to FastEmbed
+        while True:
+            block = uploaded_file.read(1 << 20)
+            if not block:
+                break
+            digest.update(block)
+            tmp.write(block)
+    return tmp.name, digest.hexdigest()[:16]
+
+def index_pdf_into_qdrant(
+    uploaded_file,
+    settings,
+    progress: Optional[Callable[[float, str], None]] = None,
+) -> Optional[IndexReport]:
+    """Chunk, embed and store an uploaded PDF.
+
+    Pages are extracted (in a process pool for large PDFs) and chunked lazily; chunks are
+    embedded and upserted UPSERT_BATCH_SIZE at a time, so memory stays bounded by one batch.
+    `progress(fraction, message)` is called after each batch. Every chunk's payload carries
+    `source`, `page`, `doc_id` and `indexed_at` (upload time), and those fields get Qdrant
+    payload indexes, so searches can be scoped to a document, pages or an upload window.
+
+    With RETRIEVAL_MODE="hybrid" every chunk also gets a BM25 sparse vector (and the dense
+    vector is named); without a dense model the collection is sparse-only.
+
+    INDEX_MODE="replace" recreates the collection (one document at a time); "append" keeps
+    what is there and skips chunks already stored. Point ids are derived from the document
+    hash and the chunk hash, so re-uploading the same file is a no-op in append mode.
+    """
+    from . import sparse
+    from .pdf_loader import iter_pdf_chunks, page_count
+    from ..vectorstore.qdrant_store import ensure_hybrid_collection, upsert_hybrid
+
+    tmp_path, doc_id = _save_upload(uploaded_file)
+    source = os.path.basename(getattr(uploaded_file, "name", "") or "") or None
+    indexed_at = time.time()
+    try:
+        total_pages = page_count(tmp_path)
+        chunks: Iterable = iter_pdf_chunks(tmp_path, workers=getattr(settings, "PDF_WORKERS", 0),
+                                           total=total_pages)
+
+        store = get_vector_store(settings)
+        name = settings.QDRANT_COLLECTION
+        append = getattr(settings, "INDEX_MODE", "replace") == "append"
         vec_file = _vectorizer_path(settings)
-        if os.path.exists(vec_file):
-            try: os.remove(vec_file)
-            except Exception: pass
-    else:
-        # FIXED TF-IDF size = 384 so we never conflict later
+        hybrid = _hybrid(settings)
+
+        # Embedding strategy (torchless)
+        embedder = _dense_embedder(settings)
+        embed: Optional[Callable] = embedder
+        dim: Optional[int] = None
+        fitted = False
+        if embedder is not None:
+            # Remove any old TF-IDF vectorizer if switching to FastEmbed
+            if os.path.exists(vec_file):
+                try: os.remove(vec_file)
+                except Exception: pass
+                invalidate("tfidf")
+        elif hybrid:
+            pass  # sparse-only: BM25 replaces the capped, densified TF-IDF fallback
+        else:
+            # TF-IDF needs the whole corpus to fit, so this fallback materialises the chunks.
+            # A refit means a new vocabulary: vectors already stored are no longer comparable.
+            fitted = not (append and store.collection_exists(name)) or not os.path.exists(vec_file)
+            if fitted:
+                chunks = list(chunks)
+                if not chunks:
+                    return None
+                # FIXED TF-IDF size = 384 so we never conflict later
+                _tfidf_fit_transform([c.page_content for c in chunks], vec_file, max_features=384)
+            embed = partial(_tfidf_transform, load_path=vec_file)
+            dim = len(_load_vectorizer(vec_file).vocabulary_)
+
+        batch_size = max(1, int(getattr(settings, "UPSERT_BATCH_SIZE", 256)))
+        report = IndexReport(doc_id=doc_id, chunks=0, added=0, skipped=0)
+        seen: Set[str] = set()
+        for docs in _batched(chunks, batch_size):
+            texts = [d.page_content for d in docs]
+            hashes = [_sha256(t.encode("utf-8")) for t in texts]
+            ids = [_point_id(doc_id, h) for h in hashes]
+
+            if report.chunks == 0:
+                if dim is None and embed is not None:
+                    dim = embed(texts[:1]).shape[1]
+                if hybrid:
+                    ensure_hybrid_collection(store.client, name, dim, recreate=not append, profile=store.profile)
+                elif not append or fitted:
+                    # Recreate collection with the exact dim we’re about to insert
+                    store.recreate_collection(name, dim)
+                else:
+                    store.ensure_collection(name, dim)  # recreates only if the dim changed
+                store.ensure_payload_indexes(name)
+
+            # Skip chunks already stored (append mode) and exact duplicates within the file
+            stored = store.existing_ids(name, ids) if append else set()
+            todo = []
+            for i, pid in enumerate(ids):
+                if pid not in stored and pid not in seen:
+                    todo.append(i)
+                seen.add(pid)
+
+            if todo:
+                payloads = [
+                    {"text": texts[i], **(docs[i].metadata or {}), **({"source": source} if source else {}),
+                     "doc_id": doc_id, "chunk_hash": hashes[i], "indexed_at": indexed_at}
+                    for i in todo
+                ]
+                batch_texts = [texts[i] for i in todo]
+                with metrics.span("index.embed"):
+                    vectors = embed(batch_texts) if embed is not None else None
+                    sparse_vecs = sparse.document_vectors(batch_texts) if hybrid else None
+                with metrics.span("index.upsert"):
+                    if hybrid:
+                        upsert_hybrid(
+                            store.client, name, vectors, sparse_vecs, payloads,
+                            ids=[ids[i] for i in todo], batch_size=batch_size,
+                        )
+                    else:
+                        store.upsert(
+                            name, vectors, payloads,
+                            ids=[ids[i] for i in todo], batch_size=batch_size,
+                        )
+
+            report.chunks += len(docs)
+            report.added += len(todo)
+            report.skipped += len(docs) - len(todo)
+            if progress is not None:
+                page = int(docs[-1].metadata.get("page", 0)) + 1
+                progress(min(1.0, page / max(total_pages, 1)),
+                         f"Indexed {report.chunks} chunks (page {page}/{total_pages})")
+        if report.added:
+            invalidate("answer_cache")  # cached answers may no longer match the documents
+        return report if report.chunks else None
+    finally:
+        os.unlink(tmp_path)
+
+def delete_document(doc_id: str, settings) -> None:
+    """Remove every chunk of one document (as returned in `IndexReport.doc_id`)."""
+    get_vector_store(settings).delete_by_payload(settings.QDRANT_COLLECTION, "doc_id", doc_id)
+    invalidate("answer_cache")
+
+def embed_query(query: str, settings) -> Optional[np.ndarray]:
+    """Query vector from the active backend (FastEmbed, else the saved TF-IDF vectorizer)."""
+    vecs = embed_queries([query], settings)
+    return None if vecs is None else vecs[0]
+
+def embed_queries(queries: List[str], settings) -> Optional[np.ndarray]:
+    """(n, d) float32 query vectors in one embedder call; None without an embedding backend."""
+    with metrics.span("embed"):
+        embedder = _dense_embedder(settings, queries=True)
+        if embedder is not None:
+            return embedder(list(queries))
         vec_file = _vectorizer_path(settings)
-        vectors = _tfidf_fit_transform(texts, vec_file, max_features=384)
-        dim = len(vectors[0])  # 384
-
-    # Recreate collection with the exact dim we’re about to insert
-    client = get_qdrant()
-    client.recreate_collection(
-        collection_name=settings.QDRANT_COLLECTION,
-        vectors_config=qm.VectorParams(size=dim, distance=qm.Distance.COSINE),
-    )
-
-    # Upsert points directly
-    payloads = [{"text": t, **(m or {})} for t, m in zip(texts, metadatas)]
-    points = [qm.PointStruct(id=i, vector=vectors[i], payload=payloads[i]) for i in range(len(vectors))]
-    client.upsert(collection_name=settings.QDRANT_COLLECTION, points=points)
-
-def rag_retrieve(query: str, settings, k: int = 5) -> List[str]:
-    vec_file = _vectorizer_path(settings)
-    embedder = _fastembed_embedder(getattr(settings, "EMBEDDINGS_MODEL", None))
-
-    if os.path.exists(vec_file) and embedder is None:
-        qvec = _tfidf_transform([query], vec_file)[0]  # 384-dim
+        if os.path.exists(vec_file):
+            return _tfidf_transform(list(queries), vec_file).toarray()  # 384-dim
+        return None
+
+def _above_threshold(hits: List[RetrievedChunk], settings) -> List[RetrievedChunk]:
+    """Drop hits scoring under RETRIEVAL_MIN_SCORE (dense cosine only: RRF scores are ranks)."""
+    min_score = getattr(settings, "RETRIEVAL_MIN_SCORE", None)
+    if min_score is None or _hybrid(settings):
+        return hits
+    kept = [h for h in hits if h.score >= min_score]
+    if len(kept) < len(hits):
+        metrics.incr("retrieval.below_threshold", len(hits) - len(kept))
+    return kept
+
+def search_chunks(
+    query: str, settings, k: int = 5, filter: Optional[SearchFilter] = None
+) -> List[RetrievedChunk]:
+    """Top-k chunks for `query` with scores and metadata, optionally restricted by `filter`.
+
+    Hits under RETRIEVAL_MIN_SCORE are dropped, so an empty list means nothing relevant.
+    """
+    store = get_vector_store(settings)
+    if not store.collection_exists(settings.QDRANT_COLLECTION):
+        return []  # nothing indexed yet
+
+    embedder = _dense_embedder(settings, queries=True)
+    if _hybrid(settings):
+        from . import sparse
+        from ..vectorstore.qdrant_store import hybrid_search
+        # Reciprocal rank fusion of dense and BM25 candidates (sparse-only without a dense model)
+        with metrics.span("embed"):
+            dense = embedder([query])[0] if embedder is not None else None
+        with metrics.span("vector_search"):
+            hits = hybrid_search(store.client, settings.QDRANT_COLLECTION, dense, sparse.query_vector(query), k=k,
+                                 profile=store.profile, filter=filter)
+        return _above_threshold([RetrievedChunk.from_hit(score, payload) for score, payload in hits], settings)
+
+    qvec = embed_query(query, settings)
+    if qvec is None:
+        raise RuntimeError(
+            "No embedding backend available. Install qdrant-client[fastembed] or index a PDF first."
+        )
+
+    with metrics.span("vector_search"):
+        hits = store.search(settings.QDRANT_COLLECTION, qvec, k=k, filter=filter)
+    return _above_threshold([RetrievedChunk.from_hit(score, payload) for score, payload in hits], settings)
+
+def search_chunks_batch(
+    queries: List[str],
+    settings,
+    k: int = 5,
+    qvecs: Optional[np.ndarray] = None,
+    filter: Optional[SearchFilter] = None,
+) -> List[List[RetrievedChunk]]:
+    """`search_chunks` for many queries: one embedder call and one batched Qdrant request.
+
+    `qvecs` (from `embed_queries`) skips re-embedding when the caller already has them;
+    `filter` applies to every query.
+    """
+    if not queries:
+        return []
+    store = get_vector_store(settings)
+    if not store.collection_exists(settings.QDRANT_COLLECTION):
+        return [[] for _ in queries]
+
+    if _hybrid(settings):
+        from . import sparse
+        from ..vectorstore.qdrant_store import hybrid_search_batch
+        embedder = _dense_embedder(settings, queries=True)
+        with metrics.span("embed"):
+            dense = embedder(list(queries)) if embedder is not None else None
+        sparse_vecs = [sparse.query_vector(q) for q in queries]
+        with metrics.span("vector_search"):
+            results = hybrid_search_batch(store.client, settings.QDRANT_COLLECTION, dense, sparse_vecs, k=k,
+                                          profile=store.profile, filter=filter)
     else:
-        if embedder is None:
+        if qvecs is None:
+            qvecs = embed_queries(queries, settings)
+        if qvecs is None:
             raise RuntimeError(
                 "No embedding backend available. Install qdrant-client[fastembed] or index a PDF first."
             )
-        qvec = embedder([query])[0]
+        with metrics.span("vector_search"):
+            results = store.search_batch(settings.QDRANT_COLLECTION, qvecs, k=k, filter=filter)
+    return [_above_threshold([RetrievedChunk.from_hit(score, payload) for score, payload in hits], settings)
+            for hits in results]
+
+def rag_retrieve(query: str, settings, k: int = 5, filter: Optional[SearchFilter] = None) -> List[str]:
+    """Texts of `search_chunks`."""
+    return [c.text for c in search_chunks(query, settings, k=k, filter=filter)]
 
-    client = get_qdrant()
-    res = client.search(collection_name=settings.QDRANT_COLLECTION, query_vector=qvec, limit=k)
-    return [hit.payload.get("text", "") for hit in res]
+def rag_retrieve_batch(
+    queries: List[str],
+    settings,
+    k: int = 5,
+    qvecs: Optional[np.ndarray] = None,
+    filter: Optional[SearchFilter] = None,
+) -> List[List[str]]:
+    """Texts of `search_chunks_batch`."""
+    return [[c.text for c in hits] for hits in search_chunks_batch(queries, settings, k=k, qvecs=qvecs, filter=filter)]
@@ -1,11 +1,87 @@
 # src/rag/pdf_loader.py
 from __future__ import annotations
-from langchain_community.document_loaders import PyPDFLoader
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List
 
-def load_and_chunk_pdf(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 150):
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
+# Below this many pages a process pool costs more than it saves
+_PARALLEL_MIN_PAGES = 16
+
+
+def page_count(file_path: str) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(file_path).pages)
+
+
+def _extract_pages(args: Tuple[str, int, int]) -> List[Tuple[int, str]]:
+    """Worker: text of pages [start, end) of one PDF (each worker opens its own reader)."""
+    file_path, start, end = args
+    from pypdf import PdfReader
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+
+def iter_pdf_pages(file_path: str, workers: int = 0, pages_per_task: int = 8,
+                   total: Optional[int] = None) -> Iterator[Document]:
+    """Yield one Document per page, in page order.
+
+    With `workers` > 1 (0 = auto) and a large enough PDF, page ranges are extracted in a
+    process pool; pages are yielded as soon as their range is ready. At most `2 * workers`
+    ranges are in flight, so a slow consumer doesn't pile up the whole PDF's text.
+    Pass `total` if the caller already knows the page count.
+    """
+    if total is None:
+        total = page_count(file_path)
+    if workers <= 0:
+        workers = min(4, os.cpu_count() or 1)
+    ranges = [(file_path, s, min(s + pages_per_task, total)) for s in range(0, total, pages_per_task)]
+
+    if workers <= 1 or total < _PARALLEL_MIN_PAGES:
+        results = map(_extract_pages, ranges)
+        yield from _page_docs(results, file_path, total)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _page_docs(_windowed(pool, ranges, 2 * workers), file_path, total)
+
+
+def _windowed(pool: ProcessPoolExecutor, ranges: List[Tuple[str, int, int]],
+              window: int) -> Iterator[List[Tuple[int, str]]]:
+    """`pool.map` in order, but the next range is only submitted once the oldest is taken."""
+    todo = iter(ranges)
+    pending = deque(pool.submit(_extract_pages, r) for r in islice(todo, window))
+    while pending:
+        pages = pending.popleft().result()
+        nxt = next(todo, None)
+        if nxt is not None:
+            pending.append(pool.submit(_extract_pages, nxt))
+        yield pages
+
+
+def _page_docs(results, file_path: str, total: int) -> Iterator[Document]:
+    for pages in results:
+        for i, text in pages:
+            yield Document(page_content=text, metadata={"source": file_path, "page": i, "total_pages": total})
+
+
+def iter_pdf_chunks(
+    file_path: str,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 150,
+    workers: int = 0,
+    pages_per_task: int = 8,
+    total: Optional[int] = None,
+) -> Iterator[Document]:
+    """Lazily split pages into chunks; only the pages in flight are held in memory."""
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-    return splitter.split_documents(docs)
+    for page in iter_pdf_pages(file_path, workers=workers, pages_per_task=pages_per_task, total=total):
+        yield from splitter.split_documents([page])
+
+
+def load_and_chunk_pdf(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 150,
+                       workers: Optional[int] = 1):
+    return list(iter_pdf_chunks(file_path, chunk_size, chunk_overlap, workers=workers or 0))
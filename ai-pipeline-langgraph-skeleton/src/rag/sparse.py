@@ -0,0 +1,54 @@
+# src/rag/sparse.py
+# BM25-style sparse vectors for Qdrant's sparse index.
+# Terms are hashed into a 31-bit index space, so there is no fitted vocabulary to keep in sync
+# and no cap on the number of terms. Document vectors carry the BM25 term-frequency part; the
+# collection's `Modifier.IDF` lets Qdrant apply inverse document frequency at query time.
+from __future__ import annotations
+import re
+import zlib
+from collections import Counter
+from typing import Dict, List
+
+from qdrant_client.http import models as qm
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "will with what which who how when where why do does did can".split()
+)
+
+# BM25 parameters; AVG_LEN is a fixed estimate of chunk length in tokens (~1000 chars)
+K1 = 1.2
+B = 0.75
+AVG_LEN = 180.0
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+def _term_index(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: Dict[int, float]) -> qm.SparseVector:
+    indices = sorted(weights)
+    return qm.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+
+def document_vector(text: str) -> qm.SparseVector:
+    tokens = tokenize(text)
+    norm = K1 * (1 - B + B * len(tokens) / AVG_LEN)
+    weights: Dict[int, float] = {}
+    for term, tf in Counter(tokens).items():
+        idx = _term_index(term)
+        weights[idx] = weights.get(idx, 0.0) + tf * (K1 + 1) / (tf + norm)
+    return _to_sparse(weights)
+
+
+def document_vectors(texts: List[str]) -> List[qm.SparseVector]:
+    return [document_vector(t) for t in texts]
+
+
+def query_vector(text: str) -> qm.SparseVector:
+    return _to_sparse({_term_index(t): 1.0 for t in set(tokenize(text))})
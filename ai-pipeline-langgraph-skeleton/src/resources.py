@@ -0,0 +1,46 @@
+# src/resources.py
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Process-wide registry of heavy, reusable objects (embedders, vectorizers, DB clients).
+# Entries are keyed by (kind, key) where `key` captures the settings the object was built from.
+_LOCK = threading.Lock()
+_RESOURCES: Dict[Tuple[str, Hashable], Any] = {}
+_BUILD_LOCKS: Dict[Tuple[str, Hashable], threading.Lock] = {}
+
+
+def get_resource(kind: str, key: Hashable, factory: Callable[[], T]) -> T:
+    """Return the shared instance for (kind, key), building it with `factory` on first use.
+
+    Construction happens at most once per key even when many threads ask at the same time;
+    other keys are not blocked while one is being built. A factory result of None is cached
+    too, so a missing optional backend is not re-probed on every call.
+    """
+    slot = (kind, key)
+    if slot in _RESOURCES:
+        return _RESOURCES[slot]
+    with _LOCK:
+        build_lock = _BUILD_LOCKS.setdefault(slot, threading.Lock())
+    with build_lock:
+        if slot not in _RESOURCES:
+            _RESOURCES[slot] = factory()
+        return _RESOURCES[slot]
+
+
+def invalidate(kind: Optional[str] = None) -> None:
+    """Drop cached resources of `kind` (or everything when None), closing them if possible."""
+    with _LOCK:
+        slots = [s for s in _RESOURCES if kind is None or s[0] == kind]
+        dropped = [_RESOURCES.pop(s) for s in slots]
+        for s in slots:
+            _BUILD_LOCKS.pop(s, None)
+    for obj in dropped:
+        close = getattr(obj, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
@@ -0,0 +1,269 @@
+# src/server.py
+# Headless async HTTP service (ASGI, Starlette) for many concurrent users. One compiled graph,
+# embedder, vector store client and LLM client are shared by all requests (resource registry).
+#
+#   python -m src.server [--host 0.0.0.0] [--port 8000]
+#
+#   POST /v1/answer         {"query": "...", "city": "Chennai", "session_id": "...",
+#                            "filter": {"source": "paper.pdf", "pages": [2, 5]}}  -> JSON answer
+#   POST /v1/answer/stream  same body -> Server-Sent Events: token | rag | weather | final
+#   GET  /healthz           "ok" once warmed up ("warming" before), in-flight / queued counts
+#   GET  /metrics           Prometheus text (src/metrics.py)
+#
+# Admission control: at most SERVER_MAX_CONCURRENCY turns run at once; up to SERVER_MAX_QUEUE
+# more wait (for at most SERVER_QUEUE_TIMEOUT_S). Anything beyond that is answered at once
+# with 503 + Retry-After instead of piling up.
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from . import metrics
+from .config import Settings
+from .graph.agent_graph import AppState, astream_turn, build_graph, session_config
+from .graph.memory import LatestCheckpointSaver
+from .vectorstore.base import SearchFilter
+
+_RESULT_FIELDS = ("answer", "rag_answer", "weather", "context", "sources", "timings", "breakdown",
+                  "context_stats", "standalone_query")
+_HISTORY_ROLES = ("user", "assistant")
+
+
+class Overloaded(Exception):
+    """No capacity for another request (queue full or queue wait timed out)."""
+
+
+class AdmissionController:
+    """Bounded concurrency with a bounded, time-limited wait queue."""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout_s: float):
+        self._slots = asyncio.Semaphore(max(1, max_concurrency))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout_s = queue_timeout_s
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def acquire(self) -> "_Slot":
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            metrics.incr("server.rejected")
+            raise Overloaded("queue full")
+        self.waiting += 1
+        t0 = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            metrics.incr("server.rejected")
+            raise Overloaded("timed out waiting for a slot") from None
+        finally:
+            self.waiting -= 1
+        metrics.observe("server.queue_wait", time.perf_counter() - t0)
+        self.in_flight += 1
+        return _Slot(self)
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": self.in_flight, "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency, "max_queue": self.max_queue}
+
+
+class _Slot:
+    """One admitted request; `release` is idempotent (stream end and disconnect both call it)."""
+
+    def __init__(self, controller: AdmissionController):
+        self._controller = controller
+        self._held = True
+
+    def release(self) -> None:
+        if self._held:
+            self._held = False
+            self._controller._release()
+
+
+def _turn(body: Dict[str, Any]) -> Tuple[AppState, Dict[str, Any], Optional[str]]:
+    """(input state, graph config, thread to delete afterwards).
+
+    With a `session_id` the conversation memory comes from the checkpointer; otherwise the
+    request is stateless: its own `history` (if any) is used for this turn only.
+    """
+    params = {"city": body.get("city") or ""}
+    if body.get("filter"):
+        params["filter"] = body["filter"]
+    state = AppState(query=str(body["query"]), params=params, context=[], answer="")
+    session_id = str(body.get("session_id") or "")
+    if session_id:
+        return state, session_config(session_id), None
+    ephemeral = f"ephemeral-{uuid.uuid4().hex}"
+    state["history"] = [{"role": m["role"], "content": m["content"]} for m in body.get("history") or []]
+    return state, session_config(ephemeral), ephemeral
+
+
+async def _parse(request: Request) -> Optional[Dict[str, Any]]:
+    try:
+        body = await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(body, dict) or not str(body.get("query") or "").strip():
+        return None
+    return body
+
+
+def _body_error(body: Dict[str, Any]) -> Optional[str]:
+    try:
+        SearchFilter.from_dict(body.get("filter"))
+    except ValueError as e:
+        return f"invalid filter: {e}"
+    history = body.get("history")
+    if history is None:
+        return None
+    if not isinstance(history, list):
+        return "invalid history: expected a list of {role, content} messages"
+    for i, m in enumerate(history):
+        if not isinstance(m, dict) or m.get("role") not in _HISTORY_ROLES or not isinstance(m.get("content"), str):
+            return f"invalid history: item {i} needs a 'role' ({'/'.join(_HISTORY_ROLES)}) and a string 'content'"
+    return None
+
+
+def _result(final: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: final.get(k) for k in _RESULT_FIELDS if k in final}
+
+
+def _overloaded(e: Overloaded, retry_after_s: float) -> JSONResponse:
+    return JSONResponse({"error": f"overloaded: {e}"}, status_code=503,
+                        headers={"Retry-After": str(max(1, round(retry_after_s)))})
+
+
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode()
+
+
+def create_app(settings: Optional[Settings] = None) -> Starlette:
+    """The ASGI app; the graph is compiled once, in the lifespan, and shared by all requests."""
+    settings = settings or Settings()
+    admission = AdmissionController(
+        settings.SERVER_MAX_CONCURRENCY, settings.SERVER_MAX_QUEUE, settings.SERVER_QUEUE_TIMEOUT_S
+    )
+    shared: Dict[str, Any] = {}
+    checkpointer = LatestCheckpointSaver(max_threads=settings.MEMORY_MAX_SESSIONS)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette) -> AsyncIterator[None]:
+        # Retrieval (and any sync-only model client) runs in the loop's default executor; size
+        # it for the admitted concurrency instead of the CPU-count default
+        executor = ThreadPoolExecutor(max_workers=admission.max_concurrency * 2, thread_name_prefix="turn")
+        asyncio.get_running_loop().set_default_executor(executor)
+        shared["graph"] = build_graph(settings, checkpointer=checkpointer)
+        if settings.WARMUP:
+            from .warmup import warm_up
+            shared["warmup"] = warm_up(settings)  # embedder, vector store, LLM client load in the background
+        metrics.start_exporter()
+        yield
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def answer(request: Request) -> Response:
+        body = await _parse(request)
+        if body is None:
+            return JSONResponse({"error": "expected a JSON object with a non-empty 'query'"}, status_code=400)
+        error = _body_error(body)
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+        try:
+            slot = await admission.acquire()
+        except Overloaded as e:
+            return _overloaded(e, admission.queue_timeout_s)
+        state, config, ephemeral = _turn(body)
+        try:
+            final: Dict[str, Any] = {}
+            async for kind, payload in astream_turn(shared["graph"], state, config):
+                if kind == "final":
+                    final = payload
+            return JSONResponse(_result(final), headers={"Cache-Control": "no-store"})
+        finally:
+            slot.release()
+            if ephemeral:
+                checkpointer.delete_thread(ephemeral)
+
+    async def answer_stream(request: Request) -> Response:
+        body = await _parse(request)
+        if body is None:
+            return JSONResponse({"error": "expected a JSON object with a non-empty 'query'"}, status_code=400)
+        error = _body_error(body)
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+        try:
+            slot = await admission.acquire()  # rejected before any bytes are sent
+        except Overloaded as e:
+            return _overloaded(e, admission.queue_timeout_s)
+
+        state, config, ephemeral = _turn(body)
+
+        async def events() -> AsyncIterator[bytes]:
+            try:
+                async for kind, payload in astream_turn(shared["graph"], state, config):
+                    yield _sse(kind, _result(payload) if kind == "final" else payload)
+            except Exception as e:
+                yield _sse("error", str(e))
+            finally:
+                slot.release()
+                if ephemeral:
+                    checkpointer.delete_thread(ephemeral)
+
+        # The background task also frees the slot when the client hangs up before the first event
+        return StreamingResponse(
+            events(), media_type="text/event-stream",
+            headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+            background=BackgroundTask(slot.release),
+        )
+
+    async def healthz(request: Request) -> Response:
+        warmup = shared.get("warmup")
+        ready = warmup is None or warmup.done.is_set()
+        return JSONResponse({"status": "ok" if ready else "warming", **admission.stats()})
+
+    async def prometheus(request: Request) -> Response:
+        return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+    app = Starlette(
+        routes=[
+            Route("/v1/answer", answer, methods=["POST"]),
+            Route("/v1/answer/stream", answer_stream, methods=["POST"]),
+            Route("/healthz", healthz),
+            Route("/metrics", prometheus),
+        ],
+        lifespan=lifespan,
+    )
+    app.state.admission = admission
+    return app
+
+
+def main() -> None:
+    import uvicorn
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    settings = Settings()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=settings.SERVER_HOST)
+    ap.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    args = ap.parse_args()
+    # One process, one event loop: concurrency comes from async I/O, not extra workers, so all
+    # requests share the loaded models and clients
+    uvicorn.run(create_app(settings), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# src/vectorstore/base.py
+# The operations the RAG pipeline needs from a dense vector store, and backend selection.
+from __future__ import annotations
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Iterable, List, Mapping, Optional, Protocol, Sequence, Set, Tuple, Union
+
+PointId = Union[int, str]
+Hit = Tuple[float, dict]  # (cosine similarity, payload)
+
+# Payload fields searches can be filtered on; both backends index these at ingest
+FILTER_FIELDS = {"source": "keyword", "doc_id": "keyword", "page": "integer", "indexed_at": "float"}
+
+
+def _strings(value) -> Tuple[str, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    if isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value):
+        return tuple(value)
+    raise ValueError(f"Expected a string or a list of strings, got {value!r}")
+
+
+def _timestamp(value) -> Optional[float]:
+    """Epoch seconds from a number or an ISO 8601 string (naive times are local)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except ValueError:
+            pass
+    raise ValueError(f"Expected epoch seconds or an ISO 8601 time, got {value!r}")
+
+
+def _page(value) -> Optional[int]:
+    if value is None:
+        return None
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 1:
+        return value
+    raise ValueError(f"Pages are numbered from 1, got {value!r}")
+
+
+@dataclass(frozen=True)
+class SearchFilter:
+    """Restricts a search to chunks whose payload matches every condition that is set.
+
+    Pages are 1-based and inclusive here (the stored `page` payload is 0-based); the upload
+    window is `indexed_after <= indexed_at < indexed_before`, in epoch seconds.
+    """
+    sources: Tuple[str, ...] = ()  # upload file names
+    doc_ids: Tuple[str, ...] = ()  # `IndexReport.doc_id` values
+    page_from: Optional[int] = None
+    page_to: Optional[int] = None
+    indexed_after: Optional[float] = None
+    indexed_before: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Mapping[str, Any]]) -> Optional["SearchFilter"]:
+        """Parse the JSON form, e.g. `{"source": "paper.pdf", "pages": [2, 5],
+        "indexed_after": "2024-05-01T00:00:00"}`; None when nothing is restricted.
+
+        Raises ValueError for unknown keys or malformed values.
+        """
+        if not data:
+            return None
+        if not isinstance(data, Mapping):
+            raise ValueError(f"Expected a filter object, got {data!r}")
+        unknown = set(data) - {"source", "doc_id", "page", "pages", "indexed_after", "indexed_before"}
+        if unknown:
+            raise ValueError(f"Unknown filter keys: {sorted(unknown)}")
+        page_from = page_to = _page(data.get("page"))
+        if data.get("pages") is not None:
+            pages = data["pages"]
+            if not isinstance(pages, (list, tuple)) or len(pages) != 2:
+                raise ValueError(f"Expected pages as [first, last], got {pages!r}")
+            page_from, page_to = _page(pages[0]), _page(pages[1])
+        f = cls(
+            sources=_strings(data.get("source")),
+            doc_ids=_strings(data.get("doc_id")),
+            page_from=page_from,
+            page_to=page_to,
+            indexed_after=_timestamp(data.get("indexed_after")),
+            indexed_before=_timestamp(data.get("indexed_before")),
+        )
+        return None if f.is_empty() else f
+
+    def is_empty(self) -> bool:
+        return self == SearchFilter()
+
+    def matches(self, payload: Mapping[str, Any]) -> bool:
+        """Whether one payload passes (chunks missing a filtered field never do)."""
+        if self.sources and payload.get("source") not in self.sources:
+            return False
+        if self.doc_ids and payload.get("doc_id") not in self.doc_ids:
+            return False
+        if self.page_from is not None or self.page_to is not None:
+            page = payload.get("page")
+            if not isinstance(page, int):
+                return False
+            if (self.page_from is not None and page < self.page_from - 1) or (
+                    self.page_to is not None and page > self.page_to - 1):
+                return False
+        if self.indexed_after is not None or self.indexed_before is not None:
+            at = payload.get("indexed_at")
+            if not isinstance(at, (int, float)):
+                return False
+            if (self.indexed_after is not None and at < self.indexed_after) or (
+                    self.indexed_before is not None and at >= self.indexed_before):
+                return False
+        return True
+
+
+class VectorStore(Protocol):
+    """Named collections of cosine-compared dense vectors with JSON payloads."""
+
+    def collection_exists(self, name: str) -> bool: ...
+
+    def recreate_collection(self, name: str, dim: int) -> None: ...
+
+    def ensure_collection(self, name: str, dim: int) -> None:
+        """Create `name` if missing; recreate it if it holds vectors of another size."""
+
+    def count(self, name: str) -> int: ...
+
+    def upsert(
+        self, name: str, embeddings, payloads: List[dict], ids: Sequence[PointId], batch_size: int = 256
+    ) -> None: ...
+
+    def existing_ids(self, name: str, ids: Iterable[PointId]) -> Set[str]: ...
+
+    def delete_by_payload(self, name: str, key: str, value) -> None: ...
+
+    def ensure_payload_indexes(self, name: str) -> None:
+        """Index the `FILTER_FIELDS` payloads of `name` so filtered searches stay fast."""
+
+    def search(self, name: str, query, k: int = 5, filter: Optional[SearchFilter] = None) -> List[Hit]: ...
+
+    def search_batch(
+        self, name: str, queries, k: int = 5, filter: Optional[SearchFilter] = None
+    ) -> List[List[Hit]]: ...
+
+
+def local_index_path() -> str:
+    return os.path.join(os.getenv("QDRANT_LOCAL_PATH", "./.qdrant"), "local_index")
+
+
+def get_vector_store(settings) -> VectorStore:
+    """Backend chosen by `VECTOR_BACKEND`: "qdrant" (server, else embedded) or "local"
+    (in-process NumPy / HNSW files under QDRANT_LOCAL_PATH, no server probe)."""
+    if getattr(settings, "VECTOR_BACKEND", "qdrant") == "local":
+        from .local_store import get_local_store
+        return get_local_store(local_index_path(), getattr(settings, "LOCAL_HNSW_MIN_POINTS", 20_000))
+    from .qdrant_store import QdrantStore, get_qdrant, storage_profile
+    return QdrantStore(get_qdrant(), storage_profile(settings))
@@ -0,0 +1,342 @@
+# src/vectorstore/local_store.py
+# In-process vector store for small, single-user corpora (VECTOR_BACKEND="local").
+# One directory per collection under QDRANT_LOCAL_PATH/local_index/<name>:
+#   meta.json       {"dim": d, "count": n}
+#   vectors.f32     n x d unit-length float32 rows, memory-mapped (a cold load reads no vectors)
+#   payloads.jsonl  one {"id", "payload"} line per row; offsets.i64 holds each line's byte offset,
+#                   so a search only parses the payloads of its hits
+#   hnsw.bin        hnswlib graph over the rows, used once a collection has LOCAL_HNSW_MIN_POINTS
+#                   (exact brute-force top-k below that, or when hnswlib isn't installed)
+# Filtered searches match the FILTER_FIELDS payloads against in-memory column arrays (built on
+# the first filtered search) and rank the matching rows exactly.
+from __future__ import annotations
+import json
+import os
+import re
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from ..resources import get_resource
+from .base import Hit, PointId, SearchFilter
+
+_NAME = re.compile(r"[\w.-]+")
+
+
+def _unit_rows(embeddings) -> np.ndarray:
+    if hasattr(embeddings, "toarray"):
+        embeddings = embeddings.toarray()
+    mat = np.array(embeddings, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def _filter_columns(payloads: List[dict]) -> Dict[str, np.ndarray]:
+    """FILTER_FIELDS of `payloads` as arrays; a missing field is "" / -1 / NaN, which no filter matches."""
+    def number(value, missing):
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else missing
+
+    return {
+        "source": np.array([str(p.get("source") or "") for p in payloads], dtype=str),
+        "doc_id": np.array([str(p.get("doc_id") or "") for p in payloads], dtype=str),
+        "page": np.array([int(number(p.get("page"), -1)) for p in payloads], dtype=np.int64),
+        "indexed_at": np.array([float(number(p.get("indexed_at"), np.nan)) for p in payloads], dtype=np.float64),
+    }
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, path)
+
+
+class _Collection:
+    def __init__(self, path: str, hnsw_min: int):
+        self.path = path
+        self.hnsw_min = hnsw_min
+        self.lock = threading.RLock()
+        with open(self._file("meta.json")) as fh:
+            meta = json.load(fh)
+        self.dim: int = meta["dim"]
+        self.count: int = meta["count"]
+        self._vectors: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._rows: Optional[Dict[str, int]] = None  # point id -> row, loaded on first need
+        self._columns: Optional[Dict[str, np.ndarray]] = None  # filter fields, loaded on first need
+        self._hnsw = None
+        self._hnsw_checked = False
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @classmethod
+    def create(cls, path: str, dim: int, hnsw_min: int) -> "_Collection":
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        for name in ("vectors.f32", "payloads.jsonl", "offsets.i64"):
+            open(os.path.join(path, name), "wb").close()
+        _write_json(os.path.join(path, "meta.json"), {"dim": int(dim), "count": 0})
+        return cls(path, hnsw_min)
+
+    # ---- lazy views ----
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            self._vectors = (
+                np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+                if self.count else np.empty((0, self.dim), dtype=np.float32)
+            )
+        return self._vectors
+
+    def offsets(self) -> np.ndarray:
+        if self._offsets is None:
+            self._offsets = (
+                np.memmap(self._file("offsets.i64"), dtype=np.int64, mode="r", shape=(self.count,))
+                if self.count else np.empty(0, dtype=np.int64)
+            )
+        return self._offsets
+
+    def _records(self) -> List[dict]:
+        with open(self._file("payloads.jsonl"), "rb") as fh:
+            return [json.loads(line) for line in fh]
+
+    def rows(self) -> Dict[str, int]:
+        if self._rows is None:
+            self._rows = {rec["id"]: i for i, rec in enumerate(self._records())}
+        return self._rows
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            self._columns = _filter_columns([rec["payload"] or {} for rec in self._records()])
+        return self._columns
+
+    def mask(self, f: SearchFilter) -> np.ndarray:
+        """Rows whose payload passes `f` (same semantics as `SearchFilter.matches`)."""
+        cols = self.columns()
+        keep = np.ones(self.count, dtype=bool)
+        if f.sources:
+            keep &= np.isin(cols["source"], f.sources)
+        if f.doc_ids:
+            keep &= np.isin(cols["doc_id"], f.doc_ids)
+        if f.page_from is not None:
+            keep &= cols["page"] >= f.page_from - 1
+        if f.page_to is not None:
+            keep &= (cols["page"] >= 0) & (cols["page"] <= f.page_to - 1)
+        with np.errstate(invalid="ignore"):
+            if f.indexed_after is not None:
+                keep &= cols["indexed_at"] >= f.indexed_after
+            if f.indexed_before is not None:
+                keep &= cols["indexed_at"] < f.indexed_before
+        return keep
+
+    def payloads(self, rows: Iterable[int]) -> List[dict]:
+        offsets = self.offsets()
+        out = []
+        with open(self._file("payloads.jsonl"), "rb") as fh:
+            for r in rows:
+                fh.seek(int(offsets[r]))
+                out.append(json.loads(fh.readline())["payload"])
+        return out
+
+    def _reset_views(self) -> None:
+        self._vectors = None
+        self._offsets = None
+
+    # ---- writes ----
+    def append(self, vectors: np.ndarray, ids: List[str], payloads: List[dict]) -> None:
+        start = self.count
+        with open(self._file("payloads.jsonl"), "ab") as fh:
+            pos = fh.tell()
+            offsets = np.empty(len(ids), dtype=np.int64)
+            for i, (pid, payload) in enumerate(zip(ids, payloads)):
+                line = (json.dumps({"id": pid, "payload": payload}, default=str) + "\n").encode("utf-8")
+                offsets[i] = pos
+                fh.write(line)
+                pos += len(line)
+        with open(self._file("offsets.i64"), "ab") as fh:
+            fh.write(offsets.tobytes())
+        with open(self._file("vectors.f32"), "ab") as fh:
+            fh.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.count += len(ids)
+        _write_json(self._file("meta.json"), {"dim": self.dim, "count": self.count})
+        self._reset_views()
+        if self._rows is not None:
+            self._rows.update({pid: start + i for i, pid in enumerate(ids)})
+        if self._columns is not None:
+            new = _filter_columns(payloads)
+            self._columns = {k: np.concatenate([v, new[k]]) for k, v in self._columns.items()}
+        if self._hnsw is not None:
+            self._hnsw.resize_index(max(self.count, self._hnsw.get_max_elements()))
+            self._hnsw.add_items(vectors, np.arange(start, self.count))
+            self._hnsw.save_index(self._file("hnsw.bin"))
+
+    def delete_rows(self, drop: Set[int]) -> None:
+        """Compact the files without the rows in `drop` (deletes are rare; this is O(n))."""
+        if not drop:
+            return
+        keep = np.array([i for i in range(self.count) if i not in drop], dtype=np.int64)
+        vectors = np.array(self.vectors()[keep]) if len(keep) else np.empty((0, self.dim), np.float32)
+        records = self._records()
+        self._reset_views()
+        self._drop_hnsw()
+        for name in ("vectors.f32", "payloads.jsonl", "offsets.i64"):
+            open(self._file(name), "wb").close()
+        self.count = 0
+        self._rows = {}
+        self._columns = None
+        _write_json(self._file("meta.json"), {"dim": self.dim, "count": 0})
+        if len(keep):
+            self.append(vectors, [records[i]["id"] for i in keep], [records[i]["payload"] for i in keep])
+
+    # ---- search ----
+    def _drop_hnsw(self) -> None:
+        self._hnsw = None
+        self._hnsw_checked = False
+        try:
+            os.remove(self._file("hnsw.bin"))
+        except FileNotFoundError:
+            pass
+
+    def _index(self):
+        """hnswlib index over all rows, or None (small collection / hnswlib not installed)."""
+        if self.count < self.hnsw_min:
+            return None
+        if self._hnsw is not None or self._hnsw_checked:
+            return self._hnsw
+        self._hnsw_checked = True
+        try:
+            import hnswlib
+        except ImportError:
+            return None
+        index = hnswlib.Index(space="cosine", dim=self.dim)
+        path = self._file("hnsw.bin")
+        if os.path.exists(path):
+            index.load_index(path, max_elements=self.count)
+            if index.get_current_count() == self.count:
+                self._hnsw = index
+                return index
+            index = hnswlib.Index(space="cosine", dim=self.dim)
+        index.init_index(max_elements=self.count, ef_construction=200, M=16)
+        index.add_items(np.asarray(self.vectors()), np.arange(self.count))
+        index.save_index(path)
+        self._hnsw = index
+        return index
+
+    def search(self, queries: np.ndarray, k: int, filter: Optional[SearchFilter] = None) -> List[List[Hit]]:
+        # A filtered search ranks only the matching rows, exactly: a scoped document is small,
+        # and post-filtering HNSW results could return fewer than k hits
+        rows = np.flatnonzero(self.mask(filter)) if filter is not None else None
+        k = min(k, self.count if rows is None else len(rows))
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+        index = self._index() if rows is None else None
+        if index is not None:
+            index.set_ef(max(64, 2 * k))
+            labels, distances = index.knn_query(queries, k=k)
+            ranked = [(row, 1.0 - dist) for row, dist in zip(labels, distances)]
+        else:
+            vectors = self.vectors() if rows is None else self.vectors()[rows]
+            scores = queries @ vectors.T  # exact cosine: rows are unit length
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            ranked = []
+            for q, cand in enumerate(top):
+                order = cand[np.argsort(-scores[q, cand])]
+                ranked.append((order if rows is None else rows[order], scores[q, order]))
+        return [
+            list(zip((float(s) for s in sims), self.payloads(rows)))
+            for rows, sims in ranked
+        ]
+
+
+class LocalVectorStore:
+    """`VectorStore` kept in files under `root`; search runs in-process with NumPy / hnswlib."""
+
+    def __init__(self, root: str, hnsw_min: int = 20_000):
+        self.root = root
+        self.hnsw_min = hnsw_min
+        self._lock = threading.Lock()
+        self._collections: Dict[str, _Collection] = {}
+
+    def _path(self, name: str) -> str:
+        if not _NAME.fullmatch(name):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        return os.path.join(self.root, name)
+
+    def _get(self, name: str) -> Optional[_Collection]:
+        with self._lock:
+            col = self._collections.get(name)
+            if col is None and os.path.exists(os.path.join(self._path(name), "meta.json")):
+                col = self._collections[name] = _Collection(self._path(name), self.hnsw_min)
+            return col
+
+    def collection_exists(self, name: str) -> bool:
+        return self._get(name) is not None
+
+    def recreate_collection(self, name: str, dim: int) -> None:
+        with self._lock:
+            self._collections[name] = _Collection.create(self._path(name), dim, self.hnsw_min)
+
+    def ensure_collection(self, name: str, dim: int) -> None:
+        col = self._get(name)
+        if col is None or col.dim != dim:
+            self.recreate_collection(name, dim)
+
+    def delete_collection(self, name: str) -> None:
+        with self._lock:
+            self._collections.pop(name, None)
+            shutil.rmtree(self._path(name), ignore_errors=True)
+
+    def count(self, name: str) -> int:
+        col = self._get(name)
+        return col.count if col is not None else 0
+
+    def upsert(self, name: str, embeddings, payloads: List[dict], ids: Sequence[PointId], batch_size: int = 256) -> None:
+        col = self._get(name)
+        if col is None:
+            raise ValueError(f"Collection {name!r} does not exist")
+        ids = [str(i) for i in ids]
+        vectors = _unit_rows(embeddings)
+        if vectors.shape[1] != col.dim:
+            raise ValueError(f"Expected {col.dim}-dim vectors, got {vectors.shape[1]}")
+        with col.lock:
+            replaced = {col.rows()[i] for i in ids if i in col.rows()}
+            col.delete_rows(replaced)  # same id again: the new vector/payload wins
+            col.append(vectors, ids, list(payloads))
+
+    def existing_ids(self, name: str, ids: Iterable[PointId]) -> Set[str]:
+        col = self._get(name)
+        if col is None:
+            return set()
+        with col.lock:
+            rows = col.rows()
+            return {str(i) for i in ids if str(i) in rows}
+
+    def delete_by_payload(self, name: str, key: str, value) -> None:
+        col = self._get(name)
+        if col is None:
+            return
+        with col.lock:
+            drop = {i for i, rec in enumerate(col._records()) if (rec["payload"] or {}).get(key) == value}
+            col.delete_rows(drop)
+
+    def ensure_payload_indexes(self, name: str) -> None:
+        """Nothing to do: filter columns are built from the payloads on the first filtered search."""
+
+    def search(self, name: str, query, k: int = 5, filter: Optional[SearchFilter] = None) -> List[Hit]:
+        return self.search_batch(name, [query], k=k, filter=filter)[0]
+
+    def search_batch(self, name: str, queries, k: int = 5, filter: Optional[SearchFilter] = None) -> List[List[Hit]]:
+        col = self._get(name)
+        if col is None or len(queries) == 0:
+            return [[] for _ in range(len(queries))]
+        with col.lock:
+            return col.search(np.vstack([_unit_rows(q) for q in queries]), k, filter)
+
+
+def get_local_store(root: str, hnsw_min: int = 20_000) -> LocalVectorStore:
+    return get_resource(
+        "vector_store", (os.path.abspath(root), hnsw_min), lambda: LocalVectorStore(root, hnsw_min)
+    )
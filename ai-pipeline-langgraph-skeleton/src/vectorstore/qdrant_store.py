@@ -1,9 +1,14 @@
 from __future__ import annotations
-from typing import List, Tuple, Optional
+from dataclasses import dataclass, replace
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qm
+import numpy as np
 import os
 
+from ..resources import get_resource
+from .base import FILTER_FIELDS, Hit, PointId, SearchFilter
+
 def _try_http_client():
     url = os.getenv("QDRANT_URL", "http://localhost:6333")
     api_key = os.getenv("QDRANT_API_KEY")
@@ -16,7 +21,7 @@ def _embedded_client():
     os.makedirs(data_path, exist_ok=True)
     return QdrantClient(path=data_path)
 
-def get_qdrant() -> QdrantClient:
+def _connect() -> QdrantClient:
     if os.getenv("QDRANT_EMBEDDED") == "1":
         return _embedded_client()
     try:
@@ -24,6 +29,194 @@ def get_qdrant() -> QdrantClient:
     except Exception:
         return _embedded_client()
 
+def get_qdrant() -> QdrantClient:
+    # One client per connection settings; the HTTP probe only runs when the client is first built
+    key = (
+        os.getenv("QDRANT_EMBEDDED"),
+        os.getenv("QDRANT_URL", "http://localhost:6333"),
+        os.getenv("QDRANT_API_KEY"),
+        os.path.abspath(os.getenv("QDRANT_LOCAL_PATH", "./.qdrant")),
+    )
+    return get_resource("qdrant", key, _connect)
+
+# ---------- Storage profiles ----------
+@dataclass(frozen=True)
+class StorageProfile:
+    """How a collection's dense vectors are stored, indexed and searched.
+
+    Quantized profiles keep a compressed copy of every vector in RAM for the HNSW search and
+    leave the float32 originals on disk; with `rescore`, `oversampling` x k candidates are
+    re-ranked with the originals, which recovers most of the recall lost to compression.
+    Embedded Qdrant ignores all of this (it keeps float32 vectors in RAM and searches
+    exactly); the profile takes effect on a Qdrant server.
+    """
+    quantization: Optional[str] = None  # "scalar" (int8, 4x smaller) | "binary" (1 bit, 32x smaller)
+    on_disk_vectors: bool = False  # float32 originals memory-mapped instead of held in RAM
+    on_disk_payload: bool = False
+    hnsw_m: Optional[int] = None  # graph degree; None = server default (16)
+    hnsw_ef_construct: Optional[int] = None  # build-time beam width; None = server default (100)
+    search_ef: Optional[int] = None  # query-time beam width; None = server default
+    rescore: bool = True
+    oversampling: float = 2.0
+
+
+STORAGE_PROFILES: Dict[str, StorageProfile] = {
+    "default": StorageProfile(),  # float32 in RAM, server defaults
+    "scalar": StorageProfile(quantization="scalar", on_disk_vectors=True, on_disk_payload=True),
+    "binary": StorageProfile(quantization="binary", on_disk_vectors=True, on_disk_payload=True, oversampling=3.0),
+    "on_disk": StorageProfile(on_disk_vectors=True, on_disk_payload=True),
+}
+
+
+def storage_profile(settings) -> StorageProfile:
+    """QDRANT_STORAGE_PROFILE with the QDRANT_HNSW_* / QDRANT_SEARCH_EF / QDRANT_RESCORE /
+    QDRANT_OVERSAMPLING overrides applied."""
+    name = getattr(settings, "QDRANT_STORAGE_PROFILE", None) or "default"
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown QDRANT_STORAGE_PROFILE {name!r}; expected one of {sorted(STORAGE_PROFILES)}")
+    overrides = {
+        field: getattr(settings, option, None)
+        for field, option in (
+            ("hnsw_m", "QDRANT_HNSW_M"),
+            ("hnsw_ef_construct", "QDRANT_HNSW_EF_CONSTRUCT"),
+            ("search_ef", "QDRANT_SEARCH_EF"),
+            ("rescore", "QDRANT_RESCORE"),
+            ("oversampling", "QDRANT_OVERSAMPLING"),
+        )
+    }
+    return replace(STORAGE_PROFILES[name], **{k: v for k, v in overrides.items() if v is not None})
+
+
+def _is_embedded(client: QdrantClient) -> bool:
+    from qdrant_client.local.qdrant_local import QdrantLocal
+    return isinstance(getattr(client, "_client", None), QdrantLocal)
+
+
+def _vector_params(dim: int, profile: StorageProfile) -> qm.VectorParams:
+    return qm.VectorParams(size=dim, distance=qm.Distance.COSINE, on_disk=True if profile.on_disk_vectors else None)
+
+
+def _quantization_config(profile: StorageProfile):
+    if profile.quantization == "scalar":
+        return qm.ScalarQuantization(
+            scalar=qm.ScalarQuantizationConfig(type=qm.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile.quantization == "binary":
+        return qm.BinaryQuantization(binary=qm.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def _hnsw_config(profile: StorageProfile) -> Optional[qm.HnswConfigDiff]:
+    if profile.hnsw_m is None and profile.hnsw_ef_construct is None:
+        return None
+    return qm.HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct)
+
+
+def _collection_options(profile: StorageProfile) -> dict:
+    """Collection-level keyword arguments for `create_collection` (none for the default)."""
+    options = {
+        "hnsw_config": _hnsw_config(profile),
+        "quantization_config": _quantization_config(profile),
+        "on_disk_payload": True if profile.on_disk_payload else None,
+    }
+    return {k: v for k, v in options.items() if v is not None}
+
+
+def _search_params(client: QdrantClient, profile: Optional[StorageProfile]) -> Optional[qm.SearchParams]:
+    # Embedded Qdrant searches exactly and warns about search params on every query
+    if profile is None or _is_embedded(client):
+        return None
+    quantization = (
+        qm.QuantizationSearchParams(rescore=profile.rescore, oversampling=profile.oversampling)
+        if profile.quantization else None
+    )
+    if quantization is None and profile.search_ef is None:
+        return None
+    return qm.SearchParams(hnsw_ef=profile.search_ef, quantization=quantization)
+
+
+def _profile_differs(client: QdrantClient, name: str, profile: StorageProfile, vector: str = "") -> bool:
+    config = client.get_collection(name).config
+    kinds = {qm.ScalarQuantization: "scalar", qm.BinaryQuantization: "binary"}
+    vectors = config.params.vectors
+    if isinstance(vectors, dict):
+        vectors = vectors.get(vector)
+    return (
+        kinds.get(type(config.quantization_config)) != profile.quantization
+        or bool(getattr(vectors, "on_disk", None)) != profile.on_disk_vectors
+        or bool(config.params.on_disk_payload) != profile.on_disk_payload
+        or (profile.hnsw_m is not None and config.hnsw_config.m != profile.hnsw_m)
+        or (profile.hnsw_ef_construct is not None and config.hnsw_config.ef_construct != profile.hnsw_ef_construct)
+    )
+
+
+def _apply_profile(client: QdrantClient, name: str, profile: StorageProfile, vector: str = "") -> None:
+    """Switch an existing server collection to `profile` in place (the server rebuilds its
+    segments in the background; nothing is re-embedded)."""
+    if _is_embedded(client) or not _profile_differs(client, name, profile, vector):
+        return
+    client.update_collection(
+        collection_name=name,
+        vectors_config={vector: qm.VectorParamsDiff(on_disk=profile.on_disk_vectors)},
+        hnsw_config=_hnsw_config(profile),
+        quantization_config=_quantization_config(profile) or qm.Disabled.DISABLED,
+        collection_params=qm.CollectionParamsDiff(on_disk_payload=profile.on_disk_payload),
+    )
+
+
+# ---------- Payload filters ----------
+_SCHEMA_TYPES = {
+    "keyword": qm.PayloadSchemaType.KEYWORD,
+    "integer": qm.PayloadSchemaType.INTEGER,
+    "float": qm.PayloadSchemaType.FLOAT,
+}
+
+
+def ensure_payload_indexes(client: QdrantClient, name: str) -> None:
+    """Create the missing `FILTER_FIELDS` payload indexes, so filtered searches look up the
+    matching points instead of scanning payloads (a no-op in embedded Qdrant, which has none)."""
+    if _is_embedded(client) or not client.collection_exists(name):
+        return
+    existing = client.get_collection(name).payload_schema or {}
+    for field, kind in FILTER_FIELDS.items():
+        if field not in existing:
+            client.create_payload_index(name, field, field_schema=_SCHEMA_TYPES[kind], wait=True)
+
+
+def _qdrant_filter(f: Optional[SearchFilter]) -> Optional[qm.Filter]:
+    if f is None or f.is_empty():
+        return None
+    must: List[qm.FieldCondition] = []
+    if f.sources:
+        must.append(qm.FieldCondition(key="source", match=qm.MatchAny(any=list(f.sources))))
+    if f.doc_ids:
+        must.append(qm.FieldCondition(key="doc_id", match=qm.MatchAny(any=list(f.doc_ids))))
+    if f.page_from is not None or f.page_to is not None:
+        # Stored pages are 0-based
+        must.append(qm.FieldCondition(key="page", range=qm.Range(
+            gte=None if f.page_from is None else f.page_from - 1,
+            lte=None if f.page_to is None else f.page_to - 1,
+        )))
+    if f.indexed_after is not None or f.indexed_before is not None:
+        must.append(qm.FieldCondition(key="indexed_at", range=qm.Range(gte=f.indexed_after, lt=f.indexed_before)))
+    return qm.Filter(must=must)
+
+
+def create_collection(client: QdrantClient, name: str, dim: int, profile: Optional[StorageProfile] = None) -> None:
+    """(Re)create a dense collection laid out as `profile` says."""
+    profile = profile or StorageProfile()
+    _drop_collection(client, name)
+    client.create_collection(
+        collection_name=name, vectors_config=_vector_params(dim, profile), **_collection_options(profile)
+    )
+
+
+def _drop_collection(client: QdrantClient, name: str) -> None:
+    # `recreate_collection` is deprecated in qdrant-client
+    if client.collection_exists(name):
+        client.delete_collection(name)
+
+
 def _get_existing_dim(client: QdrantClient, name: str) -> Optional[int]:
     try:
         info = client.get_collection(name)
@@ -41,21 +234,279 @@ def _get_existing_dim(client: QdrantClient, name: str) -> Optional[int]:
         pass
     return None
 
-def ensure_collection(client: QdrantClient, name: str, dim: int = 384) -> None:
+def _has_sparse(client: QdrantClient, name: str) -> bool:
+    try:
+        return bool(client.get_collection(name).config.params.sparse_vectors)
+    except Exception:
+        return False
+
+def ensure_collection(client: QdrantClient, name: str, dim: int = 384, profile: Optional[StorageProfile] = None) -> None:
     existing_dim = _get_existing_dim(client, name)
-    if existing_dim is None or existing_dim != dim:
-        client.recreate_collection(
-            collection_name=name,
-            vectors_config=qm.VectorParams(size=dim, distance=qm.Distance.COSINE),
+    # A hybrid (named-vector) collection can't take unnamed dense points either
+    if existing_dim is None or existing_dim != dim or _has_sparse(client, name):
+        create_collection(client, name, dim, profile)
+    elif profile is not None:
+        _apply_profile(client, name, profile)
+
+
+def upsert_texts(
+    client: QdrantClient,
+    collection: str,
+    embeddings,
+    payloads: List[dict],
+    ids: Optional[Sequence[PointId]] = None,
+    batch_size: int = 256,
+    profile: Optional[StorageProfile] = None,
+    ensure: bool = True,
+):
+    """Store vectors with their payloads.
+
+    `embeddings` may be an (n, dim) array, a scipy sparse matrix (densified one batch at a
+    time) or a list of lists; arrays are handed to the client without boxing into floats.
+    With `ensure`, the collection is (re)created for this dim once, before the first batch;
+    callers that upsert many batches into a collection they already set up pass False.
+    """
+    n = embeddings.shape[0] if hasattr(embeddings, "shape") else len(embeddings)
+    if n == 0:
+        return
+    if ensure:
+        dim = embeddings.shape[1] if hasattr(embeddings, "shape") else len(embeddings[0])
+        ensure_collection(client, collection, dim=dim, profile=profile)
+    ids = list(ids) if ids is not None else list(range(n))
+    for start in range(0, n, batch_size):
+        end = start + batch_size
+        client.upload_collection(
+            collection_name=collection,
+            vectors=_dense_f32(embeddings[start:end]),
+            payload=payloads[start:end],
+            ids=ids[start:end],
+            batch_size=batch_size,
+            wait=True,
+        )
+
+def _dense_f32(batch) -> np.ndarray:
+    if hasattr(batch, "toarray"):
+        batch = batch.toarray()
+    return np.ascontiguousarray(batch, dtype=np.float32)
+
+def existing_ids(client: QdrantClient, collection: str, ids: Iterable[PointId], batch_size: int = 256) -> Set[str]:
+    """Subset of `ids` already stored in `collection` (as strings), fetched without vectors/payloads."""
+    ids = list(ids)
+    found: Set[str] = set()
+    if not ids or not client.collection_exists(collection):
+        return found
+    for start in range(0, len(ids), batch_size):
+        recs = client.retrieve(
+            collection_name=collection, ids=ids[start:start + batch_size],
+            with_payload=False, with_vectors=False,
+        )
+        found.update(str(r.id) for r in recs)
+    return found
+
+def delete_by_payload(client: QdrantClient, collection: str, key: str, value) -> None:
+    if not client.collection_exists(collection):
+        return
+    client.delete(
+        collection_name=collection,
+        points_selector=qm.FilterSelector(
+            filter=qm.Filter(must=[qm.FieldCondition(key=key, match=qm.MatchValue(value=value))])
+        ),
+    )
+
+def search(
+    client: QdrantClient,
+    collection: str,
+    query,
+    k: int = 5,
+    profile: Optional[StorageProfile] = None,
+    filter: Optional[SearchFilter] = None,
+) -> List[Tuple[float, dict]]:
+    res = client.query_points(
+        collection_name=collection, query=query, limit=k, search_params=_search_params(client, profile),
+        query_filter=_qdrant_filter(filter),
+    ).points
+    return [(r.score, r.payload) for r in res]
+
+def search_batch(
+    client: QdrantClient,
+    collection: str,
+    queries,
+    k: int = 5,
+    profile: Optional[StorageProfile] = None,
+    filter: Optional[SearchFilter] = None,
+) -> List[List[Tuple[float, dict]]]:
+    """`search` for many query vectors in one request; results follow the order of `queries`."""
+    params = _search_params(client, profile)
+    query_filter = _qdrant_filter(filter)
+    requests = [
+        qm.QueryRequest(query=_dense_f32(q).ravel().tolist(), limit=k, params=params, filter=query_filter,
+                        with_payload=True)
+        for q in queries
+    ]
+    if not requests:
+        return []
+    responses = client.query_batch_points(collection_name=collection, requests=requests)
+    return [[(r.score, r.payload) for r in resp.points] for resp in responses]
+
+# ---------- Hybrid (named dense + sparse vectors) ----------
+DENSE = "dense"
+SPARSE = "sparse"
+
+def ensure_hybrid_collection(
+    client: QdrantClient,
+    name: str,
+    dim: Optional[int],
+    recreate: bool = False,
+    profile: Optional[StorageProfile] = None,
+) -> None:
+    """Collection with a named dense vector (skipped when `dim` is None) and a BM25 sparse vector.
+
+    Qdrant applies IDF to the sparse vector itself (`Modifier.IDF`), so document vectors only
+    carry term-frequency weights and stay valid as documents are added. `profile` applies to
+    the dense vector.
+    """
+    if not recreate and client.collection_exists(name):
+        params = client.get_collection(name).config.params
+        vectors = params.vectors if isinstance(params.vectors, dict) else {}
+        dense_ok = (DENSE not in vectors) if dim is None else (
+            DENSE in vectors and vectors[DENSE].size == dim
+        )
+        if dense_ok and SPARSE in (params.sparse_vectors or {}):
+            if dim and profile is not None:
+                _apply_profile(client, name, profile, vector=DENSE)
+            return
+    profile = profile or StorageProfile()
+    _drop_collection(client, name)
+    client.create_collection(
+        collection_name=name,
+        vectors_config={DENSE: _vector_params(dim, profile)} if dim else {},
+        sparse_vectors_config={SPARSE: qm.SparseVectorParams(modifier=qm.Modifier.IDF)},
+        **(_collection_options(profile) if dim else {}),
+    )
+
+def upsert_hybrid(
+    client: QdrantClient,
+    collection: str,
+    dense,
+    sparse: List[qm.SparseVector],
+    payloads: List[dict],
+    ids: Sequence[PointId],
+    batch_size: int = 256,
+) -> None:
+    """Like `upsert_texts` for hybrid collections; `dense` may be None (sparse-only)."""
+    ids = list(ids)
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        vectors = {SPARSE: sparse[start:end]}
+        if dense is not None:
+            # Named mixed vectors go through Batch, which needs plain lists (one batch at a time)
+            vectors[DENSE] = _dense_f32(dense[start:end]).tolist()
+        client.upsert(
+            collection_name=collection,
+            points=qm.Batch(ids=ids[start:end], vectors=vectors, payloads=payloads[start:end]),
         )
 
-def upsert_texts(client: QdrantClient, collection: str, embeddings: List[List[float]], payloads: List[dict]):
-    # EXTRA safety: (re)create with correct dim right here too
-    dim = len(embeddings[0])
-    ensure_collection(client, collection, dim=dim)
-    points = [qm.PointStruct(id=i, vector=embeddings[i], payload=payloads[i]) for i in range(len(embeddings))]
-    client.upsert(collection_name=collection, points=points)
+def hybrid_search(
+    client: QdrantClient,
+    collection: str,
+    dense,
+    sparse: qm.SparseVector,
+    k: int = 5,
+    candidates: Optional[int] = None,
+    profile: Optional[StorageProfile] = None,
+    filter: Optional[SearchFilter] = None,
+) -> List[Tuple[float, dict]]:
+    """Top-k by reciprocal rank fusion of dense and sparse candidate lists.
 
-def search(client: QdrantClient, collection: str, query: List[float], k: int = 5) -> List[Tuple[float, dict]]:
-    res = client.search(collection_name=collection, query_vector=query, limit=k)
+    With `dense` None (no dense model available) this is a plain sparse search.
+    """
+    query = _hybrid_query(dense, sparse, k, candidates, _search_params(client, profile), _qdrant_filter(filter))
+    query["query_filter"] = query.pop("filter", None)  # query_points' name for it
+    res = client.query_points(collection_name=collection, **query).points
     return [(r.score, r.payload) for r in res]
+
+def _hybrid_query(
+    dense,
+    sparse: qm.SparseVector,
+    k: int,
+    candidates: Optional[int],
+    params: Optional[qm.SearchParams] = None,
+    query_filter: Optional[qm.Filter] = None,
+) -> dict:
+    if dense is None:
+        return {"query": sparse, "using": SPARSE, "limit": k, "filter": query_filter}
+    limit = candidates or max(k * 4, 20)
+    dense = _dense_f32(dense).ravel().tolist()
+    # The filter goes on both candidate lists, so each still holds `limit` matching points
+    return {
+        "prefetch": [
+            qm.Prefetch(query=dense, using=DENSE, limit=limit, params=params, filter=query_filter),
+            qm.Prefetch(query=sparse, using=SPARSE, limit=limit, filter=query_filter),
+        ],
+        "query": qm.FusionQuery(fusion=qm.Fusion.RRF),
+        "limit": k,
+    }
+
+def hybrid_search_batch(
+    client: QdrantClient,
+    collection: str,
+    dense,
+    sparse: List[qm.SparseVector],
+    k: int = 5,
+    candidates: Optional[int] = None,
+    profile: Optional[StorageProfile] = None,
+    filter: Optional[SearchFilter] = None,
+) -> List[List[Tuple[float, dict]]]:
+    """`hybrid_search` for many queries in one request; `dense` is None or one row per query."""
+    params = _search_params(client, profile)
+    query_filter = _qdrant_filter(filter)
+    requests = [
+        qm.QueryRequest(**_hybrid_query(None if dense is None else dense[i], sv, k, candidates, params, query_filter),
+                        with_payload=True)
+        for i, sv in enumerate(sparse)
+    ]
+    if not requests:
+        return []
+    responses = client.query_batch_points(collection_name=collection, requests=requests)
+    return [[(r.score, r.payload) for r in resp.points] for resp in responses]
+
+# ---------- VectorStore interface ----------
+class QdrantStore:
+    """`VectorStore` over a Qdrant client (server or embedded); `client` stays available
+    for Qdrant-only features such as hybrid collections. New collections are laid out, and
+    searched, according to `profile`."""
+
+    def __init__(self, client: QdrantClient, profile: Optional[StorageProfile] = None):
+        self.client = client
+        self.profile = profile or StorageProfile()
+
+    def collection_exists(self, name: str) -> bool:
+        return self.client.collection_exists(name)
+
+    def recreate_collection(self, name: str, dim: int) -> None:
+        create_collection(self.client, name, dim, self.profile)
+
+    def ensure_collection(self, name: str, dim: int) -> None:
+        ensure_collection(self.client, name, dim=dim, profile=self.profile)
+
+    def count(self, name: str) -> int:
+        return self.client.count(name).count
+
+    def upsert(self, name: str, embeddings, payloads: List[dict], ids: Sequence[PointId], batch_size: int = 256) -> None:
+        # Like LocalVectorStore, expects the collection to exist (the indexer sets it up once)
+        upsert_texts(self.client, name, embeddings, payloads, ids=ids, batch_size=batch_size, ensure=False)
+
+    def existing_ids(self, name: str, ids: Iterable[PointId]) -> Set[str]:
+        return existing_ids(self.client, name, ids)
+
+    def delete_by_payload(self, name: str, key: str, value) -> None:
+        delete_by_payload(self.client, name, key, value)
+
+    def ensure_payload_indexes(self, name: str) -> None:
+        ensure_payload_indexes(self.client, name)
+
+    def search(self, name: str, query, k: int = 5, filter: Optional[SearchFilter] = None) -> List[Hit]:
+        return search(self.client, name, query, k=k, profile=self.profile, filter=filter)
+
+    def search_batch(self, name: str, queries, k: int = 5, filter: Optional[SearchFilter] = None) -> List[List[Hit]]:
+        return search_batch(self.client, name, queries, k=k, profile=self.profile, filter=filter)
@@ -0,0 +1,87 @@
+# src/warmup.py
+# Optional background warm-up: load the heavy, lazily-imported pieces (embedding model, vector
+# store client, LLM client, prompt tokenizer) right after startup, so the first question doesn't
+# pay for them.
+from __future__ import annotations
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .resources import get_resource
+
+
+@dataclass
+class WarmupReport:
+    timings: Dict[str, float] = field(default_factory=dict)  # seconds per step
+    loaded: Dict[str, object] = field(default_factory=dict)  # what each step built, if anything
+    errors: Dict[str, str] = field(default_factory=dict)
+    done: threading.Event = field(default_factory=threading.Event)
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self.done.wait(timeout)
+
+
+def _steps(settings) -> List[Tuple[str, Callable[[], Optional[object]]]]:
+    from .rag import index
+
+    def embedder():
+        embed = index._dense_embedder(settings, queries=True)
+        if embed is None:
+            vec_file = index._vectorizer_path(settings)
+            if os.path.exists(vec_file):
+                return index._load_vectorizer(vec_file)  # TF-IDF fallback
+        return embed
+
+    def vector_store():
+        from .vectorstore.base import get_vector_store
+        store = get_vector_store(settings)
+        store.collection_exists(settings.QDRANT_COLLECTION)
+        return store
+
+    def llm():
+        from .llm import get_chat_model
+        return get_chat_model(settings.MODEL_NAME, settings)
+
+    def tokenizer():
+        from .rag.context import load_tokenizer
+        counter = load_tokenizer()
+        if counter is None:
+            raise RuntimeError("tiktoken encoding unavailable; counting ~4 characters per token")
+        return counter
+
+    return [("embedder", embedder), ("vector_store", vector_store), ("llm", llm), ("tokenizer", tokenizer)]
+
+
+def _run(settings, report: WarmupReport) -> None:
+    try:
+        for name, step in _steps(settings):
+            t0 = time.perf_counter()
+            try:
+                obj = step()
+                if obj is not None:
+                    report.loaded[name] = obj
+            except Exception as e:
+                report.errors[name] = str(e)  # e.g. no LLM key: the first request reports it
+            report.timings[name] = time.perf_counter() - t0
+    finally:
+        report.done.set()
+
+
+def warm_up(settings, background: bool = True) -> WarmupReport:
+    """Preload the embedder, vector store client, LLM client and tokenizer (once per process).
+
+    Everything loaded goes into the shared resource registry, so requests reuse it. With
+    `background` the work runs in a daemon thread and the report fills in as it goes.
+    """
+    def _start() -> WarmupReport:
+        report = WarmupReport()
+        if background:
+            threading.Thread(target=_run, args=(settings, report), name="warmup", daemon=True).start()
+        else:
+            _run(settings, report)
+        return report
+
+    key = (settings.QDRANT_COLLECTION, settings.MODEL_NAME, getattr(settings, "VECTOR_BACKEND", "qdrant"))
+    return get_resource("warmup", key, _start)
@@ -1,7 +1,122 @@
 from __future__ import annotations
-import os, requests
-from dataclasses import dataclass
-from typing import Optional
+import asyncio
+import contextvars
+import os
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .cache import SingleFlight, TTLCache
+from .. import metrics
+from ..resources import get_resource
+
+# Timings (seconds), overridable via env:
+#   WEATHER_TTL_S             serve cached conditions without any upstream call
+#   WEATHER_STALE_S           serve stale conditions immediately and refresh in the background
+#   WEATHER_STALE_IF_ERROR_S  serve stale conditions when the provider fails
+#   GEOCODE_TTL_S             city -> coordinates (effectively permanent)
+#   WEATHER_HEDGE_S           start the fallback provider if the primary hasn't answered by then
+#                             (0 = only after the primary failed)
+#   OPENWEATHERMAP_TIMEOUT_S / OPEN_METEO_TIMEOUT_S  per-request timeout of each provider
+_DEFAULT_SECONDS = {
+    "WEATHER_TTL_S": 300.0,
+    "WEATHER_STALE_S": 1800.0,
+    "WEATHER_STALE_IF_ERROR_S": 6 * 3600.0,
+    "GEOCODE_TTL_S": 30 * 86400.0,
+    "WEATHER_HEDGE_S": 1.5,
+    "OPENWEATHERMAP_TIMEOUT_S": 5.0,
+    "OPEN_METEO_TIMEOUT_S": 10.0,
+}
+
+# Endpoints, overridable via env (e.g. to point at a local stub server)
+_DEFAULT_URLS = {
+    "OPENWEATHERMAP_URL": "https://api.openweathermap.org/data/2.5/weather",
+    "OPEN_METEO_GEOCODE_URL": "https://geocoding-api.open-meteo.com/v1/search",
+    "OPEN_METEO_URL": "https://api.open-meteo.com/v1/forecast",
+}
+
+_CONDITIONS = TTLCache(max_entries=1024)
+_GEOCODES = TTLCache(max_entries=4096)
+_FLIGHT = SingleFlight()
+
+def _env_seconds(name: str) -> float:
+    try:
+        return float(os.getenv(name, _DEFAULT_SECONDS[name]))
+    except ValueError:
+        return _DEFAULT_SECONDS[name]
+
+def _url(name: str) -> str:
+    return os.getenv(name) or _DEFAULT_URLS[name]
+
+def _norm_city(city: str) -> str:
+    return " ".join((city or "").split()).casefold()
+
+def clear_weather_cache() -> None:
+    _CONDITIONS.clear()
+    _GEOCODES.clear()
+
+# ---------- HTTP clients ----------
+def _new_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def _session() -> requests.Session:
+    """Process-wide keep-alive session, so repeat calls skip the TCP+TLS handshake."""
+    return get_resource("http", "weather", _new_session)
+
+class _AsyncClients:
+    """One httpx client per running event loop (httpx pools are bound to the loop that uses them).
+
+    Held as an "http" resource, so `invalidate("http")` closes every client on its own loop;
+    a client whose loop is already closed or garbage-collected is just dropped.
+    """
+
+    def __init__(self):
+        self._clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+        self._closing: set = set()  # keeps scheduled aclose() tasks alive until they finish
+
+    def get(self):
+        import httpx
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = self._clients[loop] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=16, max_keepalive_connections=8)
+            )
+        return client
+
+    def close(self) -> None:
+        clients = list(self._clients.items())
+        self._clients.clear()
+        for loop, client in clients:
+            if client.is_closed or loop.is_closed():
+                continue
+            if not loop.is_running():
+                loop.run_until_complete(client.aclose())
+            elif _running_loop() is loop:
+                task = loop.create_task(client.aclose())
+                self._closing.add(task)
+                task.add_done_callback(self._closing.discard)
+            else:
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+def _async_client():
+    return get_resource("http", "weather-async", _AsyncClients).get()
 
 @dataclass
 class WeatherResult:
@@ -12,67 +127,311 @@ class WeatherResult:
     feels_like_c: Optional[float] = None
     humidity_pct: Optional[float] = None
     wind_kph: Optional[float] = None
+    stale: bool = False  # served from cache past WEATHER_TTL_S
+
+# ---------- Providers ----------
+class WeatherProvider(ABC):
+    """One upstream weather API with a sync (pooled `requests`) and an async (`httpx`) path."""
+
+    name = "base"
+    timeout_env = ""
+
+    @property
+    def timeout(self) -> float:
+        return _env_seconds(self.timeout_env)
+
+    @abstractmethod
+    def fetch(self, city: str) -> WeatherResult: ...
+
+    @abstractmethod
+    async def afetch(self, city: str) -> WeatherResult: ...
+
+class OpenWeatherMap(WeatherProvider):
+    name = "openweathermap"
+    timeout_env = "OPENWEATHERMAP_TIMEOUT_S"
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+
+    def _params(self, city: str) -> Dict[str, Any]:
+        return {"q": city, "appid": self.api_key, "units": "metric"}
+
+    def fetch(self, city: str) -> WeatherResult:
+        with metrics.span("weather.openweathermap"):
+            r = _session().get(_url("OPENWEATHERMAP_URL"), params=self._params(city), timeout=self.timeout)
+            r.raise_for_status()
+        return self._parse(r.json(), city)
+
+    async def afetch(self, city: str) -> WeatherResult:
+        with metrics.span("weather.openweathermap"):
+            r = await _async_client().get(_url("OPENWEATHERMAP_URL"), params=self._params(city), timeout=self.timeout)
+            r.raise_for_status()
+        return self._parse(r.json(), city)
+
+    @staticmethod
+    def _parse(data: Dict[str, Any], city: str) -> WeatherResult:
+        desc = data["weather"][0]["description"]
+        main = data["main"]
+        wind = data.get("wind", {})
+        return WeatherResult(
+            city=data.get("name", city),
+            description=desc,
+            temperature_c=float(main.get("temp")),
+            feels_like_c=float(main.get("feels_like", main.get("temp"))),
+            humidity_pct=float(main.get("humidity")) if main.get("humidity") is not None else None,
+            wind_kph=float(wind.get("speed")) * 3.6 if wind.get("speed") is not None else None,  # m/s→km/h
+            provider="openweathermap",
+        )
+
+class OpenMeteo(WeatherProvider):
+    name = "open-meteo"
+    timeout_env = "OPEN_METEO_TIMEOUT_S"
+    _CURRENT = "temperature_2m,relative_humidity_2m,apparent_temperature,wind_speed_10m,weather_code"
+
+    def geocode(self, city: str):
+        r = _session().get(_url("OPEN_METEO_GEOCODE_URL"), params={"name": city, "count": 1}, timeout=self.timeout)
+        r.raise_for_status()
+        return self._parse_geocode(r.json(), city)
+
+    async def ageocode(self, city: str):
+        key = _norm_city(city)
+        hit = _GEOCODES.get(key)
+        if hit is not None and hit[1] < _env_seconds("GEOCODE_TTL_S"):
+            return hit[0]
+        r = await _async_client().get(
+            _url("OPEN_METEO_GEOCODE_URL"), params={"name": city, "count": 1}, timeout=self.timeout
+        )
+        r.raise_for_status()
+        res = self._parse_geocode(r.json(), city)
+        _GEOCODES.set(key, res)
+        return res
+
+    def fetch(self, city: str) -> WeatherResult:
+        with metrics.span("weather.open-meteo"):
+            lat, lon, resolved_name = _geocode_city(city)
+            params = {"latitude": lat, "longitude": lon, "current": self._CURRENT}
+            r = _session().get(_url("OPEN_METEO_URL"), params=params, timeout=self.timeout)
+            r.raise_for_status()
+        return self._parse(r.json(), resolved_name)
+
+    async def afetch(self, city: str) -> WeatherResult:
+        with metrics.span("weather.open-meteo"):
+            lat, lon, resolved_name = await self.ageocode(city)
+            params = {"latitude": lat, "longitude": lon, "current": self._CURRENT}
+            r = await _async_client().get(_url("OPEN_METEO_URL"), params=params, timeout=self.timeout)
+            r.raise_for_status()
+        return self._parse(r.json(), resolved_name)
+
+    @staticmethod
+    def _parse_geocode(data: Dict[str, Any], city: str):
+        if not data.get("results"):
+            raise ValueError(f"Could not geocode city: {city}")
+        res = data["results"][0]
+        return res["latitude"], res["longitude"], res.get("name", city)
+
+    @staticmethod
+    def _parse(data: Dict[str, Any], resolved_name: str) -> WeatherResult:
+        cur = data.get("current", {})
+        temp = cur.get("temperature_2m")
+        feels = cur.get("apparent_temperature")
+        rh = cur.get("relative_humidity_2m")
+        wind = cur.get("wind_speed_10m")
+        return WeatherResult(
+            city=resolved_name,
+            description="current conditions",
+            temperature_c=float(temp) if temp is not None else 0.0,
+            feels_like_c=float(feels) if feels is not None else None,
+            humidity_pct=float(rh) if rh is not None else None,
+            wind_kph=float(wind) if wind is not None else None,
+            provider="open-meteo",
+        )
 
 def _fetch_openweathermap(city: str, api_key: str) -> WeatherResult:
-    url = "https://api.openweathermap.org/data/2.5/weather"
-    params = {"q": city, "appid": api_key, "units": "metric"}
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    desc = data["weather"][0]["description"]
-    main = data["main"]
-    wind = data.get("wind", {})
-    return WeatherResult(
-        city=data.get("name", city),
-        description=desc,
-        temperature_c=float(main.get("temp")),
-        feels_like_c=float(main.get("feels_like", main.get("temp"))),
-        humidity_pct=float(main.get("humidity")) if main.get("humidity") is not None else None,
-        wind_kph=float(wind.get("speed")) * 3.6 if wind.get("speed") is not None else None,  # m/s→km/h
-        provider="openweathermap",
-    )
+    return OpenWeatherMap(api_key).fetch(city)
 
 def _geocode_city(city: str):
-    geo_url = "https://geocoding-api.open-meteo.com/v1/search"
-    r = requests.get(geo_url, params={"name": city, "count": 1}, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    if not data.get("results"):
-        raise ValueError(f"Could not geocode city: {city}")
-    res = data["results"][0]
-    return res["latitude"], res["longitude"], res.get("name", city)
+    # Coordinates of a city don't change: cache them for GEOCODE_TTL_S, one lookup at a time
+    key = _norm_city(city)
+    hit = _GEOCODES.get(key)
+    if hit is not None and hit[1] < _env_seconds("GEOCODE_TTL_S"):
+        return hit[0]
+
+    def _load():
+        res = _geocode_city_uncached(city)
+        _GEOCODES.set(key, res)
+        return res
+    return _FLIGHT.do(("geocode", key), _load)
+
+def _geocode_city_uncached(city: str):
+    return OpenMeteo().geocode(city)
 
 def _fetch_open_meteo(city: str) -> WeatherResult:
-    lat, lon, resolved_name = _geocode_city(city)
-    url = "https://api.open-meteo.com/v1/forecast"
-    params = {
-        "latitude": lat,
-        "longitude": lon,
-        "current": "temperature_2m,relative_humidity_2m,apparent_temperature,wind_speed_10m,weather_code",
-    }
-    r = requests.get(url, params=params, timeout=15)
-    r.raise_for_status()
-    data = r.json()
-    cur = data.get("current", {})
-    temp = cur.get("temperature_2m")
-    feels = cur.get("apparent_temperature")
-    rh = cur.get("relative_humidity_2m")
-    wind = cur.get("wind_speed_10m")
-    return WeatherResult(
-        city=resolved_name,
-        description="current conditions",
-        temperature_c=float(temp) if temp is not None else 0.0,
-        feels_like_c=float(feels) if feels is not None else None,
-        humidity_pct=float(rh) if rh is not None else None,
-        wind_kph=float(wind) if wind is not None else None,
-        provider="open-meteo",
-    )
+    return OpenMeteo().fetch(city)
 
-def fetch_weather(city: str, api_key: str | None = None) -> WeatherResult:
-    api_key = api_key or os.getenv("OPENWEATHERMAP_API_KEY")
+# ---------- Hedged fallback ----------
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="weather-hedge")
+
+def _hedged(attempts: List[Callable[[], WeatherResult]], delay: float) -> WeatherResult:
+    """Try providers in order. With `delay` > 0 the next provider is started when the
+    current one hasn't answered after `delay` seconds (or failed), and the first success wins."""
+    if delay <= 0 or len(attempts) == 1:
+        for i, attempt in enumerate(attempts):
+            try:
+                return attempt()
+            except Exception:
+                if i == len(attempts) - 1:
+                    raise
+    # Copied context: spans recorded by the attempts land in the caller's turn breakdown
+    pending = {_HEDGE_POOL.submit(contextvars.copy_context().run, attempts[0])}
+    queued = list(attempts[1:])
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, timeout=delay if queued else None, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is None:
+                return fut.result()
+            error = fut.exception()
+        if queued and (not done or error is not None):
+            pending.add(_HEDGE_POOL.submit(contextvars.copy_context().run, queued.pop(0)))
+    raise error  # type: ignore[misc]
+
+async def _ahedged(attempts: List[Callable[[], Awaitable[WeatherResult]]], delay: float) -> WeatherResult:
+    """Async `_hedged`: losers are cancelled once a provider answers."""
+    if delay <= 0 or len(attempts) == 1:
+        for i, attempt in enumerate(attempts):
+            try:
+                return await attempt()
+            except Exception:
+                if i == len(attempts) - 1:
+                    raise
+    pending = {asyncio.ensure_future(attempts[0]())}
+    queued = list(attempts[1:])
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=delay if queued else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+            if queued and (not done or error is not None):
+                pending.add(asyncio.ensure_future(queued.pop(0)()))
+        raise error  # type: ignore[misc]
+    finally:
+        for task in pending:
+            task.cancel()
+
+def _fetch_uncached(city: str, api_key: str | None) -> WeatherResult:
+    attempts: List[Callable[[], WeatherResult]] = []
     if api_key:
+        attempts.append(lambda: _fetch_openweathermap(city, api_key))
+    attempts.append(lambda: _fetch_open_meteo(city))
+    return _count_fallback(_hedged(attempts, _env_seconds("WEATHER_HEDGE_S")), api_key)
+
+def _count_fallback(res: WeatherResult, api_key: str | None) -> WeatherResult:
+    if api_key and res.provider != "openweathermap":
+        metrics.incr("weather.fallback")  # OWM failed or was slower than the hedge
+    return res
+
+async def _afetch_uncached(city: str, api_key: str | None) -> WeatherResult:
+    attempts: List[Callable[[], Awaitable[WeatherResult]]] = []
+    if api_key:
+        attempts.append(lambda: OpenWeatherMap(api_key).afetch(city))
+    attempts.append(lambda: OpenMeteo().afetch(city))
+    return _count_fallback(await _ahedged(attempts, _env_seconds("WEATHER_HEDGE_S")), api_key)
+
+# ---------- Cached entry points ----------
+def _load_conditions(key, city: str, api_key: str | None) -> WeatherResult:
+    """Upstream fetch shared by all concurrent callers for the same city."""
+    def _load():
+        res = _fetch_uncached(city, api_key)
+        _CONDITIONS.set(key, res)
+        return res
+    return _FLIGHT.do(("conditions", key), _load)
+
+def _revalidate(key, city: str, api_key: str | None) -> None:
+    if _FLIGHT.in_flight(("conditions", key)):
+        return
+
+    def _run():
         try:
-            return _fetch_openweathermap(city, api_key)
+            _load_conditions(key, city, api_key)
         except Exception:
-            pass
-    return _fetch_open_meteo(city)
+            pass  # keep serving the stale value
+    threading.Thread(target=_run, name=f"weather-refresh-{key[0]}", daemon=True).start()
+
+def _cached(key) -> Tuple[Optional[WeatherResult], Optional[Tuple[WeatherResult, float]], bool]:
+    """(result to serve now, cache entry, needs background refresh)."""
+    hit = _CONDITIONS.get(key)
+    if hit is not None:
+        cached, age = hit
+        if age < _env_seconds("WEATHER_TTL_S"):
+            metrics.incr("weather.cache.hit")
+            return cached, hit, False
+        if age < _env_seconds("WEATHER_STALE_S"):
+            metrics.incr("weather.cache.stale")
+            return replace(cached, stale=True), hit, True
+    metrics.incr("weather.cache.miss")
+    return None, hit, False
+
+def _stale_if_error(hit) -> Optional[WeatherResult]:
+    if hit is not None and hit[1] < _env_seconds("WEATHER_STALE_IF_ERROR_S"):
+        metrics.incr("weather.stale_if_error")
+        return replace(hit[0], stale=True)
+    return None
+
+def fetch_weather(city: str, api_key: str | None = None) -> WeatherResult:
+    """Current conditions for `city`, cached per normalized city name.
+
+    Fresh results (< WEATHER_TTL_S) are served directly; stale ones (< WEATHER_STALE_S) are
+    served immediately while one background refresh runs; if the provider fails, a cached
+    result up to WEATHER_STALE_IF_ERROR_S old is returned instead of the error.
+    """
+    api_key = api_key or os.getenv("OPENWEATHERMAP_API_KEY")
+    key = (_norm_city(city), bool(api_key))
+    now, hit, refresh = _cached(key)
+    if refresh:
+        _revalidate(key, city, api_key)
+    if now is not None:
+        return now
+    try:
+        return _load_conditions(key, city, api_key)
+    except Exception:
+        stale = _stale_if_error(hit)
+        if stale is not None:
+            return stale
+        raise
+
+# In-flight async fetches per (event loop, key), so concurrent coroutines share one call
+_AFLIGHT: Dict[Tuple[int, Any], "asyncio.Future[WeatherResult]"] = {}
+
+async def afetch_weather(city: str, api_key: str | None = None) -> WeatherResult:
+    """Async `fetch_weather` over httpx with the same cache, coalescing and hedging."""
+    api_key = api_key or os.getenv("OPENWEATHERMAP_API_KEY")
+    key = (_norm_city(city), bool(api_key))
+    now, hit, refresh = _cached(key)
+    if refresh:
+        _revalidate(key, city, api_key)
+    if now is not None:
+        return now
+
+    slot = (id(asyncio.get_running_loop()), key)
+    fut = _AFLIGHT.get(slot)
+    if fut is None:
+        async def _load():
+            try:
+                res = await _afetch_uncached(city, api_key)
+                _CONDITIONS.set(key, res)
+                return res
+            finally:
+                _AFLIGHT.pop(slot, None)
+        fut = _AFLIGHT[slot] = asyncio.ensure_future(_load())
+    try:
+        return await asyncio.shield(fut)
+    except Exception:
+        stale = _stale_if_error(hit)
+        if stale is not None:
+            return stale
+        raise
@@ -0,0 +1,58 @@
+import numpy as np
+
+import src.graph.agent_graph as ag
+from src.config import Settings
+from src.graph.agent_graph import build_graph
+from src.rag.answer_cache import SemanticAnswerCache
+from src.rag.index import RetrievedChunk
+from src.resources import invalidate
+
+
+def test_near_duplicate_query_hits_above_threshold():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=2)
+    cache.store("What is K2?", "A structure-learning algorithm.", ["ctx"], latency_s=2.0, vec=[1.0, 0.0])
+
+    hit = cache.lookup("what's K2 ??", vec=[0.99, 0.05])
+    assert hit is not None and hit.answer == "A structure-learning algorithm."
+    assert hit.similarity > 0.9
+    assert cache.lookup("Unrelated", vec=[0.0, 1.0]) is None
+    # Text-only match when no vector is available
+    assert cache.lookup("  what is   k2? ") is not None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2 and stats["misses"] == 1 and stats["saved_s"] == 4.0
+
+
+def test_lru_eviction():
+    cache = SemanticAnswerCache(max_entries=2)
+    for q in ("a", "b", "c"):
+        cache.store(q, q.upper(), [], 0.1)
+    assert cache.lookup("a") is None and cache.lookup("c").answer == "C"
+
+
+def test_graph_serves_repeated_question_from_cache_until_reindex(monkeypatch):
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+    llm_calls = []
+
+    def fake_llm(_name, _settings=None):
+        llm_calls.append(1)
+        return GenericFakeChatModel(messages=iter(["K2 learns the network."]))
+
+    monkeypatch.setattr(ag, "search_chunks",
+                        lambda q, s, k=5, filter=None: [RetrievedChunk("K2 is a search algorithm.", 0.9)])
+    monkeypatch.setattr(ag, "get_chat_model", fake_llm)
+    monkeypatch.setattr(ag, "embed_query", lambda q, s: np.array([1.0, 0.0], dtype=np.float32))
+    invalidate("answer_cache")
+    graph = build_graph(Settings())
+    state = {"history": [], "query": "What is K2?", "params": {}, "context": [], "answer": ""}
+
+    first = graph.invoke(dict(state))
+    second = graph.invoke(dict(state, query="What does K2 do?"))
+    assert len(llm_calls) == 1
+    assert not first["cached"] and second["cached"]
+    assert second["rag_answer"] == "K2 learns the network."
+
+    invalidate("answer_cache")  # what indexing a new PDF does
+    graph.invoke(dict(state))
+    assert len(llm_calls) == 2
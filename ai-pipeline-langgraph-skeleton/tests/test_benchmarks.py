@@ -0,0 +1,41 @@
+from benchmarks.bench_storage_profiles import (
+    bench_profile, exact_top_k, ram_estimate_bytes, simulated_recall, synthetic_corpus,
+)
+from benchmarks.suite import compare, question_set, synthetic_pdf
+from src.vectorstore.qdrant_store import STORAGE_PROFILES
+from src.rag.pdf_loader import load_and_chunk_pdf, page_count
+
+
+def test_synthetic_pdf_is_indexable_and_questions_come_from_its_chunks(tmp_path):
+    pdf = synthetic_pdf(str(tmp_path / "s.pdf"), pages=3)
+    assert page_count(pdf) == 3
+    chunks = [" ".join(c.page_content.split()) for c in load_and_chunk_pdf(pdf)]
+    questions = question_set(pdf, n=5)
+    assert len(questions) == 5
+    assert all(any(q in c for c in chunks) for q in questions)
+
+
+def test_compare_flags_regressions_by_direction():
+    base = {"tfidf": {"local.paper": {"chunks_per_s": 100.0, "recall@5": 0.9,
+                                      "query": {"p50_ms": 10.0, "p95_ms": 1.0}}},
+            "memory": {"index_peak_mb": 50.0}}
+    cur = {"tfidf": {"local.paper": {"chunks_per_s": 60.0, "recall@5": 0.95,
+                                     "query": {"p50_ms": 14.0, "p95_ms": 1.9}}},
+           "memory": {"index_peak_mb": 40.0}}
+    regressions = compare(cur, base, tolerance=0.25)
+    assert [r.split(":")[0] for r in regressions] == [
+        "tfidf.local.paper.chunks_per_s", "tfidf.local.paper.query.p50_ms"]
+    assert compare(cur, base, tolerance=0.5) == []
+
+
+def test_storage_profile_bench_measures_recall_and_footprint(tmp_path):
+    corpus, queries = synthetic_corpus(300, 32, 10)
+    truth = exact_top_k(corpus, queries, 5)
+    scalar = STORAGE_PROFILES["scalar"]
+    result = bench_profile("scalar", scalar, corpus, queries, truth, url=None, tmp=str(tmp_path))
+    assert result["recall_at_k"] == 1.0  # embedded Qdrant searches exactly
+    sim = result["simulated"]
+    assert sim["recall_rescored"] >= sim["recall_no_rescore"] > 0.5
+    default_ram = ram_estimate_bytes(STORAGE_PROFILES["default"], 300, 32, 0)
+    assert ram_estimate_bytes(scalar, 300, 32, 10_000) < default_ram
+    assert simulated_recall(STORAGE_PROFILES["on_disk"], corpus, queries, truth) == {}
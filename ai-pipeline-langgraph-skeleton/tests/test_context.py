@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from src.config import Settings
+from src.rag import context as ctxmod
+from src.rag.context import build_context, count_tokens, dedupe, pack
+from src.rag.pdf_loader import load_and_chunk_pdf
+from src.resources import invalidate
+
+
+@pytest.fixture
+def chars_per_token(monkeypatch):
+    """Deterministic counting (~4 characters per token) whether or not tiktoken can load."""
+    monkeypatch.setattr(ctxmod, "count_tokens", lambda text: (len(text) + 3) // 4)
+
+
+def _chunks():
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "10.1.1.1050.4503.pdf")
+    return [d.page_content for d in load_and_chunk_pdf(path)]
+
+
+def test_overlap_between_neighbouring_chunks_is_removed():
+    chunks = _chunks()[:6]
+    out = dedupe(chunks)
+    assert len(out) == len(chunks)
+    assert count_tokens("\n\n".join(out)) < count_tokens("\n\n".join(chunks))
+    # nothing but the overlap is lost: every chunk is still covered
+    for original, trimmed in zip(chunks, out):
+        assert trimmed in original
+
+
+def test_near_duplicates_are_dropped():
+    text = ("Bayesian networks model traffic accident risk from road, driver and weather data. "
+            "The structure is learned from police reports and validated against held-out years, "
+            "with severity as the target node and speed, lighting and surface as parents.")
+    near = text.replace("held-out years", "held out years")
+    other = "Something else entirely about results."
+    assert dedupe([text, near, other]) == [text, other]
+
+
+def test_pack_respects_budget_and_keeps_rank_order(chars_per_token):
+    passages = ["a" * 400, "b" * 4000, "c" * 400]
+    out = pack(passages, budget=250)
+    assert out == ["a" * 400, "c" * 400]
+    assert pack(["x" * 4000], budget=100) == ["x" * 400]  # top passage truncated, never dropped
+
+
+def test_build_context_reranks_and_reports_tokens_saved(monkeypatch, chars_per_token):
+    class FakeCrossEncoder:
+        def predict(self, pairs):
+            return [1.0 if "weather" in p else 0.0 for _, p in pairs]
+
+    invalidate("reranker")
+    monkeypatch.setattr(ctxmod, "_load_cross_encoder", lambda name: FakeCrossEncoder())
+    chunks = _chunks()[:8] + ["Road weather conditions drive accident severity."]
+    report = build_context("weather", chunks, Settings(RERANK_MODEL="fake", CONTEXT_TOKEN_BUDGET=600))
+
+    assert report.passages[0] == "Road weather conditions drive accident severity."
+    assert report.tokens_out <= 600 < report.tokens_in
+    assert report.stats()["tokens_saved"] == report.tokens_in - report.tokens_out
+    invalidate("reranker")
+
+
+
+def test_failed_tokenizer_load_is_retried(monkeypatch):
+    loads = []
+
+    def load(encoding):
+        loads.append(encoding)
+        if len(loads) == 1:
+            raise ConnectionError("offline")
+        return len
+
+    monkeypatch.setattr(ctxmod, "_tiktoken_counter", load)
+    monkeypatch.setattr(ctxmod, "_FAILED_LOADS", {})
+    invalidate("tokenizer")
+    try:
+        assert count_tokens("x" * 40) == 10 and count_tokens("x") == 1  # fallback, not re-fetched
+        assert len(loads) == 1
+        monkeypatch.setattr(ctxmod, "_LOAD_RETRY_S", 0.0)
+        assert count_tokens("x" * 40) == 40 and len(loads) == 2
+    finally:
+        invalidate("tokenizer")
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.config import Settings
+from src.rag import index
+from src.rag.embed_batcher import EmbeddingBatcher
+from src.resources import invalidate
+
+
+def _slow_embed(calls, delay=0.02):
+    def _embed(texts):
+        calls.append(list(texts))
+        time.sleep(delay)  # per-call overhead dominates, as with an ONNX session
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+    return _embed
+
+
+def test_concurrent_requests_share_batches():
+    calls = []
+    batcher = EmbeddingBatcher(_slow_embed(calls), max_batch_size=64, max_wait_ms=5)
+    texts = ["x" * n for n in range(1, 33)]
+    with ThreadPoolExecutor(32) as pool:
+        results = list(pool.map(lambda t: batcher.embed([t]), texts))
+    batcher.close()
+
+    assert [r.tolist() for r in results] == [[[float(len(t)), 1.0]] for t in texts]
+    assert len(calls) < len(texts) / 2
+    stats = batcher.stats()
+    assert stats["requests"] == 32 and stats["texts"] == 32 and stats["batches"] == len(calls)
+    assert stats["mean_batch_size"] > 2 and stats["texts_per_s"] > 0
+
+
+def test_batches_never_exceed_max_size_unless_one_request_does():
+    calls = []
+    batcher = EmbeddingBatcher(_slow_embed(calls, delay=0.01), max_batch_size=4, max_wait_ms=10)
+    with ThreadPoolExecutor(12) as pool:
+        list(pool.map(lambda i: batcher.embed([f"q{i}", f"r{i}"]), range(12)))
+    big = batcher.embed([str(i) for i in range(10)])
+    batcher.close()
+    assert big.shape == (10, 2)
+    assert all(len(c) <= 4 for c in calls[:-1]) and len(calls[-1]) == 10
+
+
+def test_errors_reach_every_caller_in_the_batch():
+    def broken(texts):
+        time.sleep(0.01)
+        raise RuntimeError("model crashed")
+
+    batcher = EmbeddingBatcher(broken, max_wait_ms=5)
+    with ThreadPoolExecutor(4) as pool:
+        futures = [pool.submit(batcher.embed, ["q"]) for _ in range(4)]
+    for f in futures:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            f.result()
+    batcher.close()
+    assert batcher.embed([]).shape[0] == 0
+
+
+def test_closed_batcher_embeds_inline():
+    calls = []
+    batcher = EmbeddingBatcher(_slow_embed(calls, delay=0), max_wait_ms=1)
+    batcher.close()
+    assert batcher.embed(["abc"]).tolist() == [[3.0, 1.0]]
+    assert calls == [["abc"]]
+
+
+def test_query_embeddings_go_through_the_shared_batcher(monkeypatch):
+    calls = []
+    monkeypatch.setattr(index, "_fastembed_embedder", lambda model, threads=None: _slow_embed(calls))
+    invalidate("embed_batcher")
+    settings = Settings(EMBED_CACHE=False, EMBED_BATCH_MAX_WAIT_MS=5)
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            vecs = list(pool.map(lambda i: index.embed_query("q" * i, settings), range(1, 17)))
+        assert [v[0] for v in vecs] == [float(i) for i in range(1, 17)]
+        assert len(calls) < 8
+
+        calls.clear()
+        index._dense_embedder(settings)(["chunk one", "chunk two"])  # indexing bypasses the batcher
+        assert calls == [["chunk one", "chunk two"]]
+    finally:
+        invalidate("embed_batcher")
@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.rag.embed_cache import EmbeddingCache
+
+
+def _fake_embed(calls):
+    def _embed(texts):
+        calls.append(list(texts))
+        return np.array([[float(len(t)), 1.0, 0.5] for t in texts], dtype=np.float32)
+    return _embed
+
+
+def test_embed_only_computes_misses(tmp_path):
+    calls = []
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite"))
+    first = cache.embed("m", ["a", "bb", "a"], _fake_embed(calls))
+    assert first.tolist() == [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5], [1.0, 1.0, 0.5]]
+    assert calls == [["a", "bb"]]  # duplicate in one call embedded once
+
+    cache.embed("m", ["bb", "ccc"], _fake_embed(calls))
+    assert calls[-1] == ["ccc"]
+    assert cache.stats()["memory_hits"] == 1
+    # Same text under another model is a different entry
+    cache.embed("other", ["bb"], _fake_embed(calls))
+    assert calls[-1] == ["bb"]
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    calls = []
+    EmbeddingCache(path).embed("m", ["hello"], _fake_embed(calls))
+
+    reopened = EmbeddingCache(path)
+    assert reopened.embed("m", ["hello"], _fake_embed(calls)).tolist() == [[5.0, 1.0, 0.5]]
+    assert len(calls) == 1
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_size_bounded_eviction_drops_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "c.sqlite"), max_entries=10, memory_entries=2)
+    cache.put_many("m", [f"t{i}" for i in range(10)], [[float(i)] for i in range(10)])
+    cache.get_many("m", ["t0"])  # touch the oldest so it survives
+    cache.put_many("m", ["new"], [[99.0]])
+
+    (count,) = cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert count == 9
+    assert len(cache._lru) == 2
+    cache._lru.clear()
+    got = cache.get_many("m", ["t0", "t1", "new"])
+    assert got[0].tolist() == [0.0] and got[1] is None and got[2].tolist() == [99.0]
+
+
+def test_writes_below_the_bound_skip_the_row_count(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    EmbeddingCache(path, max_entries=10).put_many("m", ["a", "b", "c"], [[1.0], [2.0], [3.0]])
+    cache = EmbeddingCache(path, max_entries=10)  # the count is seeded from the existing rows
+    counts = []
+    cache._db.set_trace_callback(lambda sql: counts.append(sql) if "COUNT(*)" in sql else None)
+    for i in range(7):
+        cache.put_many("m", [f"t{i}"], [[float(i)]])
+    assert counts == []
+    cache.put_many("m", ["over"], [[0.0]])
+    (count,) = cache._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+    assert len(counts) == 2 and count == cache._rows == 9
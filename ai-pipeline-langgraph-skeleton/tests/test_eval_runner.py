@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from src.config import Settings
+from src.eval.runner import Example, ResultCache, compare_reports, load_examples, main, run_eval
+from src.llm_fake import FakeChatModel
+from src.resources import invalidate
+
+DATASET = [
+    {"id": "a", "inputs": {"query": "Which algorithm learns the structure?"},
+     "outputs": {"context_contains": ["K2 algorithm"], "answer_contains": ["k2"]}},
+    {"id": "b", "inputs": {"query": "What is the accident probability?"},
+     "outputs": {"context_contains": ["seventeen percent"]}},
+    {"id": "c", "inputs": {"query": "Any weather?", "city": "Chennai"}, "outputs": {}},
+]
+
+
+class StubGraph:
+    """Answers from a fixed context after `delay_s`; records the peak concurrency."""
+
+    def __init__(self, delay_s=0.05, fail=()):
+        self.delay_s, self.fail = delay_s, set(fail)
+        self.calls, self.active, self.peak = [], 0, 0
+        self._lock = threading.Lock()
+
+    def invoke(self, state):
+        with self._lock:
+            self.calls.append(state["query"])
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay_s)
+        with self._lock:
+            self.active -= 1
+        if state["query"] in self.fail:
+            raise RuntimeError("boom")
+        return {**state, "context": ["The  K2 ALGORITHM is used."], "rag_answer": "K2.", "answer": "K2.",
+                "timings": {"rag": 0.01}}
+
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_BACKEND", "local")
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path / "store"))
+    return Settings(WARMUP=False)
+
+
+def _examples():
+    return [Example.from_record(r) for r in DATASET]
+
+
+def test_examples_load_from_jsonl_when_langsmith_is_unavailable(tmp_path, monkeypatch):
+    monkeypatch.delenv("LANGCHAIN_API_KEY", raising=False)
+    path = tmp_path / "ds.jsonl"
+    path.write_text("\n".join(json.dumps(r) for r in DATASET) + '\n{"query": "flat record"}\n')
+    examples, source = load_examples(str(path), dataset="remote-ds")
+    assert source == str(path)
+    assert [e.id for e in examples] == ["a", "b", "c", "line-4"]
+    assert examples[2].city == "Chennai" and examples[0].context_contains == ["K2 algorithm"]
+    with pytest.raises(RuntimeError):
+        load_examples(None, dataset="remote-ds")
+    path.write_text("\n".join(json.dumps(r) for r in DATASET + DATASET[:1]) + "\n")
+    with pytest.raises(ValueError, match="Duplicate example id"):
+        load_examples(str(path))
+
+
+def test_run_scores_examples_in_parallel(settings, tmp_path):
+    graph = StubGraph(delay_s=0.1)
+    report = run_eval(_examples(), settings, workers=3, cache_dir=str(tmp_path / "c"), graph=graph)
+    assert graph.peak == 3  # all three examples in flight at once
+
+    summary = report["summary"]
+    assert summary["examples"] == 3 and summary["errors"] == 0
+    assert summary["context_hit_rate"] == 0.5  # "a" hit, "b" missed, "c" not scored
+    assert summary["answer_hit_rate"] == 1.0
+    assert set(summary["latency"]) == {"p50_ms", "p95_ms", "p99_ms"} and summary["rag_latency"]["p50_ms"] == 10.0
+    assert [r["id"] for r in report["examples"]] == ["a", "b", "c"]
+
+
+def test_unchanged_examples_are_served_from_the_cache(settings, tmp_path):
+    cache = str(tmp_path / "c")
+    first = run_eval(_examples(), settings, cache_dir=cache, graph=StubGraph(fail={"Any weather?"}))
+    assert first["summary"]["errors"] == 1
+
+    graph = StubGraph()
+    examples = _examples()
+    examples[1].context_contains = ["K2"]  # changed expectation -> re-evaluated
+    again = run_eval(examples, settings, cache_dir=cache, graph=graph)
+    assert sorted(graph.calls) == ["Any weather?", "What is the accident probability?"]  # failures aren't cached
+    assert again["run"]["from_cache"] == 1 and again["examples"][0]["from_cache"]
+
+    graph = StubGraph()
+    run_eval(_examples(), settings, cache_dir=cache, graph=graph, revision="next")
+    assert len(graph.calls) == 3
+
+
+def test_compare_reports_shows_deltas_and_flips(settings):
+    base = run_eval(_examples(), settings, cache_dir=None, graph=StubGraph())
+    examples = _examples()
+    examples[0].context_contains = ["not in the context"]
+    cur = run_eval(examples, settings, cache_dir=None, graph=StubGraph())
+    diff = compare_reports(cur, base)
+    assert diff["deltas"]["context_hit_rate"] == -0.5
+    assert diff["flipped"]["context_hit"] == [{"id": "a", "now": False}]
+    assert "latency.p50_ms" in diff["deltas"]
+
+
+def test_cli_fake_llm_flag_answers_with_the_fake_model(settings, tmp_path, monkeypatch, capsys):
+    from src.rag.index import index_pdf_into_qdrant
+
+    for var in ("GROQ_API_KEY", "OPENAI_API_KEY", "LLM_PROVIDER"):
+        monkeypatch.delenv(var, raising=False)
+    monkeypatch.setenv("WARMUP", "false")
+    path = tmp_path / "ds.jsonl"
+    path.write_text(json.dumps({"id": "a", "inputs": {"query": "Which algorithm learns the structure?"}}) + "\n")
+    out = tmp_path / "report.json"
+    try:
+        with open(os.path.join(os.path.dirname(__file__), "..", "data", "10.1.1.1050.4503.pdf"), "rb") as fh:
+            index_pdf_into_qdrant(fh, settings)
+        main(["--fake-llm", "--file", str(path), "--no-cache", "--workers", "1", "--out", str(out)])
+    finally:
+        invalidate("vector_store")
+        invalidate("llm")
+    capsys.readouterr()
+    report = json.loads(out.read_text())
+    assert report["summary"]["errors"] == 0
+    assert FakeChatModel().response in report["examples"][0]["answer"]  # not the extractive fallback
+
+
+def test_concurrent_cache_writes_of_one_key_do_not_collide(tmp_path):
+    cache = ResultCache(str(tmp_path), run_key="r")
+    example = _examples()[0]
+    errors = []
+
+    def write(i):
+        try:
+            for _ in range(50):
+                cache.put(example, {"writer": i})
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == [] and cache.get(example)["writer"] in range(4)
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
@@ -0,0 +1,136 @@
+import os
+
+import numpy as np
+import pytest
+
+import src.graph.agent_graph as ag
+from src.config import Settings
+from src.graph.agent_graph import build_graph
+from src.resources import invalidate
+from src.vectorstore.base import SearchFilter
+from src.vectorstore.local_store import LocalVectorStore
+
+_PDF = os.path.join(os.path.dirname(__file__), "..", "data", "10.1.1.1050.4503.pdf")
+
+
+def _data(n=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(n)]
+    payloads = [{"text": f"chunk {i}", "source": "a.pdf" if i % 2 else "b.pdf", "doc_id": f"doc-{i % 2}",
+                 "page": i % 10, "indexed_at": 1000.0 + i} for i in range(n)]
+    return vecs, ids, payloads
+
+
+def test_filter_parsing_and_matching():
+    f = SearchFilter.from_dict({"source": "a.pdf", "pages": [2, 3], "indexed_after": 1000})
+    assert f == SearchFilter(sources=("a.pdf",), page_from=2, page_to=3, indexed_after=1000.0)
+    assert f.matches({"source": "a.pdf", "page": 1, "indexed_at": 1000.0})  # stored pages are 0-based
+    assert not f.matches({"source": "a.pdf", "page": 3, "indexed_at": 1000.0})
+    assert not f.matches({"source": "a.pdf", "page": 1})  # predates upload timestamps
+    assert SearchFilter.from_dict({"page": 4}).page_from == 4
+    assert SearchFilter.from_dict({"indexed_before": "2024-01-01T00:00:00+00:00"}).indexed_before == 1704067200.0
+    assert SearchFilter.from_dict({}) is None and SearchFilter.from_dict(None) is None
+    for bad in ({"pages": [0, 2]}, {"source": 3}, {"colour": "red"}, {"indexed_after": "yesterday"}):
+        with pytest.raises(ValueError):
+            SearchFilter.from_dict(bad)
+
+
+@pytest.mark.parametrize("hnsw_min", [20_000, 50])
+def test_local_store_filtered_search_ranks_only_matching_rows(tmp_path, hnsw_min):
+    if hnsw_min < 20_000:
+        pytest.importorskip("hnswlib")
+    vecs, ids, payloads = _data()
+    store = LocalVectorStore(str(tmp_path), hnsw_min=hnsw_min)
+    store.recreate_collection("docs", 16)
+    store.upsert("docs", vecs[:150], payloads[:150], ids[:150])
+    store.ensure_payload_indexes("docs")
+
+    f = SearchFilter(sources=("a.pdf",), page_from=2, page_to=4)
+    hits = store.search("docs", vecs[0], k=100, filter=f)
+    assert hits and all(f.matches(p) for _, p in hits)
+    assert len(hits) == sum(f.matches(p) for p in payloads[:150])
+    assert [s for s, _ in hits] == sorted((s for s, _ in hits), reverse=True)
+
+    store.upsert("docs", vecs[150:], payloads[150:], ids[150:])  # filter columns follow appends
+    late = SearchFilter(indexed_after=1150.0)
+    assert {p["text"] for _, p in store.search("docs", vecs[0], k=100, filter=late)} == {
+        f"chunk {i}" for i in range(150, 200)}
+    assert store.search_batch("docs", [vecs[0], vecs[1]], k=5, filter=SearchFilter(doc_ids=("none",))) == [[], []]
+
+
+def test_qdrant_filters_and_payload_indexes(tmp_path):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qm
+
+    from src.vectorstore.qdrant_store import QdrantStore, ensure_payload_indexes
+
+    vecs, ids, payloads = _data(n=60)
+    client = QdrantClient(path=str(tmp_path))
+    try:
+        store = QdrantStore(client)
+        store.recreate_collection("docs", 16)
+        store.upsert("docs", vecs, payloads, ids=list(range(60)))
+        store.ensure_payload_indexes("docs")  # embedded Qdrant has no payload indexes: skipped
+        f = SearchFilter(doc_ids=("doc-1",), page_to=3, indexed_before=1050.0)
+        hits = store.search("docs", vecs[0], k=60, filter=f)
+        assert hits and len(hits) == sum(f.matches(p) for p in payloads)
+        batch = store.search_batch("docs", [vecs[0], vecs[3]], k=60, filter=f)
+        assert [len(h) for h in batch] == [len(hits)] * 2
+    finally:
+        client.close()
+
+    class _ServerClient:  # only what ensure_payload_indexes touches
+        created = []
+
+        def collection_exists(self, name):
+            return True
+
+        def get_collection(self, name):
+            return type("Info", (), {"payload_schema": {"source": object()}})()
+
+        def create_payload_index(self, name, field, field_schema, wait):
+            self.created.append((field, field_schema))
+
+    ensure_payload_indexes(_ServerClient(), "docs")
+    assert _ServerClient.created == [("doc_id", qm.PayloadSchemaType.KEYWORD),
+                                     ("page", qm.PayloadSchemaType.INTEGER),
+                                     ("indexed_at", qm.PayloadSchemaType.FLOAT)]
+
+
+def test_scoped_turns_return_sources_and_skip_the_llm_when_nothing_passes(monkeypatch, tmp_path):
+    from src.rag.index import index_pdf_into_qdrant, search_chunks
+
+    llm_calls = []
+
+    def no_llm(_name, _settings=None):
+        llm_calls.append(1)
+        raise RuntimeError("no LLM in tests")
+
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    monkeypatch.setattr(ag, "get_chat_model", no_llm)
+    monkeypatch.setattr(ag, "fetch_weather", lambda city, api_key=None: None)
+    settings = Settings(QDRANT_COLLECTION="test_scoped", VECTOR_BACKEND="local", ANSWER_CACHE=False)
+    try:
+        with open(_PDF, "rb") as fh:
+            report = index_pdf_into_qdrant(fh, settings)
+        chunks = search_chunks("bayesian network", settings, k=5, filter=SearchFilter(page_from=2, page_to=2))
+        assert chunks and all(c.metadata["page"] == 1 and c.metadata["doc_id"] == report.doc_id for c in chunks)
+        assert chunks[0].metadata["source"] == os.path.basename(_PDF) and "text" not in chunks[0].metadata
+
+        graph = build_graph(settings)
+        state = {"history": [], "query": "bayesian network", "context": [], "answer": ""}
+        out = graph.invoke(dict(state, params={"filter": {"doc_id": report.doc_id, "pages": [2, 3]}}))
+        assert out["context"] and len(llm_calls) == 1  # extractive fallback after the failed LLM call
+        assert out["sources"] and all(s["page"] in (2, 3) for s in out["sources"])
+
+        out = graph.invoke(dict(state, params={"filter": {"source": "other.pdf"}}))
+        assert out["rag_answer"] == ag._NO_DOCS and out["sources"] == [] and len(llm_calls) == 1
+
+        strict = Settings(QDRANT_COLLECTION="test_scoped", VECTOR_BACKEND="local", ANSWER_CACHE=False,
+                          RETRIEVAL_MIN_SCORE=1.01)
+        assert search_chunks("bayesian network", strict, k=5) == []
+        out = build_graph(strict).invoke(dict(state, params={}))
+        assert out["rag_answer"] == ag._NO_DOCS and len(llm_calls) == 1
+    finally:
+        invalidate("vector_store")
@@ -1,11 +1,164 @@
-from src.graph.agent_graph import router, AppState
+import asyncio
+import time
 
-def make_state(q: str) -> AppState:
-    return {"history": [], "query": q, "params": {}, "context": [], "answer": ""}
+import src.graph.agent_graph as ag
+from src.config import Settings
+from src.graph.agent_graph import AppState, build_graph
+from src.rag.index import RetrievedChunk
+from src.resources import invalidate
+from src.weather.api import WeatherResult
 
-def test_router_weather_keywords():
-    assert router(make_state("What's the weather in Chennai?")) == "weather"
-    assert router(make_state("Temperature today?")) == "weather"
 
-def test_router_default_rag():
-    assert router(make_state("Explain section 2 of my PDF.")) == "rag"
+def make_state(q: str, city: str = "") -> AppState:
+    return {"history": [], "query": q, "params": {"city": city}, "context": [], "answer": ""}
+
+
+def _stub_branches(monkeypatch, delay: float = 0.3):
+    def fake_retrieve(query, settings, k=5, filter=None):
+        time.sleep(delay)
+        return [RetrievedChunk("Section 2 explains the method.", 0.9)]
+
+    def fake_weather(city, api_key=None):
+        time.sleep(delay)
+        return WeatherResult(city=city, description="clear sky", temperature_c=30.0, provider="stub")
+
+    async def afake_weather(city, api_key=None):
+        await asyncio.sleep(delay)
+        return WeatherResult(city=city, description="clear sky", temperature_c=30.0, provider="stub")
+
+    def no_llm(*_args, **_kwargs):
+        raise RuntimeError("no LLM in tests")
+
+    monkeypatch.setattr(ag, "search_chunks", fake_retrieve)
+    monkeypatch.setattr(ag, "fetch_weather", fake_weather)
+    monkeypatch.setattr(ag, "afetch_weather", afake_weather)
+    monkeypatch.setattr(ag, "get_chat_model", no_llm)
+    monkeypatch.setattr(ag, "embed_query", lambda query, settings: None)
+    invalidate("answer_cache")
+
+
+def test_graph_fans_out_rag_and_weather_in_parallel(monkeypatch):
+    _stub_branches(monkeypatch)
+    graph = build_graph(Settings())
+
+    t0 = time.perf_counter()
+    out = graph.invoke(make_state("Explain section 2 of my PDF.", city="Chennai"))
+    elapsed = time.perf_counter() - t0
+
+    assert "## 📘 PDF Answer" in out["answer"]
+    assert "Section 2 explains the method." in out["answer"]
+    assert "Chennai: clear sky, 30.0°C (via stub)" in out["answer"]
+    assert out["context"] == ["Section 2 explains the method."]
+    assert {"rag", "weather", "combine"} <= set(out["timings"])
+    assert elapsed < 0.55  # max of the branches, not their sum
+
+
+def test_graph_ainvoke_runs_branches_concurrently(monkeypatch):
+    _stub_branches(monkeypatch)
+    graph = build_graph(Settings())
+
+    t0 = time.perf_counter()
+    out = asyncio.run(graph.ainvoke(make_state("What's the weather in Chennai?", city="Chennai")))
+    elapsed = time.perf_counter() - t0
+
+    assert "Chennai: clear sky" in out["weather"]
+    assert elapsed < 0.55
+
+
+def test_graph_without_city_still_answers(monkeypatch):
+    _stub_branches(monkeypatch, delay=0)
+    out = build_graph(Settings()).invoke(make_state("Temperature today?"))
+    assert "No city provided" in out["answer"]
+
+
+def test_stream_turn_emits_tokens_weather_and_ttft(monkeypatch):
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+    _stub_branches(monkeypatch, delay=0)
+    monkeypatch.setattr(
+        ag, "get_chat_model", lambda _name, _settings=None: GenericFakeChatModel(messages=iter(["Section two answer"]))
+    )
+    events = list(ag.stream_turn(build_graph(Settings()), make_state("Explain section 2", "Chennai")))
+
+    tokens = "".join(p for kind, p in events if kind == "token")
+    assert tokens == "Section two answer"
+    assert any(kind == "weather" and "Chennai" in p for kind, p in events)
+    kind, final = events[-1]
+    assert kind == "final"
+    assert "Section two answer" in final["answer"]
+    assert 0 < final["timings"]["ttft"] <= final["timings"]["total"]
+
+
+def test_batch_answer_batches_retrieval_dedupes_weather_and_bounds_llm(monkeypatch):
+    import threading
+    from langchain_core.messages import AIMessage
+    from langchain_core.runnables import RunnableLambda
+
+    _stub_branches(monkeypatch, delay=0)
+    calls = {"embed": 0, "retrieve": 0, "weather": []}
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def fake_embed(queries, settings):
+        calls["embed"] += 1
+        return None
+
+    def fake_retrieve_batch(queries, settings, k=5, qvecs=None, filter=None):
+        calls["retrieve"] += 1
+        return [[] if "boom" in q else [RetrievedChunk(f"Doc for {q}", 0.9)] for q in queries]
+
+    def fake_weather(city, api_key=None):
+        calls["weather"].append(city)
+        if city == "Atlantis":
+            raise RuntimeError("unknown city")
+        return WeatherResult(city=city, description="clear sky", temperature_c=30.0, provider="stub")
+
+    def slow_llm(_prompt):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return AIMessage(content="LLM answer")
+
+    monkeypatch.setattr(ag, "embed_queries", fake_embed)
+    monkeypatch.setattr(ag, "search_chunks_batch", fake_retrieve_batch)
+    monkeypatch.setattr(ag, "fetch_weather", fake_weather)
+    monkeypatch.setattr(ag, "get_chat_model", lambda _name, _settings=None: RunnableLambda(slow_llm))
+
+    queries = [f"question {i}" for i in range(7)] + ["boom"]
+    cities = ["Chennai", "chennai ", "Madurai", None, "Chennai", "Atlantis", "Madurai", "Chennai"]
+    out = ag.batch_answer(queries, cities, Settings(), max_concurrency=2)
+
+    assert [s["query"] for s in out] == queries
+    assert calls["embed"] == 1 and calls["retrieve"] == 1
+    assert sorted(calls["weather"]) == ["Atlantis", "Chennai", "Madurai"]
+    assert peak[0] <= 2
+    assert all("LLM answer" in s["answer"] for s in out[:7])
+    assert "No city provided" in out[3]["weather"]
+    assert out[5]["error"].startswith("weather:") and "error" not in out[0]
+    assert "couldn't find anything relevant" in out[7]["rag_answer"]
+
+
+def test_batch_answer_reports_retrieval_failure_per_item(monkeypatch):
+    _stub_branches(monkeypatch, delay=0)
+
+    def broken(queries, settings, k=5, qvecs=None, filter=None):
+        raise RuntimeError("qdrant down")
+
+    monkeypatch.setattr(ag, "embed_queries", lambda queries, settings: None)
+    monkeypatch.setattr(ag, "search_chunks_batch", broken)
+    out = ag.batch_answer(["a", "b"], "Chennai", Settings())
+    assert [s["error"] for s in out] == ["rag: qdrant down"] * 2
+    assert all("Chennai: clear sky" in s["answer"] for s in out)
+
+
+def test_stream_turn_streams_tokens_from_failover_model(monkeypatch):
+    from src.llm import with_failover
+    from src.llm_fake import FakeChatModel
+
+    _stub_branches(monkeypatch, delay=0)
+    router = with_failover([FakeChatModel(error="timeout", timeout=0.01), FakeChatModel(response="Backup answer")])
+    monkeypatch.setattr(ag, "get_chat_model", lambda _name, _settings=None: router)
+    events = list(ag.stream_turn(build_graph(Settings()), make_state("Explain section 2", "Chennai")))
+    assert "".join(p for kind, p in events if kind == "token") == "Backup answer"
@@ -0,0 +1,116 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import src.eval.langsmith_eval as ls
+from src.eval.langsmith_eval import TelemetryWorker, record_eval
+from src.resources import invalidate
+
+
+class FakeClient:
+    """Records LangSmith calls; `delay` slows every upload down."""
+
+    def __init__(self, delay=0.0, existing=("ai-pipeline-assignment",)):
+        self.delay = delay
+        self.datasets = {name: f"ds-{name}" for name in existing}
+        self.calls = []
+        self.batches = []
+
+    def read_dataset(self, dataset_name):
+        self.calls.append("read_dataset")
+        if dataset_name not in self.datasets:
+            raise LookupError(dataset_name)
+        return SimpleNamespace(id=self.datasets[dataset_name], name=dataset_name)
+
+    def list_datasets(self):
+        self.calls.append("list_datasets")
+        return [SimpleNamespace(id=i, name=n) for n, i in self.datasets.items()]
+
+    def create_dataset(self, dataset_name, description=""):
+        self.calls.append("create_dataset")
+        self.datasets[dataset_name] = f"ds-{dataset_name}"
+        return SimpleNamespace(id=self.datasets[dataset_name])
+
+    def create_examples(self, dataset_id, examples):
+        time.sleep(self.delay)
+        self.calls.append("create_examples")
+        self.batches.append((dataset_id, list(examples)))
+
+
+def _example(i):
+    return {"inputs": {"query": f"q{i}"}, "outputs": {"answer": f"a{i}"}, "metadata": {}}
+
+
+def test_examples_are_batched_and_client_and_dataset_are_looked_up_once():
+    client = FakeClient()
+    created = []
+    worker = TelemetryWorker(lambda: created.append(1) or client, batch_size=4, flush_s=60)
+    for i in range(10):
+        assert worker.submit("ai-pipeline-assignment", _example(i))
+    assert worker.flush(5)
+    assert [len(b) for _, b in client.batches] == [4, 4, 2]
+    assert len(created) == 1 and client.calls.count("read_dataset") == 1
+    assert worker.stats()["sent"] == 10
+    worker.close()
+
+
+def test_partial_batch_goes_out_after_flush_interval():
+    client = FakeClient(existing=())
+    worker = TelemetryWorker(lambda: client, batch_size=100, flush_s=0.05)
+    worker.submit("new-project", _example(0))
+    deadline = time.monotonic() + 2
+    while not client.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert client.batches == [("ds-new-project", [_example(0)])]
+    assert "create_dataset" in client.calls
+    worker.close()
+
+
+def test_submit_drops_instead_of_blocking_when_queue_is_full():
+    client = FakeClient(delay=0.3)
+    worker = TelemetryWorker(lambda: client, max_queue=2, batch_size=1, flush_s=60)
+    t0 = time.perf_counter()
+    accepted = [worker.submit("ai-pipeline-assignment", _example(i)) for i in range(20)]
+    assert time.perf_counter() - t0 < 0.1
+    assert accepted.count(False) == worker.stats()["dropped"] > 0
+    worker.close()
+    assert worker.stats()["sent"] == accepted.count(True)  # close() flushed what was queued
+
+
+def test_upload_failures_are_counted_and_worker_keeps_going():
+    client = FakeClient()
+    fail = {"now": True}
+    real = client.create_examples
+
+    def flaky(dataset_id, examples):
+        if fail["now"]:
+            raise ConnectionError("LangSmith down")
+        real(dataset_id, examples)
+
+    client.create_examples = flaky
+    worker = TelemetryWorker(lambda: client, batch_size=2, flush_s=60)
+    worker.submit("ai-pipeline-assignment", _example(0))
+    worker.flush(5)
+    fail["now"] = False
+    worker.submit("ai-pipeline-assignment", _example(1))
+    worker.close()
+    assert worker.stats()["failed"] == 1 and worker.stats()["sent"] == 1
+
+
+def test_record_eval_only_enqueues(monkeypatch):
+    client = FakeClient(delay=0.5)
+    monkeypatch.setenv("LANGSMITH_LOG_EXAMPLES", "1")
+    monkeypatch.setenv("LANGCHAIN_API_KEY", "test")
+    monkeypatch.setattr(ls, "_get_client", lambda: client)
+    monkeypatch.setattr(ls, "_new_worker", lambda: TelemetryWorker(ls._get_client, batch_size=1, flush_s=60))
+    invalidate("telemetry")
+    try:
+        t0 = time.perf_counter()
+        record_eval({"query": "hi"}, {"answer": "hello"}, run_name="test-run")
+        assert time.perf_counter() - t0 < 0.1
+        assert ls.telemetry_worker().flush(5)
+        (_, examples), = client.batches
+        assert examples[0]["metadata"] == {"run_name": "test-run"}
+    finally:
+        invalidate("telemetry")
+    assert not any(t.name == "langsmith-telemetry" and t.is_alive() for t in threading.enumerate())
@@ -0,0 +1,105 @@
+import time
+
+import pytest
+
+import src.llm as llm
+from src.llm import GROQ_DEFAULT_FALLBACK, GROQ_DEFAULT_PRIMARY, OPENAI_DEFAULT, get_chat_model, with_failover
+from src.llm_fake import FakeChatModel, RateLimitError
+from src.resources import invalidate
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clients(monkeypatch):
+    for var in ("GROQ_API_KEY", "OPENAI_API_KEY", "LLM_PROVIDER", "LLM_FAILOVER", "LLM_TIMEOUT_S"):
+        monkeypatch.delenv(var, raising=False)
+    invalidate("llm")
+    yield
+    invalidate("llm")
+
+
+def _fake_providers(monkeypatch, behaviour):
+    """Every (provider, model) client becomes a FakeChatModel configured by `behaviour`."""
+    built = {}
+
+    def factory(provider):
+        def build(model, timeout):
+            built[(provider, model)] = FakeChatModel(
+                response=f"{provider}:{model}", timeout=timeout, **behaviour.get((provider, model), {})
+            )
+            return built[(provider, model)]
+        return build
+
+    monkeypatch.setitem(llm._FACTORIES, "groq", factory("groq"))
+    monkeypatch.setitem(llm._FACTORIES, "openai", factory("openai"))
+    return built
+
+
+def test_failover_order_covers_fallback_model_and_other_provider(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "g")
+    monkeypatch.setenv("OPENAI_API_KEY", "o")
+    assert llm._candidates(GROQ_DEFAULT_PRIMARY) == [
+        ("groq", GROQ_DEFAULT_PRIMARY), ("groq", GROQ_DEFAULT_FALLBACK), ("openai", OPENAI_DEFAULT)
+    ]
+    assert llm._candidates("gpt-4.1")[:2] == [("openai", "gpt-4.1"), ("openai", OPENAI_DEFAULT)]
+    monkeypatch.delenv("OPENAI_API_KEY")
+    # an OpenAI model name without an OpenAI key runs on Groq's models
+    assert llm._candidates("gpt-4o-mini") == [("groq", GROQ_DEFAULT_PRIMARY), ("groq", GROQ_DEFAULT_FALLBACK)]
+
+
+def test_clients_are_reused_across_calls(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "g")
+    _fake_providers(monkeypatch, {})
+    assert get_chat_model(GROQ_DEFAULT_PRIMARY) is get_chat_model(GROQ_DEFAULT_PRIMARY)
+
+
+def test_timeout_fails_over_to_groq_fallback_model(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "g")
+    monkeypatch.setenv("LLM_TIMEOUT_S", "0.2")
+    built = _fake_providers(monkeypatch, {("groq", GROQ_DEFAULT_PRIMARY): {"latency_s": 5.0}})
+
+    t0 = time.perf_counter()
+    out = get_chat_model(GROQ_DEFAULT_PRIMARY).invoke("hi")
+    assert time.perf_counter() - t0 < 1.0  # the budget, not the slow model's latency
+    assert out.content == f"groq:{GROQ_DEFAULT_FALLBACK}"
+    assert built[("groq", GROQ_DEFAULT_PRIMARY)].calls == 1
+
+
+def test_rate_limit_fails_over_to_other_provider_when_streaming(monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", "g")
+    monkeypatch.setenv("OPENAI_API_KEY", "o")
+    _fake_providers(monkeypatch, {
+        ("groq", GROQ_DEFAULT_PRIMARY): {"error": "rate_limit"},
+        ("groq", GROQ_DEFAULT_FALLBACK): {"error": "rate_limit"},
+    })
+    tokens = [c.content for c in get_chat_model(GROQ_DEFAULT_PRIMARY).stream("hi")]
+    assert "".join(tokens) == f"openai:{OPENAI_DEFAULT}"
+
+
+def test_non_transient_errors_are_not_masked():
+    class Broken(FakeChatModel):
+        def _generate(self, *args, **kwargs):
+            raise ValueError("bad request")
+
+    backup = FakeChatModel(response="backup")
+    with pytest.raises(ValueError):
+        with_failover([Broken(), backup]).invoke("hi")
+    assert backup.calls == 0
+    assert with_failover([FakeChatModel(error="rate_limit"), backup]).invoke("hi").content == "backup"
+    with pytest.raises(RateLimitError):
+        with_failover([FakeChatModel(error="rate_limit")]).invoke("hi")
+
+
+def test_fake_provider_runs_offline(monkeypatch):
+    monkeypatch.setenv("LLM_PROVIDER", "fake")
+    assert "placeholder" in get_chat_model().invoke("hi").content
+
+
+def test_settings_take_precedence_over_the_environment(monkeypatch):
+    from src.config import Settings
+
+    monkeypatch.setenv("GROQ_API_KEY", "g")
+    _fake_providers(monkeypatch, {})
+    assert "placeholder" in get_chat_model(settings=Settings(LLM_PROVIDER="fake")).invoke("hi").content
+    single = get_chat_model(GROQ_DEFAULT_PRIMARY, Settings(LLM_FAILOVER=False, LLM_TIMEOUT_S=0.5))
+    assert isinstance(single, FakeChatModel) and single.timeout == 0.5  # no router around it
+    assert get_chat_model(GROQ_DEFAULT_PRIMARY, Settings()) is not single
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.config import Settings
+from src.resources import invalidate
+from src.vectorstore.local_store import LocalVectorStore
+
+
+def _data(n=300, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    vecs = rng.standard_normal((n, dim)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(n)]
+    payloads = [{"text": f"chunk {i}", "doc_id": "a" if i % 2 else "b"} for i in range(n)]
+    return vecs, ids, payloads
+
+
+def test_exact_search_matches_brute_force_and_survives_reload(tmp_path):
+    vecs, ids, payloads = _data()
+    store = LocalVectorStore(str(tmp_path))
+    store.recreate_collection("docs", 32)
+    for s in range(0, len(ids), 128):
+        store.upsert("docs", vecs[s:s + 128], payloads[s:s + 128], ids[s:s + 128])
+
+    unit = vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+    q = vecs[7] + 0.1
+    expected = np.argsort(-(unit @ (q / np.linalg.norm(q))))[:5]
+
+    cold = LocalVectorStore(str(tmp_path))  # fresh process: memory-maps the files
+    hits = cold.search("docs", q, k=5)
+    assert [p["text"] for _, p in hits] == [f"chunk {i}" for i in expected]
+    assert hits[0][0] >= hits[-1][0]
+    assert cold.count("docs") == 300
+    assert cold.search_batch("docs", [q, vecs[3]], k=1)[1][0][1]["text"] == "chunk 3"
+
+
+def test_upsert_replaces_ids_and_delete_by_payload_compacts(tmp_path):
+    vecs, ids, payloads = _data(n=10)
+    store = LocalVectorStore(str(tmp_path))
+    store.recreate_collection("docs", 32)
+    store.upsert("docs", vecs, payloads, ids)
+    store.upsert("docs", vecs[:1], [{"text": "replaced", "doc_id": "b"}], ids[:1])
+    assert store.count("docs") == 10
+    assert store.search("docs", vecs[0], k=1)[0][1]["text"] == "replaced"
+    assert store.existing_ids("docs", ["id-0", "id-99"]) == {"id-0"}
+
+    store.delete_by_payload("docs", "doc_id", "a")
+    assert store.count("docs") == 5
+    assert {p["doc_id"] for _, p in store.search("docs", vecs[1], k=10)} == {"b"}
+    assert LocalVectorStore(str(tmp_path)).count("docs") == 5
+
+
+def test_hnsw_index_is_used_for_large_collections(tmp_path):
+    pytest.importorskip("hnswlib")
+    vecs, ids, payloads = _data(n=500)
+    store = LocalVectorStore(str(tmp_path), hnsw_min=100)
+    store.recreate_collection("docs", 32)
+    store.upsert("docs", vecs[:400], payloads[:400], ids[:400])
+    assert store.search("docs", vecs[42], k=1)[0][1]["text"] == "chunk 42"
+    assert os.path.exists(tmp_path / "docs" / "hnsw.bin")
+
+    store.upsert("docs", vecs[400:], payloads[400:], ids[400:])  # added to the live graph
+    reloaded = LocalVectorStore(str(tmp_path), hnsw_min=100)
+    hits = reloaded.search("docs", vecs[450], k=3)
+    assert hits[0][1]["text"] == "chunk 450" and hits[0][0] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_pdf_indexing_and_retrieval_on_local_backend(monkeypatch, tmp_path):
+    from src.rag.index import delete_document, index_pdf_into_qdrant, rag_retrieve, rag_retrieve_batch
+
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "10.1.1.1050.4503.pdf")
+    settings = Settings(QDRANT_COLLECTION="test_local", VECTOR_BACKEND="local", INDEX_MODE="append")
+    try:
+        with open(path, "rb") as fh:
+            report = index_pdf_into_qdrant(fh, settings)
+        assert report.added == report.chunks > 0
+        with open(path, "rb") as fh:
+            assert index_pdf_into_qdrant(fh, settings).added == 0
+
+        hits = rag_retrieve("bayesian network", settings, k=3)
+        assert len(hits) == 3
+        assert rag_retrieve_batch(["bayesian network"], settings, k=3) == [hits]
+
+        delete_document(report.doc_id, settings)
+        assert rag_retrieve("bayesian network", settings, k=3) == []
+    finally:
+        invalidate("vector_store")
@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from langchain_core.runnables import RunnableLambda
+
+import src.graph.agent_graph as ag
+from src.config import Settings
+from src.graph import memory
+from src.graph.agent_graph import build_graph, session_config
+from src.graph.memory import LatestCheckpointSaver
+from src.rag.index import RetrievedChunk
+from src.resources import invalidate
+from src.weather.api import WeatherResult
+
+
+def _stub(monkeypatch, llm=None):
+    retrieved = []
+
+    def fake_retrieve(query, settings, k=5, filter=None):
+        retrieved.append(query)
+        return [RetrievedChunk("The paper uses a Bayesian network. Its limitation is the small dataset.", 0.9)]
+
+    async def afake_weather(city, api_key=None):
+        return WeatherResult(city=city, description="clear sky", temperature_c=30.0, provider="stub")
+
+    def no_llm(*_args, **_kwargs):
+        raise RuntimeError("no LLM in tests")
+
+    monkeypatch.setattr(ag, "search_chunks", fake_retrieve)
+    monkeypatch.setattr(ag, "fetch_weather", lambda city, api_key=None: None)
+    monkeypatch.setattr(ag, "afetch_weather", afake_weather)
+    monkeypatch.setattr(ag, "embed_query", lambda query, settings: None)
+    monkeypatch.setattr(ag, "get_chat_model", (lambda _name, _settings=None: llm) if llm is not None else no_llm)
+    invalidate("answer_cache")
+    return retrieved
+
+
+def _turn(query):
+    return {"query": query, "params": {"city": ""}, "context": [], "answer": ""}
+
+
+def _rewriting_llm():
+    def reply(prompt_value):
+        text = prompt_value.to_string()
+        if "Standalone question:" in text:
+            return "What are the limitations of the Bayesian network in the paper?"
+        if "Updated summary:" in text:
+            return "The user asked about the paper's method."
+        return "A Bayesian network."
+    return RunnableLambda(reply)
+
+
+def test_follow_up_is_rewritten_from_checkpointed_history(monkeypatch):
+    retrieved = _stub(monkeypatch, llm=_rewriting_llm())
+    graph = build_graph(Settings(), checkpointer=LatestCheckpointSaver())
+    config = session_config("s1")
+
+    graph.invoke(_turn("What method does the paper use?"), config=config)
+    out = graph.invoke(_turn("What are its limitations?"), config=config)
+
+    assert retrieved == ["What method does the paper use?",
+                         "What are the limitations of the Bayesian network in the paper?"]
+    assert out["standalone_query"] == retrieved[-1]
+    assert [m["role"] for m in out["history"]] == ["user", "assistant"] * 2
+    assert all(set(m) == {"role", "content"} for m in out["history"])  # no context chunks kept
+    assert graph.invoke(_turn("Hi"), config=session_config("s2"))["history"][0]["content"] == "Hi"
+
+
+def test_rewrite_falls_back_to_previous_question_without_llm(monkeypatch):
+    retrieved = _stub(monkeypatch)
+    graph = build_graph(Settings(), checkpointer=LatestCheckpointSaver())
+    config = session_config("s1")
+    graph.invoke(_turn("What method does the paper use?"), config=config)
+    asyncio.run(graph.ainvoke(_turn("Why?"), config=config))
+    assert retrieved[-1] == "Why? (follow-up to: What method does the paper use?)"
+
+
+def test_standalone_questions_skip_the_rewrite(monkeypatch):
+    calls = []
+    llm = _rewriting_llm()
+    retrieved = _stub(monkeypatch, llm=RunnableLambda(lambda p: calls.append(p) or llm.invoke(p)))
+    graph = build_graph(Settings(), checkpointer=LatestCheckpointSaver())
+    graph.invoke(_turn("What method does the paper use?"), config=session_config("s"))
+    graph.invoke(_turn("Which dataset was used in the experiments?"), config=session_config("s"))
+    assert retrieved[-1] == "Which dataset was used in the experiments?"
+    assert not any("Standalone question:" in p.to_string() for p in calls)
+
+
+def test_state_stays_bounded_over_a_long_conversation(monkeypatch):
+    _stub(monkeypatch)
+    saver = LatestCheckpointSaver()
+    graph = build_graph(Settings(MEMORY_WINDOW_TURNS=2, MEMORY_SUMMARY_MAX_CHARS=300), checkpointer=saver)
+    config = session_config("long")
+    sizes = []
+    for i in range(15):
+        out = graph.invoke(_turn(f"Question number {i} about the method?"), config=config)
+        assert len(out["history"]) <= 8
+        sizes.append((len(saver.blobs), len(saver.writes), len(saver.storage["long"][""])))
+    assert len(out["summary"]) <= 300 and "Question number" in out["summary"]
+    assert out["history"][-2]["content"] == "Question number 14 about the method?"
+    assert sizes[-1] == sizes[5] and sizes[-1][2] == 1
+
+
+def test_sessions_beyond_max_threads_are_evicted(monkeypatch):
+    _stub(monkeypatch)
+    saver = LatestCheckpointSaver(max_threads=2)
+    graph = build_graph(Settings(), checkpointer=saver)
+    for sid in ("a", "b", "c"):
+        graph.invoke(_turn("What method does the paper use?"), config=session_config(sid))
+    assert set(saver.storage) == {"b", "c"}
+    assert all(k[0] in ("b", "c") for k in saver.blobs)
+
+
+def test_follow_up_detection_and_fold():
+    history = [{"role": "user", "content": "What is the method?"}, {"role": "assistant", "content": "BN."}]
+    assert memory.is_follow_up("What about its accuracy?", history)
+    assert memory.is_follow_up("Why?", history)
+    assert not memory.is_follow_up("Which dataset was used in the experiments?", history)
+    assert not memory.is_follow_up("Why?", [])
+
+    msgs = [{"role": r, "content": str(i)} for i in range(5) for r in ("user", "assistant")]
+    assert memory.fold(msgs[:8], window_turns=2) == ([], msgs[:8])
+    folded, kept = memory.fold(msgs, window_turns=2)
+    assert folded == msgs[:6] and kept == msgs[6:]
+
+
+def test_every_rag_path_resets_the_previous_turns_fields(monkeypatch):
+    _stub(monkeypatch)
+    graph = build_graph(Settings(ANSWER_CACHE=False), checkpointer=LatestCheckpointSaver())
+    config = session_config("s")
+    assert graph.invoke(_turn("What method does the paper use?"), config=config)["context_stats"]
+
+    monkeypatch.setattr(ag, "search_chunks", lambda query, settings, k=5, filter=None: [])
+    out = graph.invoke(_turn("Which dataset was used in the experiments?"), config=config)
+    assert out["rag_answer"] == ag._NO_DOCS
+    assert (out["context"], out["sources"], out["context_stats"], out["cached"]) == ([], [], None, False)
+
+
+def test_weather_overlaps_the_follow_up_rewrite(monkeypatch):
+    llm = _rewriting_llm()
+
+    def slow_rewrite(prompt_value):
+        if "Standalone question:" in prompt_value.to_string():
+            time.sleep(0.3)
+        return llm.invoke(prompt_value)
+
+    _stub(monkeypatch, llm=RunnableLambda(slow_rewrite))
+
+    async def slow_weather(city, api_key=None):
+        await asyncio.sleep(0.3)
+        return WeatherResult(city=city, description="clear sky", temperature_c=30.0, provider="stub")
+
+    monkeypatch.setattr(ag, "afetch_weather", slow_weather)
+    graph = build_graph(Settings(), checkpointer=LatestCheckpointSaver())
+    config = session_config("s")
+    asyncio.run(graph.ainvoke(_turn("What method does the paper use?"), config=config))
+    t0 = time.perf_counter()
+    out = asyncio.run(graph.ainvoke({**_turn("What are its limitations?"), "params": {"city": "Chennai"}},
+                                    config=config))
+    assert time.perf_counter() - t0 < 0.55
+    assert out["weather"] and out["standalone_query"].startswith("What are the limitations")
@@ -0,0 +1,113 @@
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import src.graph.agent_graph as ag
+from src import metrics
+from src.config import Settings
+from src.graph.agent_graph import build_graph
+from src.llm import _metrics_handler
+from src.llm_fake import FakeChatModel
+from src.rag.index import RetrievedChunk
+from src.resources import invalidate
+from src.weather.api import WeatherResult
+
+
+@pytest.fixture(autouse=True)
+def _fresh_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_percentiles():
+    for ms in range(1, 101):
+        metrics.observe("step", ms / 1000)
+    s = metrics.snapshot()["histograms"]["step"]
+    assert s["count"] == 100
+    assert s["p50"] == pytest.approx(0.0505, abs=1e-3)
+    assert s["p95"] == pytest.approx(0.095, abs=1e-3)
+    assert s["p99"] == pytest.approx(0.099, abs=1e-3)
+    assert s["mean"] == pytest.approx(0.0505)
+
+
+def test_histogram_keeps_recent_window_but_counts_everything():
+    h = metrics.Histogram(size=4)
+    for v in (10.0, 10.0, 1.0, 1.0, 1.0, 1.0):
+        h.observe(v)
+    s = h.summary()
+    assert s["count"] == 6 and s["p99"] == pytest.approx(1.0)
+    assert s["mean"] == pytest.approx(24 / 6)
+
+
+def test_spans_add_up_into_the_current_turn_only():
+    with metrics.span("outside"):
+        pass
+    with metrics.turn() as breakdown:
+        for _ in range(2):
+            with metrics.span("embed"):
+                time.sleep(0.01)
+        worker = threading.Thread(target=lambda: metrics.observe("other_thread", 1.0))
+        worker.start()
+        worker.join()
+    assert set(breakdown) == {"embed"}  # plain threads don't inherit the turn's context
+    assert breakdown["embed"] >= 0.02
+    assert metrics.snapshot()["histograms"]["embed"]["count"] == 2
+
+
+def test_counters_and_prometheus_text():
+    metrics.incr("embed_cache.hit", 3)
+    metrics.incr("weather.fallback")
+    metrics.observe("vector_search", 0.002)
+    text = metrics.prometheus_text()
+    assert "rag_embed_cache_hit_total 3" in text
+    assert "rag_weather_fallback_total 1" in text
+    assert 'rag_vector_search_seconds{quantile="0.95"} 0.002000' in text
+    assert "rag_vector_search_seconds_count 1" in text
+
+
+def test_prometheus_exporter_serves_metrics():
+    metrics.incr("llm.error")
+    server = metrics._serve_prometheus(0)
+    try:
+        assert server.server_address[0] == "127.0.0.1"  # loopback unless METRICS_HOST says otherwise
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+    assert "rag_llm_error_total 1" in body
+
+
+def test_llm_callback_records_latency_and_ttft():
+    model = FakeChatModel(response="one two three", latency_s=0.02)
+    model.callbacks = [_metrics_handler()]
+    model.invoke("hi")
+    list(model.stream("hi"))
+    hists = metrics.snapshot()["histograms"]
+    assert hists["llm"]["count"] == 2 and hists["llm"]["p50"] >= 0.02
+    assert hists["llm.ttft"]["count"] == 1
+
+
+def test_stream_turn_reports_per_stage_breakdown(monkeypatch):
+    def fake_retrieve(query, settings, k=5, filter=None):
+        with metrics.span("vector_search"):
+            time.sleep(0.02)
+        return [RetrievedChunk("Section 2 explains the method.", 0.9)]
+
+    monkeypatch.setattr(ag, "search_chunks", fake_retrieve)
+    monkeypatch.setattr(ag, "fetch_weather", lambda city, api_key=None: WeatherResult(
+        city=city, description="clear sky", temperature_c=30.0, provider="stub"))
+    monkeypatch.setattr(ag, "embed_query", lambda query, settings: None)
+    monkeypatch.setattr(ag, "get_chat_model", lambda _name, _settings=None: FakeChatModel(response="Section two"))
+    invalidate("answer_cache")
+
+    events = list(ag.stream_turn(build_graph(Settings()), {
+        "history": [], "query": "Explain section 2", "params": {"city": "Chennai"}, "context": [], "answer": ""}))
+    final = events[-1][1]
+
+    assert {"node.rag", "node.weather", "node.combine", "vector_search"} <= set(final["breakdown"])
+    assert final["breakdown"]["vector_search"] >= 0.02
+    hists = metrics.snapshot()["histograms"]
+    assert hists["turn.total"]["count"] == 1 and hists["turn.ttft"]["count"] == 1
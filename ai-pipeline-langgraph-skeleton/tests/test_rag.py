@@ -9,3 +9,156 @@ def test_rag_retrieve_works_with_empty_collection(monkeypatch):
     # No data inserted; should return list (possibly empty), not raise
     res = rag_retrieve("dummy query", settings, k=3)
     assert isinstance(res, list)
+
+
+def _pdf_upload():
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "10.1.1.1050.4503.pdf")
+    return open(path, "rb")
+
+
+def test_append_mode_is_incremental_and_supports_delete(monkeypatch, tmp_path):
+    from src.rag.index import delete_document, index_pdf_into_qdrant
+    from src.resources import invalidate
+    from src.vectorstore.qdrant_store import get_qdrant
+
+    monkeypatch.setenv("QDRANT_EMBEDDED", "1")
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    settings = Settings(QDRANT_COLLECTION="test_append", INDEX_MODE="append", UPSERT_BATCH_SIZE=7)
+    try:
+        with _pdf_upload() as fh:
+            first = index_pdf_into_qdrant(fh, settings)
+        assert first.added > 0 and first.skipped == first.chunks - first.added
+
+        with _pdf_upload() as fh:
+            again = index_pdf_into_qdrant(fh, settings)
+        assert again.doc_id == first.doc_id
+        assert again.added == 0  # same content -> same point ids -> nothing re-embedded
+
+        client = get_qdrant()
+        assert client.count("test_append").count == first.added
+        assert rag_retrieve("method", settings, k=3)
+
+        delete_document(first.doc_id, settings)
+        assert client.count("test_append").count == 0
+    finally:
+        invalidate("qdrant")
+
+
+def test_parallel_page_chunking_matches_sequential(monkeypatch):
+    from src.rag import pdf_loader
+
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "10.1.1.1050.4503.pdf")
+    monkeypatch.setattr(pdf_loader, "_PARALLEL_MIN_PAGES", 1)
+    sequential = pdf_loader.load_and_chunk_pdf(path)
+    parallel = list(pdf_loader.iter_pdf_chunks(path, workers=2, pages_per_task=2))
+    assert [d.page_content for d in parallel] == [d.page_content for d in sequential]
+    assert [d.metadata["page"] for d in parallel] == sorted(d.metadata["page"] for d in parallel)
+
+
+def test_parallel_extraction_keeps_a_bounded_window(monkeypatch):
+    from concurrent.futures import Future
+
+    from src.rag import pdf_loader
+
+    submitted = []
+
+    class _Pool:
+        def submit(self, fn, args):
+            submitted.append(args)
+            done = Future()
+            done.set_result([(args[1], "")])
+            return done
+
+    monkeypatch.setattr(pdf_loader, "_extract_pages", None)
+    ranges = [("x.pdf", i, i + 1) for i in range(10)]
+    out = []
+    for pages in pdf_loader._windowed(_Pool(), ranges, window=4):
+        out.append(pages)
+        assert len(submitted) - len(out) <= 4  # futures still in flight
+    assert [p[0][0] for p in out] == list(range(10)) and len(submitted) == 10
+
+
+def test_indexing_reports_progress_per_batch(monkeypatch, tmp_path):
+    from src.rag.index import index_pdf_into_qdrant
+    from src.resources import invalidate
+
+    monkeypatch.setenv("QDRANT_EMBEDDED", "1")
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    settings = Settings(QDRANT_COLLECTION="test_progress", UPSERT_BATCH_SIZE=4, PDF_WORKERS=1)
+    seen = []
+    try:
+        with _pdf_upload() as fh:
+            report = index_pdf_into_qdrant(fh, settings, progress=lambda f, msg: seen.append(f))
+        assert len(seen) == -(-report.chunks // 4)
+        assert seen == sorted(seen) and seen[-1] == 1.0
+    finally:
+        invalidate("qdrant")
+
+
+def test_hybrid_mode_indexes_sparse_vectors_and_retrieves(monkeypatch, tmp_path):
+    from src.rag.index import index_pdf_into_qdrant
+    from src.resources import invalidate
+    from src.vectorstore.qdrant_store import SPARSE, get_qdrant
+
+    monkeypatch.setenv("QDRANT_EMBEDDED", "1")
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    settings = Settings(QDRANT_COLLECTION="test_hybrid", RETRIEVAL_MODE="hybrid")
+    try:
+        with _pdf_upload() as fh:
+            report = index_pdf_into_qdrant(fh, settings)
+        params = get_qdrant().get_collection("test_hybrid").config.params
+        assert SPARSE in params.sparse_vectors
+
+        hits = rag_retrieve("Bayesian network traffic accident", settings, k=3)
+        assert len(hits) == 3 and any("Bayesian" in h for h in hits)
+        assert report.added == get_qdrant().count("test_hybrid").count
+    finally:
+        invalidate("qdrant")
+
+
+def test_batch_retrieval_matches_single_queries(monkeypatch, tmp_path):
+    from src.rag.index import index_pdf_into_qdrant, rag_retrieve_batch
+    from src.resources import invalidate
+
+    monkeypatch.setenv("QDRANT_EMBEDDED", "1")
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    queries = ["bayesian network", "traffic accident data", "conclusion"]
+    try:
+        for mode in ("dense", "hybrid"):
+            settings = Settings(QDRANT_COLLECTION=f"test_batch_{mode}", RETRIEVAL_MODE=mode)
+            with _pdf_upload() as fh:
+                index_pdf_into_qdrant(fh, settings)
+            assert rag_retrieve_batch(queries, settings, k=3) == [rag_retrieve(q, settings, k=3) for q in queries]
+    finally:
+        invalidate("qdrant")
+
+
+def test_failed_model_load_is_retried_and_logged_once(monkeypatch, caplog):
+    from src.rag import index
+    from src.resources import invalidate
+
+    loads = []
+
+    class _Model:
+        def embed(self, texts):
+            return [[1.0, 0.0] for _ in texts]
+
+    def load(name, threads=None):
+        loads.append(name)
+        if len(loads) < 3:
+            raise OSError("offline")
+        return _Model()
+
+    monkeypatch.setattr(index, "_load_text_embedding", load)
+    monkeypatch.setattr(index, "_FAILED_LOADS", {})
+    invalidate("embedder")
+    try:
+        assert index._fastembed_embedder("test-model") is None
+        assert index._fastembed_embedder("test-model") is None and len(loads) == 1  # within the retry interval
+        monkeypatch.setattr(index, "_LOAD_RETRY_S", 0.0)
+        assert index._fastembed_embedder("test-model") is None and len(loads) == 2
+        embed = index._fastembed_embedder("test-model")
+        assert embed is not None and embed(["a"]).shape == (1, 2) and len(loads) == 3
+        assert len([r for r in caplog.records if "test-model" in r.getMessage()]) == 1
+    finally:
+        invalidate("embedder")
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from src.resources import get_resource, invalidate
+
+
+class _Closable:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_get_resource_builds_once_across_threads():
+    calls = []
+
+    def factory():
+        calls.append(1)
+        time.sleep(0.05)
+        return object()
+
+    out = []
+    threads = [
+        threading.Thread(target=lambda: out.append(get_resource("t-once", "k", factory)))
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert all(o is out[0] for o in out)
+    invalidate("t-once")
+
+
+def test_invalidate_closes_and_rebuilds():
+    first = get_resource("t-inval", ("a", 1), _Closable)
+    assert get_resource("t-inval", ("a", 1), _Closable) is first
+    # Different key -> different instance
+    assert get_resource("t-inval", ("a", 2), _Closable) is not first
+
+    invalidate("t-inval")
+    assert first.closed
+    assert get_resource("t-inval", ("a", 1), _Closable) is not first
+    invalidate("t-inval")
+
+
+def test_none_result_is_cached():
+    calls = []
+    assert get_resource("t-none", "k", lambda: calls.append(1)) is None
+    assert get_resource("t-none", "k", lambda: calls.append(1)) is None
+    assert len(calls) == 1
+    invalidate("t-none")
@@ -0,0 +1,107 @@
+import asyncio
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+import src.graph.agent_graph as ag
+from src.config import Settings
+from src.llm_fake import FakeChatModel
+from src.rag.index import RetrievedChunk
+from src.resources import invalidate
+from src.server import AdmissionController, Overloaded, create_app
+from src.weather.api import WeatherResult
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def afake_weather(city, api_key=None):
+        return WeatherResult(city=city, description="clear sky", temperature_c=30.0, provider="stub")
+
+    monkeypatch.setattr(ag, "search_chunks", lambda query, settings, k=5, filter=None: [
+        RetrievedChunk("Section 2 explains the method.", 0.83, {"source": "paper.pdf", "page": 1})])
+    monkeypatch.setattr(ag, "afetch_weather", afake_weather)
+    monkeypatch.setattr(ag, "embed_query", lambda query, settings: None)
+    monkeypatch.setattr(ag, "get_chat_model", lambda _name, _settings=None: FakeChatModel(response="Section two answer"))
+    invalidate("answer_cache")
+    with TestClient(create_app(Settings(WARMUP=False))) as c:
+        yield c
+
+
+def _events(body: str):
+    out = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_answer_returns_both_sections_and_timings(client):
+    r = client.post("/v1/answer", json={"query": "Explain section 2", "city": "Chennai"})
+    assert r.status_code == 200
+    body = r.json()
+    assert "Section two answer" in body["answer"] and "Chennai: clear sky" in body["weather"]
+    assert "total" in body["timings"] and "node.rag" in body["breakdown"]
+    assert client.get("/healthz").json()["in_flight"] == 0
+
+
+def test_stream_sends_tokens_weather_and_final(client):
+    r = client.post("/v1/answer/stream", json={"query": "Explain section 2", "city": "Chennai"})
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _events(r.text)
+    kinds = [k for k, _ in events]
+    assert "token" in kinds and "weather" in kinds and kinds[-1] == "final"
+    assert "".join(p for k, p in events if k == "token") == "Section two answer"
+    assert "ttft" in events[-1][1]["timings"]
+    assert client.get("/healthz").json()["in_flight"] == 0
+
+
+def test_bad_requests_are_rejected(client):
+    assert client.post("/v1/answer", json={"city": "Chennai"}).status_code == 400
+    assert client.post("/v1/answer/stream", content=b"not json").status_code == 400
+    r = client.post("/v1/answer", json={"query": "Explain section 2", "filter": {"pages": [0, 3]}})
+    assert r.status_code == 400 and "invalid filter" in r.json()["error"]
+    for history in ("hi", [{"role": "user"}], [{"role": "system", "content": "x"}], ["hi"]):
+        r = client.post("/v1/answer/stream", json={"query": "Explain section 2", "history": history})
+        assert r.status_code == 400 and "invalid history" in r.json()["error"]
+
+
+def test_filter_reaches_retrieval_and_sources_are_returned(client, monkeypatch):
+    seen = []
+
+    def fake_search(query, settings, k=5, filter=None):
+        seen.append(filter)
+        return [RetrievedChunk("Section 2 explains the method.", 0.83, {"source": "paper.pdf", "page": 1})]
+
+    monkeypatch.setattr(ag, "search_chunks", fake_search)
+    r = client.post("/v1/answer", json={"query": "Explain section 2", "filter": {"source": "paper.pdf"}})
+    assert r.status_code == 200
+    assert seen[0].sources == ("paper.pdf",)
+    assert r.json()["sources"] == [{"source": "paper.pdf", "page": 2, "score": 0.83, "doc_id": None}]
+
+
+def test_admission_control_sheds_load_beyond_queue():
+    async def main():
+        admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout_s=0.2)
+        first = await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded, match="queue full"):
+            await admission.acquire()
+        first.release()
+        first.release()  # idempotent
+        second = await waiter
+        assert admission.stats()["in_flight"] == 1
+        with pytest.raises(Overloaded, match="timed out"):
+            await admission.acquire()
+        second.release()
+        assert admission.stats() == {"in_flight": 0, "waiting": 0, "max_concurrency": 1, "max_queue": 1}
+
+    asyncio.run(main())
+
+
+def test_overloaded_request_gets_503(client):
+    client.app.state.admission._slots = asyncio.Semaphore(0)
+    client.app.state.admission.max_queue = 0
+    r = client.post("/v1/answer", json={"query": "hi"})
+    assert r.status_code == 503 and r.headers["retry-after"] == "10"
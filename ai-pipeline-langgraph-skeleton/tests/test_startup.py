@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from src.config import Settings
+from src.resources import invalidate
+from src.warmup import warm_up
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_graph_import_does_not_load_provider_sdks_or_embedding_backends():
+    code = (
+        "import json, sys; import src.graph.agent_graph; "
+        "print(json.dumps([m for m in ('langchain_openai', 'langchain_groq', 'qdrant_client', "
+        "'fastembed', 'sklearn', 'pypdf') if m in sys.modules]))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert json.loads(out.stdout.strip().splitlines()[-1]) == []
+
+
+def test_warm_up_preloads_shared_resources_once(monkeypatch, tmp_path):
+    monkeypatch.setenv("QDRANT_LOCAL_PATH", str(tmp_path))
+    monkeypatch.setenv("GROQ_API_KEY", "test-key")
+    settings = Settings(VECTOR_BACKEND="local", QDRANT_COLLECTION="test_warmup")
+    invalidate("warmup")
+    try:
+        report = warm_up(settings)
+        assert report.wait(30)
+        assert set(report.timings) == {"embedder", "vector_store", "llm", "tokenizer"}
+        assert "llm" not in report.errors and report.loaded["llm"] is not None
+        assert warm_up(settings) is report  # once per process
+        # the request path gets the client the warm-up built
+        from src.llm import get_chat_model
+        assert get_chat_model(settings.MODEL_NAME, settings) is report.loaded["llm"]
+        from src.vectorstore.base import get_vector_store
+        assert get_vector_store(settings) is report.loaded["vector_store"]
+    finally:
+        invalidate("warmup")
+        invalidate("llm")
+        invalidate("vector_store")
@@ -0,0 +1,81 @@
+import warnings
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http import models as qm
+
+from src.config import Settings
+from src.vectorstore import qdrant_store
+from src.vectorstore.qdrant_store import QdrantStore, StorageProfile, storage_profile
+
+
+def test_profiles_resolve_with_overrides():
+    assert storage_profile(Settings()) == StorageProfile()
+    scalar = storage_profile(Settings(QDRANT_STORAGE_PROFILE="scalar", QDRANT_HNSW_M=32, QDRANT_OVERSAMPLING=4.0))
+    assert (scalar.quantization, scalar.on_disk_vectors, scalar.hnsw_m, scalar.oversampling) == ("scalar", True, 32, 4.0)
+    assert storage_profile(Settings(QDRANT_STORAGE_PROFILE="binary", QDRANT_RESCORE=False)).rescore is False
+    with pytest.raises(ValueError, match="QDRANT_STORAGE_PROFILE"):
+        storage_profile(Settings(QDRANT_STORAGE_PROFILE="tiny"))
+
+
+def test_default_profile_keeps_the_plain_layout():
+    assert qdrant_store._collection_options(StorageProfile()) == {}
+    assert qdrant_store._vector_params(8, StorageProfile()).on_disk is None
+    options = qdrant_store._collection_options(qdrant_store.STORAGE_PROFILES["binary"])
+    assert isinstance(options["quantization_config"], qm.BinaryQuantization) and options["on_disk_payload"]
+
+
+def test_quantized_collection_in_embedded_qdrant(tmp_path):
+    client = QdrantClient(path=str(tmp_path))
+    store = QdrantStore(client, StorageProfile(quantization="scalar", on_disk_vectors=True, hnsw_m=8))
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((50, 8)).astype(np.float32)
+    store.recreate_collection("p", 8)
+    store.upsert("p", vectors, [{"i": i} for i in range(50)], ids=list(range(50)))
+
+    assert client.get_collection("p").config.params.vectors.on_disk is True
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")  # no "search_params has no effect" warning per query
+        assert store.search("p", vectors[7], k=1)[0][1] == {"i": 7}
+        assert [hits[0][1]["i"] for hits in store.search_batch("p", vectors[:3], k=2)] == [0, 1, 2]
+    client.close()
+
+
+def _server_client(quantization=None, on_disk=None, m=16):
+    calls = []
+    config = SimpleNamespace(
+        quantization_config=quantization,
+        params=SimpleNamespace(vectors=SimpleNamespace(on_disk=on_disk), on_disk_payload=on_disk),
+        hnsw_config=SimpleNamespace(m=m, ef_construct=100),
+    )
+    return SimpleNamespace(
+        get_collection=lambda name: SimpleNamespace(config=config),
+        update_collection=lambda **kw: calls.append(kw),
+    ), calls
+
+
+def test_existing_server_collection_is_switched_in_place():
+    client, calls = _server_client()
+    qdrant_store._apply_profile(client, "c", qdrant_store.STORAGE_PROFILES["scalar"])
+    (update,) = calls
+    assert isinstance(update["quantization_config"], qm.ScalarQuantization)
+    assert update["vectors_config"][""].on_disk and update["collection_params"].on_disk_payload
+
+    client, calls = _server_client(quantization=qm.ScalarQuantization(scalar=qm.ScalarQuantizationConfig(
+        type=qm.ScalarType.INT8)), on_disk=True)
+    qdrant_store._apply_profile(client, "c", qdrant_store.STORAGE_PROFILES["scalar"])
+    assert calls == []  # already laid out that way
+
+    client, calls = _server_client(on_disk=True)
+    qdrant_store._apply_profile(client, "c", StorageProfile())
+    assert calls[0]["quantization_config"] == qm.Disabled.DISABLED
+
+
+def test_search_params_rescore_quantized_candidates():
+    server = SimpleNamespace()
+    assert qdrant_store._search_params(server, StorageProfile()) is None
+    params = qdrant_store._search_params(server, StorageProfile(quantization="binary", oversampling=3.0, search_ef=128))
+    assert params.hnsw_ef == 128
+    assert params.quantization.rescore is True and params.quantization.oversampling == 3.0
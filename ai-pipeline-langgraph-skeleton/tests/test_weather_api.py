@@ -1,5 +1,18 @@
-import os, pytest
-from src.weather.api import fetch_weather
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+import src.weather.api as wapi
+from src.resources import invalidate
+from src.weather.api import WeatherProvider, WeatherResult, clear_weather_cache, fetch_weather
+
 
 @pytest.mark.skipif(not os.getenv("OPENWEATHERMAP_API_KEY"), reason="No OWM API key configured")
 def test_fetch_weather_openweathermap():
@@ -9,6 +22,7 @@ def test_fetch_weather_openweathermap():
     assert isinstance(r.description, str)
     assert r.provider in ("openweathermap", "open-meteo")
 
+
 @pytest.mark.skipif(os.getenv("RUN_NETWORK_TESTS") != "1", reason="Network tests disabled")
 def test_fetch_weather_open_meteo_fallback():
     # Ensure no OWM key to exercise fallback path
@@ -17,3 +31,180 @@ def test_fetch_weather_open_meteo_fallback():
     assert r.city
     assert isinstance(r.temperature_c, float)
     assert r.provider == "open-meteo"
+
+
+# ---------- Offline cache behaviour (stubbed providers) ----------
+def _stub_provider(monkeypatch, delay=0.0, fail=None):
+    calls = []
+
+    def fake_open_meteo(city):
+        calls.append(city)
+        time.sleep(delay)
+        if fail and fail():
+            raise RuntimeError("provider down")
+        return WeatherResult(city=city.title(), description="clear", temperature_c=20.0 + len(calls),
+                             provider="stub")
+
+    monkeypatch.delenv("OPENWEATHERMAP_API_KEY", raising=False)
+    monkeypatch.setattr(wapi, "_fetch_open_meteo", fake_open_meteo)
+    clear_weather_cache()
+    return calls
+
+
+def test_fresh_result_is_served_from_cache_by_normalized_city(monkeypatch):
+    calls = _stub_provider(monkeypatch)
+    first = fetch_weather("Chennai")
+    again = fetch_weather("  chennai ")
+    assert again is first and len(calls) == 1
+
+
+def test_concurrent_requests_share_one_upstream_call(monkeypatch):
+    calls = _stub_provider(monkeypatch, delay=0.2)
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(fetch_weather("Madurai"))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(out) == 8
+
+
+def test_stale_value_served_while_refreshing_in_background(monkeypatch):
+    monkeypatch.setenv("WEATHER_TTL_S", "0")
+    calls = _stub_provider(monkeypatch, delay=0.2)
+    first = fetch_weather("Salem")
+
+    t0 = time.perf_counter()
+    stale = fetch_weather("Salem")
+    assert time.perf_counter() - t0 < 0.1  # didn't wait for the provider
+    assert stale.stale and stale.temperature_c == first.temperature_c
+
+    time.sleep(0.4)
+    assert len(calls) == 2  # one background refresh
+
+
+def test_provider_failure_falls_back_to_cached_value(monkeypatch):
+    monkeypatch.setenv("WEATHER_TTL_S", "0")
+    monkeypatch.setenv("WEATHER_STALE_S", "0")
+    down = {"now": False}
+    _stub_provider(monkeypatch, fail=lambda: down["now"])
+    fetch_weather("Trichy")
+
+    down["now"] = True
+    res = fetch_weather("Trichy")
+    assert res.stale and res.city == "Trichy"
+    with pytest.raises(RuntimeError):
+        fetch_weather("Unknown town")
+
+
+# ---------- Pooled HTTP + hedged providers (local stub server) ----------
+@contextmanager
+def _stub_server(owm_delay=0.0):
+    """Serves the three provider endpoints; records the client port of every request."""
+    ports = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def do_GET(self):
+            ports.append(self.client_address[1])
+            path = urlparse(self.path).path
+            if path == "/owm":
+                time.sleep(owm_delay)
+                body = {"name": "Chennai", "weather": [{"description": "haze"}],
+                        "main": {"temp": 31.0, "feels_like": 35.0, "humidity": 70}, "wind": {"speed": 2.0}}
+            elif path == "/geocode":
+                body = {"results": [{"latitude": 13.08, "longitude": 80.27, "name": "Chennai"}]}
+            else:
+                body = {"current": {"temperature_2m": 30.0, "relative_humidity_2m": 65}}
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            pass  # hedged losers hang up before their response is written
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}", ports
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _point_at(monkeypatch, base):
+    monkeypatch.setenv("OPENWEATHERMAP_URL", f"{base}/owm")
+    monkeypatch.setenv("OPEN_METEO_GEOCODE_URL", f"{base}/geocode")
+    monkeypatch.setenv("OPEN_METEO_URL", f"{base}/forecast")
+    monkeypatch.setenv("WEATHER_TTL_S", "0")
+    monkeypatch.setenv("WEATHER_STALE_S", "0")
+    clear_weather_cache()
+    invalidate("http")
+
+
+def test_requests_reuse_one_pooled_connection(monkeypatch):
+    with _stub_server() as (base, ports):
+        _point_at(monkeypatch, base)
+        for _ in range(3):
+            assert fetch_weather("Chennai", api_key="k").provider == "openweathermap"
+    assert len(ports) == 3 and len(set(ports)) == 1
+
+
+def test_slow_primary_is_hedged_by_fallback(monkeypatch):
+    monkeypatch.setenv("WEATHER_HEDGE_S", "0.1")
+    with _stub_server(owm_delay=1.0) as (base, _):
+        _point_at(monkeypatch, base)
+        t0 = time.perf_counter()
+        res = fetch_weather("Chennai", api_key="k")
+        assert time.perf_counter() - t0 < 0.8
+    assert res.provider == "open-meteo" and res.temperature_c == 30.0
+
+
+def test_async_fetch_hedges_and_coalesces(monkeypatch):
+    monkeypatch.setenv("WEATHER_HEDGE_S", "0.1")
+    with _stub_server(owm_delay=1.0) as (base, ports):
+        _point_at(monkeypatch, base)
+
+        async def main():
+            return await asyncio.gather(*(wapi.afetch_weather("Chennai", api_key="k") for _ in range(5)))
+        results = asyncio.run(main())
+    assert {r.provider for r in results} == {"open-meteo"}
+    assert len(ports) == 3  # one owm attempt + geocode + forecast, shared by all five callers
+
+
+def test_invalidate_closes_the_per_loop_async_clients(monkeypatch):
+    with _stub_server() as (base, _):
+        _point_at(monkeypatch, base)
+        loop = asyncio.new_event_loop()
+        try:
+            assert loop.run_until_complete(wapi.afetch_weather("Chennai")).provider == "open-meteo"
+            client = loop.run_until_complete(_current_client())
+            invalidate("http")
+            assert client.is_closed
+            assert loop.run_until_complete(_current_client()) is not client
+        finally:
+            invalidate("http")
+            loop.close()
+
+
+async def _current_client():
+    return wapi._async_client()
+
+
+def test_providers_must_implement_both_paths():
+    class SyncOnly(WeatherProvider):
+        def fetch(self, city):
+            raise NotImplementedError
+
+    with pytest.raises(TypeError):
+        SyncOnly()